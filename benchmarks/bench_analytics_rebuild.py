@@ -0,0 +1,82 @@
+"""Benchmark reconstruction des analytics depuis l'archive, selon le nombre de processus.
+
+Construit une archive (segments scellés sur plusieurs serveurs), puis
+recalcule les shards avec 1, 2, 4... processus (jusqu'au nombre de cœurs,
+ou la liste donnée). Vérifie que le résultat ne dépend pas du découpage.
+
+Usage: python -m benchmarks.bench_analytics_rebuild [messages] [jours] [processus...]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from bot.analytics_rebuild import rebuild
+from bot.message_archive import MessageArchive
+from bot.serialization import load_file
+
+GUILD_IDS = ["376797166334640128", "422870909741957122", "100000000000000001"]
+WORDS = "je pense que c'est vraiment une bonne idée mais bon on verra demain soir mdr ptdr grave rêve lucide :hap: 😀".split()
+BATCH = 10_000
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 90
+    cores = os.cpu_count() or 1
+    workers_list = [int(arg) for arg in sys.argv[3:]] or sorted({1, *(2 ** i for i in range(1, 6) if 2 ** i <= cores), cores})
+    rng = random.Random(42)
+    first_day = date(2026, 1, 1)
+    authors = [str(10**17 + i) for i in range(2_000)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        archive_dir = os.path.join(directory, "archive")
+        archive = MessageArchive(archive_dir)
+        for batch_start in range(0, total, BATCH):
+            size = min(BATCH, total - batch_start)
+            batch = []
+            for i in range(size):
+                seconds = (batch_start + i) * days * 86400 // total
+                moment = datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=seconds)
+                guild_id = GUILD_IDS[0] if rng.random() < 0.7 else rng.choice(GUILD_IDS[1:])
+                batch.append({
+                    "ts": moment.isoformat(),
+                    "guild": guild_id,
+                    "channel": str(10**18 + rng.randrange(40)),
+                    "author": rng.choice(authors),
+                    "author_name": "membre",
+                    "content": " ".join(rng.choice(WORDS) for _ in range(rng.randrange(3, 20))),
+                    "mentions": [rng.choice(authors)] if rng.random() < 0.1 else [],
+                    "has_attachments": False,
+                    "is_reply_to": str(10**18 + batch_start + i - 1) if rng.random() < 0.2 else None,
+                    "msg_id": str(10**18 + batch_start + i),
+                })
+            archive.append(batch)
+        archive.seal_due((first_day + timedelta(days=days)).isoformat())
+        archive.close()
+        usage = archive.usage()
+
+        print(f"{total:,} messages sur {days} jours, {len(GUILD_IDS)} serveurs, {cores} cœur(s)")
+        print(f"archive {usage['bytes'] / 1024 / 1024:.1f} Mo ({usage['raw_bytes'] / 1024 / 1024:.1f} Mo de JSONL)")
+        reference = None
+        baseline = None
+        for workers in workers_list:
+            analytics_dir = os.path.join(directory, f"analytics-{workers}")
+            start = time.perf_counter()
+            rebuild(archive_dir, analytics_dir, workers)
+            elapsed = time.perf_counter() - start
+            shards = {guild_id: load_file(os.path.join(analytics_dir, f"{guild_id}.json")) for guild_id in GUILD_IDS}
+            if reference is None:
+                reference, baseline = shards, elapsed
+            print(
+                f"{workers:>3} processus  {elapsed:>7.2f} s  {total / elapsed:>10,.0f} messages/s"
+                f"  accélération x{baseline / elapsed:.2f}"
+                f"  ({'identique' if shards == reference else 'DIFFÉRENT'})"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark sauvegarde analytics: fichier unique complet vs shards des serveurs modifiés.
+
+Usage: python -m benchmarks.bench_analytics_save [serveurs] [serveurs_actifs]
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from bot.analytics_store import AnalyticsShardStore
+
+REPEATS = 5
+
+
+def fake_guild(rng: random.Random) -> dict:
+    """Serveur de taille moyenne: quelques centaines de membres, top mots, graphes."""
+    users = [str(10**17 + rng.randrange(10**17)) for _ in range(rng.randint(50, 400))]
+    top_words = {f"mot{rng.randrange(50_000)}": rng.randrange(1, 5_000) for _ in range(50)}
+    return {
+        "global_stats": {
+            "messages_total": rng.randrange(10**6),
+            "messages_by_day": [rng.randrange(10**5) for _ in range(7)],
+            "messages_by_hour": [rng.randrange(10**5) for _ in range(24)],
+            "unique_users": users,
+            "word_counts": top_words,
+            "word_counts_by_user": {u: dict(list(top_words.items())[: rng.randint(5, 50)]) for u in users},
+            "messages_by_segment_by_user": {u: {"night": 1, "morning": 2, "afternoon": 3, "evening": 4} for u in users},
+            "conversations": {f"{rng.choice(users)}_{rng.choice(users)}": rng.randrange(500) for _ in range(300)},
+        },
+        "daily_snapshots": [],
+    }
+
+
+def _best(run) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    guild_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    active = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    rng = random.Random(42)
+    data = {"_meta": {"schema_version": 2}, "_schema_history": []}
+    for i in range(guild_count):
+        data[str(10**17 + i)] = fake_guild(rng)
+    guild_ids = [key for key in data if not key.startswith("_")]
+    meta = {"_meta": data["_meta"], "_schema_history": data["_schema_history"]}
+
+    with tempfile.TemporaryDirectory() as directory:
+        single_path = os.path.join(directory, "analytics_v1.json")
+
+        def save_single():
+            with open(single_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+
+        store = AnalyticsShardStore(os.path.join(directory, "analytics"))
+        store.write({guild_id: data[guild_id] for guild_id in guild_ids}, meta)
+        dirty = {guild_id: data[guild_id] for guild_id in rng.sample(guild_ids, min(active, len(guild_ids)))}
+
+        single = _best(save_single)
+        sharded = _best(lambda: store.write(dirty, meta))
+        single_bytes = os.path.getsize(single_path)
+        shard_bytes = sum(os.path.getsize(store.guild_path(guild_id)) for guild_id in dirty)
+
+    print(f"{guild_count} serveurs, {len(dirty)} modifiés depuis la dernière sauvegarde")
+    print(f"fichier unique (indent=2)   {single * 1000:>8.1f} ms  {single_bytes / 1024 / 1024:>7.2f} Mo écrits")
+    print(f"shards modifiés (atomique)  {sharded * 1000:>8.1f} ms  {shard_bytes / 1024 / 1024:>7.2f} Mo écrits")
+
+
+if __name__ == "__main__":
+    main()
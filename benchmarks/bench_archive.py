@@ -0,0 +1,92 @@
+"""Benchmark archive: fichier JSONL unique vs segments par serveur et par jour.
+
+Mesure l'espace disque et le coût d'une requête "un serveur, une heure":
+l'ancienne archive doit être relue en entier, les segments scellés ne lisent
+que le bloc concerné.
+
+Usage: python -m benchmarks.bench_archive [jours] [serveurs] [messages_par_jour] [gzip|lzma]
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from bot.message_archive import MessageArchive
+
+WORDS = "je pense que c'est vraiment une bonne idée mais bon on verra demain soir mdr ptdr grave".split()
+
+
+def fake_day(rng: random.Random, day: date, guild_id: str, count: int) -> list:
+    users = [str(10**17 + i) for i in range(200)]
+    entries = []
+    for i in range(count):
+        seconds = i * 86400 // count
+        entries.append({
+            "ts": f"{day.isoformat()}T{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}+00:00",
+            "guild": guild_id,
+            "channel": str(rng.randrange(10)),
+            "author": rng.choice(users),
+            "author_name": "membre",
+            "content": " ".join(rng.choice(WORDS) for _ in range(rng.randrange(3, 25))),
+            "mentions": [],
+            "has_attachments": False,
+            "is_reply_to": None,
+            "msg_id": str(10**18 + rng.randrange(10**17)),
+        })
+    return entries
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    guilds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    per_day = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+    compression = sys.argv[4] if len(sys.argv) > 4 else "gzip"
+    rng = random.Random(42)
+    first_day = date(2026, 1, 1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        legacy_path = os.path.join(directory, "messages_archive_v1.jsonl")
+        archive = MessageArchive(os.path.join(directory, "archive"), compression)
+        with open(legacy_path, 'w', encoding='utf-8') as legacy:
+            for offset in range(days):
+                day = first_day + timedelta(days=offset)
+                for guild in range(guilds):
+                    entries = fake_day(rng, day, str(guild), per_day)
+                    for entry in entries:
+                        legacy.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                    archive.append(entries)
+        seal_start = time.perf_counter()
+        archive.seal_due((first_day + timedelta(days=days)).isoformat())
+        seal_time = time.perf_counter() - seal_start
+        usage = archive.usage()
+        legacy_bytes = os.path.getsize(legacy_path)
+
+        # Requête: serveur 0, une heure au milieu de la période
+        query_day = (first_day + timedelta(days=days // 2)).isoformat()
+        query = ("0", f"{query_day}T12:00:00", f"{query_day}T13:00:00")
+
+        start = time.perf_counter()
+        legacy_hits = 0
+        with open(legacy_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry["guild"] == query[0] and query[1] <= entry["ts"] < query[2]:
+                    legacy_hits += 1
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        segment_hits = sum(1 for _ in archive.iter_messages(*query))
+        segment_time = time.perf_counter() - start
+
+    print(f"{usage['messages']:,} messages, {days} jours x {guilds} serveurs ({usage['segments']} segments, {compression})")
+    print(f"fichier unique   {legacy_bytes / 1024 / 1024:>8.1f} Mo   requête 1h: {legacy_time * 1000:>8.1f} ms ({legacy_hits} messages)")
+    print(f"segments scellés {usage['bytes'] / 1024 / 1024:>8.1f} Mo   requête 1h: {segment_time * 1000:>8.1f} ms ({segment_hits} messages)")
+    print(f"scellement: {seal_time:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Benchmark requêtes archive: relecture complète du JSONL vs index de segments + mmap.
+
+Requête type: "messages de l'auteur X dans le canal Y le mois dernier".
+
+Usage: python -m benchmarks.bench_archive_query [messages] [jours]
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from bot.archive_query import ArchiveQuery
+from bot.message_archive import MessageArchive
+
+GUILD_ID = "376797166334640128"
+WORDS = "je pense que c'est vraiment une bonne idée mais bon on verra demain soir mdr ptdr grave".split()
+BATCH = 10_000
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 120
+    rng = random.Random(42)
+    first_day = date(2026, 1, 1)
+    authors = [10**17 + i for i in range(2_000)]
+    channels = [10**18 + i for i in range(40)]
+    # Distribution réaliste: quelques membres et canaux très actifs
+    author_weights = [1 / (rank + 1) for rank in range(len(authors))]
+    channel_weights = [1 / (rank + 1) for rank in range(len(channels))]
+
+    with tempfile.TemporaryDirectory() as directory:
+        legacy_path = os.path.join(directory, "messages_archive_v1.jsonl")
+        archive = MessageArchive(os.path.join(directory, "archive"))
+        start = time.perf_counter()
+        with open(legacy_path, 'w', encoding='utf-8') as legacy:
+            for batch_start in range(0, total, BATCH):
+                size = min(BATCH, total - batch_start)
+                picked_authors = rng.choices(authors, author_weights, k=size)
+                picked_channels = rng.choices(channels, channel_weights, k=size)
+                batch = []
+                for i in range(size):
+                    seconds = (batch_start + i) * days * 86400 // total
+                    moment = datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=seconds)
+                    entry = {
+                        "ts": moment.isoformat(),
+                        "guild": GUILD_ID,
+                        "channel": str(picked_channels[i]),
+                        "author": str(picked_authors[i]),
+                        "author_name": "membre",
+                        "content": " ".join(rng.choice(WORDS) for _ in range(rng.randrange(3, 20))),
+                        "mentions": [],
+                        "has_attachments": False,
+                        "is_reply_to": None,
+                        "msg_id": str(10**18 + batch_start + i),
+                    }
+                    legacy.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                    batch.append(entry)
+                archive.append(batch)
+        # Tout est scellé sauf la dernière journée (segment actif)
+        archive.seal_due((first_day + timedelta(days=days - 1)).isoformat())
+        archive.close()
+        build_time = time.perf_counter() - start
+
+        author, channel = str(authors[3]), str(channels[1])
+        until = datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(days=days)
+        since = until - timedelta(days=30)
+
+        start = time.perf_counter()
+        legacy_hits = 0
+        with open(legacy_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                if (
+                    entry["author"] == author and entry["channel"] == channel
+                    and since.isoformat() <= entry["ts"] < until.isoformat()
+                ):
+                    legacy_hits += 1
+        legacy_time = time.perf_counter() - start
+
+        query = ArchiveQuery(os.path.join(directory, "archive"))
+        start = time.perf_counter()
+        hits = sum(1 for _ in query.search(GUILD_ID, int(channel), int(author), since, until))
+        cold_time = time.perf_counter() - start
+        start = time.perf_counter()
+        hits = sum(1 for _ in query.search(GUILD_ID, int(channel), int(author), since, until))
+        warm_time = time.perf_counter() - start
+        start = time.perf_counter()
+        counted = query.count(GUILD_ID, int(channel), int(author), since, until)
+        count_time = time.perf_counter() - start
+
+    print(f"{total:,} messages sur {days} jours (construction {build_time:.1f} s)")
+    print(f"requête: auteur, canal, 30 derniers jours -> {hits} messages")
+    print(f"relecture JSONL complète   {legacy_time * 1000:>9.1f} ms  ({legacy_hits} messages)")
+    print(f"index + mmap (1re requête) {cold_time * 1000:>9.1f} ms")
+    print(f"index + mmap (index chaud) {warm_time * 1000:>9.1f} ms")
+    print(f"comptage (index seul)      {count_time * 1000:>9.1f} ms  ({counted} messages)")
+
+
+if __name__ == "__main__":
+    main()
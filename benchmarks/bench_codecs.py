@@ -0,0 +1,86 @@
+"""Benchmark des codecs de fichiers d'état: temps d'écriture, de relecture et taille.
+
+Usage: python -m benchmarks.bench_codecs [taille_Mo ...]   (défaut: 1 10 100)
+
+La taille visée est celle du JSON compact; les données imitent des shards
+analytics (compteurs de mots par utilisateur, conversations, snapshots).
+"""
+
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+
+from bot.serialization import CODECS, JSON_CODEC, dump_file, load_file
+
+REPEATS = 3
+
+
+def fake_guild(rng: random.Random, vocab: list) -> dict:
+    users = [str(10**17 + rng.randrange(10**17)) for _ in range(rng.randint(200, 600))]
+    return {
+        "global_stats": {
+            "messages_total": rng.randrange(10**6),
+            "messages_by_hour": [rng.randrange(10**5) for _ in range(24)],
+            "unique_users": users,
+            "word_counts": {word: rng.randrange(1, 10**5) for word in rng.sample(vocab, 50)},
+            "word_counts_by_user": {
+                user: {word: rng.randrange(1, 5_000) for word in rng.sample(vocab, 50)} for user in users
+            },
+            "messages_by_segment_by_user": {
+                user: {"night": rng.randrange(99), "morning": rng.randrange(99), "afternoon": 3, "evening": 4}
+                for user in users
+            },
+            "conversations": {f"{rng.choice(users)}_{rng.choice(users)}": rng.randrange(500) for _ in range(500)},
+        },
+        "daily_snapshots": [
+            {"date": f"2024-01-{day:02d}", "messages": rng.randrange(10**4), "active_users": rng.randrange(500)}
+            for day in range(1, 29)
+        ],
+    }
+
+
+def build_tree(target_mb: float, rng: random.Random) -> dict:
+    """Serveurs générés jusqu'à atteindre ~target_mb Mo de JSON compact."""
+    vocab = [f"mot{i}" for i in range(20_000)] + ["été", "ça", "déjà", "😂", "🔥"]
+    data = {"_meta": {"schema_version": 2}}
+    size = 0
+    while size < target_mb * 1024 * 1024:
+        guild = fake_guild(rng, vocab)
+        data[str(10**17 + len(data))] = guild
+        size += len(JSON_CODEC.dumps(guild))
+    return data
+
+
+def _best(run) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+        gc.collect()
+    return best
+
+
+def main():
+    sizes = [float(arg) for arg in sys.argv[1:]] or [1, 10, 100]
+    rng = random.Random(42)
+    print(f"codecs disponibles: {', '.join(CODECS)}")
+    for target_mb in sizes:
+        data = build_tree(target_mb, rng)
+        print(f"\n~{target_mb:g} Mo de JSON compact ({len(data) - 1} serveurs)")
+        print(f"{'codec':<10}{'écriture':>12}{'relecture':>12}{'taille':>12}")
+        with tempfile.TemporaryDirectory() as directory:
+            for name, codec in CODECS.items():
+                path = os.path.join(directory, f"state.{name}")
+                dump = _best(lambda: dump_file(path, data, codec))
+                load = _best(lambda: load_file(path))
+                size_mb = os.path.getsize(path) / 1024 / 1024
+                print(f"{name:<10}{dump * 1000:>9.0f} ms{load * 1000:>9.0f} ms{size_mb:>9.1f} Mo")
+                os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Benchmark agrégations hors ligne: archive JSONL (segments) vs export en colonnes.
+
+Deux questions sur tout l'historique: messages par auteur, messages par
+heure UTC. L'archive doit décompresser et décoder chaque ligne JSON; les
+colonnes ne lisent que `author` ou `ts`.
+
+Usage: python -m benchmarks.bench_columns [messages] [jours]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+from bot.archive_columns import ColumnReader, convert
+from bot.message_archive import MessageArchive
+
+GUILD_ID = "376797166334640128"
+WORDS = "je pense que c'est vraiment une bonne idée mais bon on verra demain soir mdr ptdr grave".split()
+BATCH = 10_000
+
+
+def measure(function):
+    """(résultat, durée, pic mémoire): durée mesurée sans tracemalloc, qui ralentit beaucoup."""
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 90
+    rng = random.Random(42)
+    first_day = date(2026, 1, 1)
+    authors = [str(10**17 + i) for i in range(2_000)]
+    names = {author: f"membre{i}" for i, author in enumerate(authors)}
+
+    with tempfile.TemporaryDirectory() as directory:
+        archive_dir = os.path.join(directory, "archive")
+        columns_dir = os.path.join(directory, "columns")
+        archive = MessageArchive(archive_dir)
+        for batch_start in range(0, total, BATCH):
+            size = min(BATCH, total - batch_start)
+            batch = []
+            for i in range(size):
+                seconds = (batch_start + i) * days * 86400 // total
+                moment = datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=seconds)
+                author = rng.choice(authors)
+                batch.append({
+                    "ts": moment.isoformat(),
+                    "guild": GUILD_ID,
+                    "channel": str(10**18 + rng.randrange(40)),
+                    "author": author,
+                    "author_name": names[author],
+                    "content": " ".join(rng.choice(WORDS) for _ in range(rng.randrange(3, 20))),
+                    "mentions": [rng.choice(authors)] if rng.random() < 0.1 else [],
+                    "has_attachments": rng.random() < 0.05,
+                    "is_reply_to": str(10**18 + batch_start + i - 1) if rng.random() < 0.2 else None,
+                    "msg_id": str(10**18 + batch_start + i),
+                })
+            archive.append(batch)
+        archive.seal_due((first_day + timedelta(days=days)).isoformat())
+        archive.close()
+        archive_bytes = archive.usage()["bytes"]
+        start = time.perf_counter()
+        convert(archive_dir, columns_dir)
+        convert_time = time.perf_counter() - start
+        columns_bytes = sum(os.path.getsize(os.path.join(columns_dir, name)) for name in os.listdir(columns_dir))
+
+        print(f"{total:,} messages sur {days} jours")
+        print(f"archive {archive_bytes / 1024 / 1024:.1f} Mo, colonnes {columns_bytes / 1024 / 1024:.1f} Mo "
+              f"(conversion {convert_time:.1f} s)")
+
+        def archive_authors():
+            return Counter(entry["author"] for entry in MessageArchive(archive_dir).iter_messages())
+
+        def archive_hours():
+            return Counter(int(entry["ts"][11:13]) for entry in MessageArchive(archive_dir).iter_messages())
+
+        readers = {}
+
+        def columns_authors():
+            readers["authors"] = reader = ColumnReader(columns_dir)
+            return reader.value_counts("author")
+
+        def columns_hours():
+            readers["hours"] = reader = ColumnReader(columns_dir)
+            hours = Counter()
+            for group in reader.read(("ts",)):
+                hours.update(ts // 3_600_000 % 24 for ts in group["ts"])
+            return hours
+
+        for label, scan, columnar, key in (
+            ("messages par auteur", archive_authors, columns_authors, "authors"),
+            ("messages par heure", archive_hours, columns_hours, "hours"),
+        ):
+            expected, scan_time, scan_peak = measure(scan)
+            result, columns_time, columns_peak = measure(columnar)
+            same = {str(k): v for k, v in result.items()} == {str(k): v for k, v in expected.items()}
+            print(f"{label} ({'identique' if same else 'DIFFÉRENT'})")
+            print(f"  archive JSONL  {scan_time * 1000:>8.1f} ms  lu {archive_bytes / 1024:>8.0f} Ko"
+                  f"  pic mémoire {scan_peak / 1024 / 1024:>6.1f} Mo")
+            print(f"  colonnes       {columns_time * 1000:>8.1f} ms  lu {readers[key].bytes_read / 1024:>8.0f} Ko"
+                  f"  pic mémoire {columns_peak / 1024 / 1024:>6.1f} Mo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark cache des conversations: une deque par canal pour toujours vs `ConversationCache`.
+
+Serveur riche en fils et en posts de forum: chaque fil vit quelques
+minutes puis n'est plus jamais écrit, quelques salons restent actifs en
+permanence. Même flux de messages pour les deux caches:
+- avant: {canal: deque(maxlen=20)}, nettoyé seulement quand le canal
+  reçoit un nouveau message (les fils morts restent);
+- après: budget global, éviction LRU des canaux, balayage périodique.
+Compare la mémoire (finale et pic), le temps par message et les partenaires
+trouvés (le budget peut évincer un canal encore actif).
+
+Usage: python -m benchmarks.bench_conversation_cache [messages] [fils] [budget]
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime, timedelta
+
+from bot.analytics_stats import cached_partner
+from bot.constants import ANALYTICS_MESSAGE_CACHE_SIZE, ANALYTICS_MESSAGE_CACHE_TTL_SECONDS
+from bot.conversation_cache import ConversationCache
+
+SALONS = 20
+SWEEP_EVERY = timedelta(minutes=5)
+
+
+def make_stream(total: int, threads: int, rng: random.Random) -> list:
+    """(canal, auteur, horodatage): 60 % des messages dans les salons, le reste dans des fils courts."""
+    authors = [str(10**17 + i) for i in range(300)]
+    thread_length = max(1, total * 4 // 10 // threads)
+    stream = []
+    moment = datetime(2026, 1, 1)
+    thread = 0
+    left = 0
+    for _ in range(total):
+        moment += timedelta(seconds=rng.choice([0.2, 0.5, 1, 2, 5]))
+        if rng.random() < 0.6:
+            channel_id = str(10**18 + rng.randrange(SALONS))
+        else:
+            if left == 0:
+                thread, left = thread + 1, thread_length
+            left -= 1
+            channel_id = str(2 * 10**18 + thread)
+        stream.append((channel_id, rng.choice(authors), moment))
+    return stream
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    budget = int(sys.argv[3]) if len(sys.argv) > 3 else 5_000
+    stream = make_stream(total, threads, random.Random(42))
+    ttl = timedelta(seconds=ANALYTICS_MESSAGE_CACHE_TTL_SECONDS)
+
+    def old_cache():
+        caches = {}
+        found = 0
+        for channel_id, author_id, timestamp in stream:
+            cache = caches.get(channel_id)
+            if cache is None:
+                cache = caches[channel_id] = deque(maxlen=ANALYTICS_MESSAGE_CACHE_SIZE)
+            while cache and cache[0][1] < timestamp - ttl:
+                cache.popleft()
+            cache.append((author_id, timestamp))
+            found += cached_partner(cache, author_id, timestamp) is not None
+        return caches, found
+
+    def new_cache():
+        cache = ConversationCache(budget, ANALYTICS_MESSAGE_CACHE_SIZE, ANALYTICS_MESSAGE_CACHE_TTL_SECONDS)
+        next_sweep = stream[0][2] + SWEEP_EVERY
+        found = 0
+        for channel_id, author_id, timestamp in stream:
+            if timestamp >= next_sweep:
+                cache.sweep(timestamp)
+                next_sweep = timestamp + SWEEP_EVERY
+            cache.add(channel_id, author_id, timestamp)
+            found += cache.partner(channel_id, author_id, timestamp) is not None
+        return cache, found
+
+    print(f"{total:,} messages, {SALONS} salons, {threads:,} fils, budget {budget:,} messages")
+    for label, run in (("avant", old_cache), ("après", new_cache)):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        cache, found = run()
+        memory, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if isinstance(cache, ConversationCache):
+            stats = cache.stats()
+            channels, entries = stats["channels"], stats["entries"]
+        else:
+            channels, entries = len(cache), sum(map(len, cache.values()))
+        print(f"{label:<6} {elapsed * 1e6 / total:5.2f} µs/message  {memory / 1024 / 1024:7.2f} Mo (pic {peak / 1024 / 1024:.2f})  "
+              f"{channels:>7,} canaux  {entries:>8,} messages  partenaire trouvé {found / total:.2%}")
+        if isinstance(cache, ConversationCache):
+            print(f"       estimation {stats['memory_bytes'] / 1024 / 1024:.2f} Mo, "
+                  f"{stats['evicted_channels']:,} canaux évincés, {stats['expired_entries']:,} messages expirés")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark: CooldownStore vs dictionnaire sans éviction, sur des millions d'utilisateurs.
+
+Usage: python -m benchmarks.bench_cooldowns [nombre_de_messages]
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+
+from bot.cooldowns import CooldownStore
+
+WINDOW_SECONDS = 15
+MESSAGES_PER_SECOND = 2_000
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def legacy_check(cooldowns: dict, key, now: float) -> bool:
+    if key in cooldowns:
+        if now - cooldowns[key] < WINDOW_SECONDS:
+            return False
+    cooldowns[key] = now
+    return True
+
+
+def _run(label: str, check, messages: list, clock: FakeClock, size):
+    tracemalloc.start()
+    start = time.perf_counter()
+    accepted = 0
+    for i, key in enumerate(messages):
+        clock.now = i / MESSAGES_PER_SECOND
+        accepted += check(key)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:<16} {elapsed:>7.2f}s  {len(messages) / elapsed:>12,.0f} msg/s  "
+        f"entrées={size():>10,}  pic mémoire={peak / 1024 / 1024:>8.1f} Mo  acceptés={accepted:,}"
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3_000_000
+    rng = random.Random(42)
+    # 80% d'utilisateurs jamais vus, 20% d'utilisateurs récents (re-hits)
+    messages = []
+    next_user = 0
+    for _ in range(count):
+        if next_user and rng.random() < 0.2:
+            user = rng.randrange(max(0, next_user - 50_000), next_user)
+        else:
+            user = next_user
+            next_user += 1
+        messages.append((1, user))
+    print(f"{count:,} messages, {next_user:,} utilisateurs distincts, fenêtre {WINDOW_SECONDS}s")
+
+    clock = FakeClock()
+    legacy: dict = {}
+    _run("dict (ancien)", lambda key: legacy_check(legacy, key, clock.now), messages, clock, lambda: len(legacy))
+
+    clock = FakeClock()
+    store = CooldownStore(WINDOW_SECONDS, clock=clock)
+    _run("CooldownStore", store.try_acquire, messages, clock, lambda: len(store))
+
+
+if __name__ == "__main__":
+    main()
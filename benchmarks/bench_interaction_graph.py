@@ -0,0 +1,118 @@
+"""Benchmark graphes de conversations et de mentions: dicts JSON vs `PairGraph`.
+
+Même flux d'interactions (distribution de Zipf: quelques paires très
+actives, une longue traîne de paires vues une fois) compté de deux façons:
+- avant: clé chaîne "userA_userB" construite à chaque réponse, mentions
+  stockées deux fois (`given` et `received`, dicts imbriqués);
+- après: `PairGraph` (clés entières, une table d'arêtes, au plus k voisins
+  par membre).
+Mesure le temps par interaction, la mémoire des structures et la requête
+"avec qui X parle-t-il le plus" (avant: parcours de toutes les paires), pour
+des membres pris parmi les 1000 plus actifs.
+
+Usage: python -m benchmarks.bench_interaction_graph [interactions] [membres] [k]
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+
+from bot.constants import ANALYTICS_GRAPH_MAX_EDGES_PER_USER
+from bot.interaction_graph import PairGraph
+
+QUERIES = 200
+
+
+def zipf_users(rng: random.Random, users: list, total: int) -> list:
+    weights = [1 / (rank + 1) for rank in range(len(users))]
+    return rng.choices(users, weights=weights, k=total)
+
+
+def measure(function):
+    """(résultat, durée en s, mémoire allouée restante en Mo): durée sans tracemalloc, qui ralentit les allocations."""
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = function()
+    memory = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+    tracemalloc.stop()
+    return result, elapsed, memory
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    members = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else ANALYTICS_GRAPH_MAX_EDGES_PER_USER
+    rng = random.Random(42)
+    users = [10**17 + rng.randrange(10**17) for _ in range(members)]
+    pairs = list(zip(zipf_users(rng, users, total), zipf_users(rng, users, total)))
+    pairs = [(a, b) for a, b in pairs if a != b]
+
+    def old_counts():
+        conversations = {}
+        given = {}
+        received = {}
+        for a, b in pairs:
+            author_id, other_id = str(a), str(b)
+            key = "_".join(sorted([author_id, other_id]))
+            conversations[key] = conversations.get(key, 0) + 1
+            targets = given.setdefault(author_id, {})
+            targets[other_id] = targets.get(other_id, 0) + 1
+            sources = received.setdefault(other_id, {})
+            sources[author_id] = sources.get(author_id, 0) + 1
+        return conversations, given, received
+
+    def new_counts():
+        conversations = PairGraph(k, directed=False)
+        mentions = PairGraph(k, directed=True)
+        for a, b in pairs:
+            conversations.add(a, b)
+            mentions.add(a, b)
+        return conversations, mentions
+
+    (conversations, given, received), old_time, old_memory = measure(old_counts)
+    (graph, mentions), new_time, new_memory = measure(new_counts)
+
+    print(f"{len(pairs):,} interactions (conversation + mention), {members:,} membres, k={k}")
+    print(f"avant   {old_time * 1e6 / len(pairs):6.2f} µs/interaction  {old_memory:7.1f} Mo  "
+          f"{len(conversations):,} paires, {sum(map(len, given.values())) * 2:,} entrées de mentions")
+    print(f"après   {new_time * 1e6 / len(pairs):6.2f} µs/interaction  {new_memory:7.1f} Mo  "
+          f"{len(graph):,} paires, {len(mentions):,} arêtes de mentions")
+
+    # Partenaires d'un membre: avant, toutes les clés de paires; après, ses k voisins
+    queried = rng.sample(users[:1000], min(QUERIES, members))
+
+    def old_partners(user: int) -> list:
+        user_id = str(user)
+        found = []
+        for key, count in conversations.items():
+            a, _, b = key.partition("_")
+            if a == user_id:
+                found.append((int(b), count))
+            elif b == user_id:
+                found.append((int(a), count))
+        found.sort(key=lambda item: (-item[1], item[0]))
+        return found[:10]
+
+    start = time.perf_counter()
+    expected = [old_partners(user) for user in queried]
+    old_query = (time.perf_counter() - start) * 1000 / len(queried)
+    start = time.perf_counter()
+    result = [graph.neighbors(user, 10) for user in queried]
+    new_query = (time.perf_counter() - start) * 1000 / len(queried)
+    # Partenaires retrouvés: ceux du vrai top 10 sans ex aequo au 10e rang (les comptes évincés puis revenus sont des bornes basses)
+    found = total_strict = 0
+    for partners, exact in zip(result, expected):
+        if not exact:
+            continue
+        strict = {other for other, count in exact if count > exact[-1][1]}
+        found += len(strict & {other for other, _ in partners})
+        total_strict += len(strict)
+    print(f"top 10 partenaires  avant {old_query:8.3f} ms  après {new_query:8.4f} ms  "
+          f"(rappel {found / max(1, total_strict):.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Benchmark: courbe précalculée vs boucles historiques de calcul de niveau.
+
+Usage: python -m benchmarks.bench_levels
+"""
+
+import random
+import time
+
+from bot.levels import LevelCurve, power_curve
+
+
+def legacy_calculate_level(xp):
+    level = 1
+    while xp >= 100 * (level ** 1.5):
+        xp -= 100 * (level ** 1.5)
+        level += 1
+    return level
+
+
+def legacy_get_level_progress(xp):
+    level = 1
+    xp_remaining = xp
+    while xp_remaining >= 100 * (level ** 1.5):
+        xp_remaining -= 100 * (level ** 1.5)
+        level += 1
+    xp_for_next = 100 * (level ** 1.5)
+    return (xp_remaining / xp_for_next) * 100, level
+
+
+def _timeit(func, values) -> float:
+    start = time.perf_counter()
+    for value in values:
+        func(value)
+    return time.perf_counter() - start
+
+
+def main():
+    rng = random.Random(42)
+    curve = LevelCurve(power_curve(100, 1.5))
+    print(f"{'xp max':>14} {'n':>6} {'legacy level':>13} {'curve level':>12} {'batch':>10} {'legacy prog':>12} {'curve prog':>11}")
+    for max_xp in (10_000, 1_000_000, 100_000_000, 10_000_000_000):
+        n = 2_000
+        values = [rng.randint(0, max_xp) for _ in range(n)]
+
+        mismatches = sum(1 for xp in values if legacy_calculate_level(xp) != curve.level(xp))
+
+        t_legacy = _timeit(legacy_calculate_level, values)
+        t_curve = _timeit(curve.level, values)
+        start = time.perf_counter()
+        curve.levels(values)
+        t_batch = time.perf_counter() - start
+        t_legacy_prog = _timeit(legacy_get_level_progress, values)
+        t_curve_prog = _timeit(curve.progress, values)
+
+        print(
+            f"{max_xp:>14,} {n:>6} {t_legacy * 1000:>11.2f}ms {t_curve * 1000:>10.2f}ms "
+            f"{t_batch * 1000:>8.2f}ms {t_legacy_prog * 1000:>10.2f}ms {t_curve_prog * 1000:>9.2f}ms"
+            + (f"  ({mismatches} écarts d'arrondi)" if mismatches else "")
+        )
+
+
+if __name__ == "__main__":
+    main()
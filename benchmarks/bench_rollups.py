@@ -0,0 +1,120 @@
+"""Benchmark séries d'activité (daily_snapshots) vs comptage sur l'archive.
+
+Mêmes messages écrits dans l'archive et comptés dans les séries. Questions:
+messages des 7 derniers jours (jour par jour), mois en cours contre mois
+précédent, dernières 24 h d'un canal. L'archive répond avec son index
+(`ArchiveQuery.count`, sans relire les messages); les séries lisent quelques
+buckets.
+
+Usage: python -m benchmarks.bench_rollups [messages] [jours] [canaux]
+"""
+
+import marshal
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from bot.archive_query import ArchiveQuery
+from bot.message_archive import MessageArchive
+from bot.time_rollups import GuildRollups, month_bounds
+
+GUILD_ID = "376797166334640128"
+BATCH = 10_000
+REPEAT = 20
+
+
+def timed(function):
+    """(résultat, durée moyenne en ms)."""
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        result = function()
+    return result, (time.perf_counter() - start) * 1000 / REPEAT
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 90
+    channels = int(sys.argv[3]) if len(sys.argv) > 3 else 40
+    rng = random.Random(42)
+    first_day = date(2026, 1, 1)
+    channel_ids = [str(10**18 + i) for i in range(channels)]
+    rollups = GuildRollups()
+
+    with tempfile.TemporaryDirectory() as directory:
+        archive_dir = os.path.join(directory, "archive")
+        archive = MessageArchive(archive_dir)
+        add_time = 0.0
+        for batch_start in range(0, total, BATCH):
+            size = min(BATCH, total - batch_start)
+            batch = []
+            for i in range(size):
+                seconds = (batch_start + i) * days * 86400 // total
+                moment = datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=seconds)
+                batch.append({
+                    "ts": moment.isoformat(),
+                    "guild": GUILD_ID,
+                    "channel": rng.choice(channel_ids),
+                    "author": str(10**17 + rng.randrange(500)),
+                    "author_name": "membre",
+                    "content": "bonjour",
+                    "mentions": [],
+                    "has_attachments": False,
+                    "is_reply_to": None,
+                    "msg_id": str(10**18 + batch_start + i),
+                })
+            start = time.perf_counter()
+            for entry in batch:
+                # UTC pour comparer avec les jours de l'archive (le cog compte en heure de Paris)
+                rollups.add(entry["channel"], datetime.fromisoformat(entry["ts"]))
+            add_time += time.perf_counter() - start
+            archive.append(batch)
+        last_day = first_day + timedelta(days=days - 1)
+        archive.seal_due(last_day.isoformat())
+        archive.close()
+        query = ArchiveQuery(archive_dir)
+        now = datetime.combine(last_day, datetime.max.time(), tzinfo=timezone.utc)
+        size = len(marshal.dumps(rollups.to_data()))
+
+        print(f"{total:,} messages sur {days} jours, {channels} canaux")
+        print(f"séries: {add_time * 1e6 / total:.2f} µs par message, {size / 1024:.0f} Ko sérialisées "
+              f"({channels + 1} séries de {size / (channels + 1) / 1024:.1f} Ko)")
+
+        def utc(day: date) -> datetime:
+            return datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc)
+
+        week_days = [last_day - timedelta(days=offset) for offset in range(6, -1, -1)]
+        this_month, previous_month = month_bounds(last_day), month_bounds(last_day, 1)
+        channel_id = channel_ids[0]
+        for label, from_archive, from_rollups in (
+            (
+                "7 derniers jours (par jour)",
+                lambda: [query.count(GUILD_ID, since=utc(day), until=utc(day + timedelta(days=1))) for day in week_days],
+                lambda: rollups.recent("day", 7, now),
+            ),
+            (
+                "mois en cours / précédent",
+                lambda: [query.count(GUILD_ID, since=utc(a), until=utc(b)) for a, b in (this_month, previous_month)],
+                lambda: [rollups.count_days(a, b) for a, b in (this_month, previous_month)],
+            ),
+            (
+                "24 h d'un canal (par heure)",
+                lambda: [
+                    query.count(GUILD_ID, channel_id=int(channel_id), since=now - timedelta(hours=hours + 1) + timedelta(microseconds=1),
+                                until=now - timedelta(hours=hours) + timedelta(microseconds=1))
+                    for hours in range(23, -1, -1)
+                ],
+                lambda: rollups.recent("hour", 24, now, channel_id),
+            ),
+        ):
+            expected, archive_ms = timed(from_archive)
+            result, rollups_ms = timed(from_rollups)
+            print(f"{label} ({'identique' if result == expected else 'DIFFÉRENT'})")
+            print(f"  archive (index)  {archive_ms:>9.2f} ms")
+            print(f"  séries           {rollups_ms:>9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
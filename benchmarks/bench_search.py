@@ -0,0 +1,98 @@
+"""Benchmark recherche plein texte: relecture de l'archive vs index inversé.
+
+Construit une archive (segments scellés + journée active) avec son index
+plein texte, puis cherche des mots rares et courants: relecture complète
+(tokenizer sur chaque message) contre `ArchiveQuery.search_text`.
+
+Usage: python -m benchmarks.bench_search [messages] [jours]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from itertools import accumulate
+
+from bot.archive_query import ArchiveQuery
+from bot.message_archive import MessageArchive
+from bot.text_index import TERMS_SUFFIX, terms
+
+GUILD_ID = "376797166334640128"
+BATCH = 10_000
+VOCABULARY = 20_000
+QUERIES = ["rêve lucide", "mot0042 mot1337", "mot0003", "mot0001 mot0002 mot0005"]
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 90
+    rng = random.Random(42)
+    first_day = date(2026, 1, 1)
+    # Vocabulaire de Zipf: quelques mots très fréquents, une longue traîne de mots rares
+    words = [f"mot{i:04d}" for i in range(VOCABULARY)] + ["rêve", "lucide", "je", "pense", "que", "mdr"]
+    weights = [1 / (rank + 1) for rank in range(VOCABULARY)] + [0.02, 0.01, 1.0, 0.5, 1.0, 0.5]
+    cum_weights = list(accumulate(weights))
+
+    with tempfile.TemporaryDirectory() as directory:
+        archive_dir = os.path.join(directory, "archive")
+        archive = MessageArchive(archive_dir)
+        start = time.perf_counter()
+        for batch_start in range(0, total, BATCH):
+            size = min(BATCH, total - batch_start)
+            batch = []
+            for i in range(size):
+                seconds = (batch_start + i) * days * 86400 // total
+                moment = datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=seconds)
+                batch.append({
+                    "ts": moment.isoformat(),
+                    "guild": GUILD_ID,
+                    "channel": str(10**18 + rng.randrange(20)),
+                    "author": str(10**17 + rng.randrange(500)),
+                    "author_name": "membre",
+                    "content": " ".join(rng.choices(words, cum_weights=cum_weights, k=rng.randrange(3, 20))),
+                    "mentions": [],
+                    "has_attachments": False,
+                    "is_reply_to": None,
+                    "msg_id": str(10**18 + batch_start + i),
+                })
+            archive.append(batch)
+        # Tout est scellé sauf la dernière journée; les mois terminés sont fusionnés
+        archive.seal_due((first_day + timedelta(days=days - 1)).isoformat())
+        archive.close()
+        build_time = time.perf_counter() - start
+        guild_dir = os.path.join(archive_dir, GUILD_ID)
+        runs = [name for name in os.listdir(guild_dir) if name.endswith(TERMS_SUFFIX)]
+        index_bytes = sum(os.path.getsize(os.path.join(guild_dir, name)) for name in runs)
+        usage = archive.usage()
+
+        print(f"{total:,} messages sur {days} jours (construction {build_time:.1f} s)")
+        print(
+            f"archive {usage['bytes'] / 1024 / 1024:.1f} Mo, "
+            f"index plein texte {index_bytes / 1024 / 1024:.1f} Mo ({len(runs)} runs)"
+        )
+        query = ArchiveQuery(archive_dir)
+        for text in QUERIES:
+            wanted = set(terms(text))
+            start = time.perf_counter()
+            scan_hits = sum(
+                1 for entry in archive.iter_messages(GUILD_ID)
+                if wanted & set(terms(entry["content"]))
+            )
+            scan_time = time.perf_counter() - start
+            start = time.perf_counter()
+            query.search_text(GUILD_ID, text, 10)
+            cold_time = time.perf_counter() - start
+            start = time.perf_counter()
+            hits = query.search_text(GUILD_ID, text, 10)
+            warm_time = time.perf_counter() - start
+            print(
+                f"{text!r:<28} {scan_hits:>7} messages | relecture {scan_time * 1000:>8.1f} ms"
+                f" | index {cold_time * 1000:>7.1f} ms (1re) {warm_time * 1000:>7.1f} ms (chaud)"
+                f" | meilleur score {hits[0].score if hits else 0:.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
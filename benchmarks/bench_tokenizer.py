@@ -0,0 +1,106 @@
+"""Benchmark + vérification: tokenizer en une passe vs ancienne chaîne de regex.
+
+Vérifie d'abord que `tokenize` donne exactement le même résultat que
+`legacy_tokenize` (mots, mots retenus, emojis) sur chaque message du corpus,
+puis mesure le débit en messages par seconde.
+
+Usage: python -m benchmarks.bench_tokenizer [data/archive | fichier.jsonl] [répétitions]
+Sans archive, un corpus synthétique est généré.
+"""
+
+import json
+import os
+import random
+import sys
+import time
+
+from bot.message_archive import MessageArchive
+from bot.tokenizer import legacy_tokenize, tokenize
+
+DEFAULT_ARCHIVE = "data/archive"
+
+_SYNTHETIC_WORDS = (
+    "je pense que c'est vraiment une bonne idée mais bon on verra demain soir avec les autres "
+    "mdr franchement jsp quoi dire ptdr trop bien le film était génial hier aaaa ouais grave "
+    "carrément Été ÇA 2024 déjà voilà ΟΔΟΣ ß"
+).split()
+_SYNTHETIC_EXTRAS = [
+    "😂", "👍🏽", "🇫🇷", "©", "<:hap:1234>", "<a:noel:5678>", ":hap:", ":noel:", "...", "!!", "?",
+    "(ok)", "[lien]", "#tag", "@here", "<@123456789012345678>", "<@!42>", "<#99>",
+    "https://tenor.com/view/x-123", "voirhttps://a.b", ":http://x:",
+]
+
+
+def load_corpus(path: str) -> list[str]:
+    if os.path.isdir(path):
+        return [entry["content"] for entry in MessageArchive(path).iter_messages() if entry.get("content")]
+    contents = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("content"):
+                contents.append(entry["content"])
+    return contents
+
+
+def synthetic_corpus(count: int) -> list[str]:
+    rng = random.Random(42)
+    corpus = []
+    for _ in range(count):
+        pieces = [rng.choice(_SYNTHETIC_WORDS) for _ in range(rng.randrange(1, 20))]
+        # ~1 message sur 5 avec un emoji, un lien, une mention ou de la ponctuation
+        if rng.random() < 0.2:
+            pieces.insert(rng.randrange(len(pieces) + 1), rng.choice(_SYNTHETIC_EXTRAS))
+        corpus.append(" ".join(pieces))
+    return corpus
+
+
+def check_equivalence(corpus: list[str]) -> int:
+    mismatches = 0
+    for content in corpus:
+        expected = legacy_tokenize(content)
+        actual = tokenize(content)
+        if actual != expected:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f"DIFF {content!r}\n  attendu: {expected}\n  obtenu:  {actual}")
+    return mismatches
+
+
+def _throughput(func, corpus: list[str], repeat: int) -> float:
+    """Messages par seconde (meilleur de `repeat` passages sur le corpus)."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for content in corpus:
+            func(content)
+        best = min(best, time.perf_counter() - start)
+    return len(corpus) / best
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_ARCHIVE
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    if os.path.exists(path):
+        corpus = load_corpus(path)
+        print(f"Corpus: {len(corpus):,} messages ({path})")
+    else:
+        corpus = synthetic_corpus(50_000)
+        print(f"Corpus synthétique: {len(corpus):,} messages ({path} introuvable)")
+
+    mismatches = check_equivalence(corpus)
+    print(f"Équivalence: {len(corpus) - mismatches:,}/{len(corpus):,} messages identiques")
+
+    legacy = _throughput(legacy_tokenize, corpus, repeat)
+    single = _throughput(tokenize, corpus, repeat)
+    print(f"ancienne chaîne  {legacy:>12,.0f} msg/s")
+    print(f"une passe        {single:>12,.0f} msg/s  (x{single / legacy:.2f})")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Benchmark mémoire: compteurs analytics par utilisateur, dicts JSON vs GuildCounters.
+
+Simule un serveur réaliste (membres à l'activité très inégale, vocabulaire
+de Zipf, emojis) et mesure la mémoire des champs `word_counts_by_user`,
+`emoji_text_usage.users` et `messages_by_segment_by_user`:
+- en cours d'exécution (chaque mot est une chaîne neuve issue du tokenizer);
+- après rechargement du JSON;
+- sous forme de `GuildCounters` (vocabulaire + clés entières).
+
+Usage: python -m benchmarks.bench_user_counters [membres] [messages]
+"""
+
+import gc
+import itertools
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from bot.user_counters import SEGMENTS, GuildCounters
+
+VOCABULARY_SIZE = 40_000
+EMOJIS = [f":emoji_{i}:" for i in range(150)] + ["😂", "🔥", "❤️", "👍", "😭", "🙏", "✨", "💀"]
+
+
+def simulate(members: int, messages: int, seed: int = 42) -> list:
+    """Flux (auteur, rangs des mots, emojis, tranche) d'un serveur."""
+    rng = random.Random(seed)
+    # Quelques membres très actifs, une longue traîne de membres occasionnels
+    author_weights = [1 / (rank + 1) ** 1.1 for rank in range(members)]
+    authors = [900_000_000_000_000_000 + rng.randrange(10**17) for _ in range(members)]
+    word_weights = [1 / (rank + 1) for rank in range(VOCABULARY_SIZE)]
+    emoji_weights = [1 / (rank + 1) for rank in range(len(EMOJIS))]
+    cumulative_words = list(itertools.accumulate(word_weights))
+    stream = []
+    for author in rng.choices(authors, author_weights, k=messages):
+        words = rng.choices(range(VOCABULARY_SIZE), cum_weights=cumulative_words, k=rng.randint(0, 12))
+        emojis = rng.choices(EMOJIS, emoji_weights, k=rng.randint(1, 2)) if rng.random() < 0.3 else []
+        stream.append((author, words, emojis, rng.choice(SEGMENTS)))
+    return stream
+
+
+def _words(ranks: list[int]) -> list[str]:
+    """Mots du message, en chaînes neuves comme celles du tokenizer."""
+    return [f"mot{rank}" for rank in ranks]
+
+
+def build_legacy(stream) -> dict:
+    """Ancien chemin de `on_message_features`: dicts {str(user): {mot: compte}}."""
+    stats = {"messages_by_segment_by_user": {}, "word_counts_by_user": {}, "emoji_text_usage": {"users": {}}}
+    for author, ranks, emojis, segment in stream:
+        author_id = str(author)
+        words = _words(ranks)
+        user_segments = stats["messages_by_segment_by_user"].setdefault(
+            author_id, {"night": 0, "morning": 0, "afternoon": 0, "evening": 0}
+        )
+        user_segments[segment] += 1
+        if words:
+            user_words = stats["word_counts_by_user"].setdefault(author_id, {})
+            for word in words:
+                user_words[word] = user_words.get(word, 0) + 1
+        if emojis:
+            user_emojis = stats["emoji_text_usage"]["users"].setdefault(author_id, {})
+            for emoji in emojis:
+                user_emojis[emoji] = user_emojis.get(emoji, 0) + 1
+    return stats
+
+
+def build_counters(stream) -> GuildCounters:
+    guild = GuildCounters()
+    for author, ranks, emojis, segment in stream:
+        words = _words(ranks)
+        guild.add_segment(author, segment)
+        if words:
+            guild.add_words(author, words)
+        if emojis:
+            guild.add_emojis(author, emojis)
+    return guild
+
+
+def _measure(label: str, build):
+    """Temps de `build`, puis mémoire retenue par son résultat (mesurée à part, tracemalloc ralentit)."""
+    gc.collect()
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<32} {elapsed:>6.2f}s  mémoire={current / 1024 / 1024:>7.1f} Mo")
+    return result, current
+
+
+def main():
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    messages = int(sys.argv[2]) if len(sys.argv) > 2 else 300_000
+    print(f"{members:,} membres, {messages:,} messages, vocabulaire {VOCABULARY_SIZE:,} mots")
+
+    stream = simulate(members, messages)
+    legacy, legacy_bytes = _measure("dicts (exécution)", lambda: build_legacy(stream))
+    payload = json.dumps(legacy, ensure_ascii=False)
+    _, reloaded_bytes = _measure("dicts (rechargés du JSON)", lambda: json.loads(payload))
+    guild, counters_bytes = _measure("GuildCounters", lambda: build_counters(stream))
+    print(
+        f"gain: x{legacy_bytes / counters_bytes:.1f} vs exécution, "
+        f"x{reloaded_bytes / counters_bytes:.1f} vs JSON rechargé "
+        f"({len(guild.vocab):,} entrées de vocabulaire, JSON {len(payload) / 1024 / 1024:.1f} Mo)"
+    )
+
+    # Vérification: l'export reproduit exactement l'ancien format des trois champs par utilisateur
+    # (`to_stats` exporte aussi les graphes d'interactions, hors de ce benchmark)
+    def per_user(stats: dict) -> dict:
+        return {key: stats[key] for key in legacy}
+
+    if per_user(guild.to_stats()) != legacy or per_user(GuildCounters.from_stats(json.loads(payload)).to_stats()) != legacy:
+        print("ÉCHEC: export différent de l'ancien format")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Benchmark mémoire: utilisateurs engagement en dict (ancien format) vs UserRecord.
+
+Usage: python -m benchmarks.bench_user_records [nombre_d_utilisateurs]
+"""
+
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pytz
+
+from bot.engagement_records import UserRecord
+
+PARIS_TZ = pytz.timezone('Europe/Paris')
+
+
+def legacy_user(rng: random.Random, now: datetime) -> dict:
+    last_active = now - timedelta(seconds=rng.randrange(30 * 86400))
+    return {
+        "xp": rng.randrange(100_000),
+        "weekly_xp": rng.randrange(2_000),
+        "weekly_epoch": 0,
+        "messages": rng.randrange(10_000),
+        "last_active": last_active.isoformat(),
+        "display_name": f"membre_{rng.randrange(10**9)}",
+        "streak_days": rng.randrange(30),
+        "last_streak_date": last_active.isoformat(),
+    }
+
+
+def _measure(label: str, build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    users = build()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:<22} {elapsed:>6.2f}s  mémoire={current / 1024 / 1024:>7.1f} Mo  "
+        f"par utilisateur={current / len(users):>6.0f} o"
+    )
+    return users
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(42)
+    now = datetime.now(PARIS_TZ)
+    payload = json.dumps({str(1_000_000_000 + i): legacy_user(rng, now) for i in range(count)})
+    print(f"{count:,} utilisateurs")
+
+    # Chargement comme au démarrage du cog: JSON -> {str(user_id): dict}
+    legacy = _measure("dict (ancien)", lambda: json.loads(payload))
+    # JSON -> {int(user_id): UserRecord}, le dict intermédiaire est libéré
+    records = _measure(
+        "UserRecord",
+        lambda: {int(uid): UserRecord.from_dict(data) for uid, data in json.loads(payload).items()},
+    )
+
+    # Vérification: l'aller-retour conserve les valeurs (dates ramenées au jour / à la seconde)
+    for uid, data in legacy.items():
+        rec = records[int(uid)].to_dict(PARIS_TZ)
+        assert rec["xp"] == data["xp"] and rec["display_name"] == data["display_name"]
+        assert rec["last_streak_date"] == data["last_streak_date"][:10]
+
+
+if __name__ == "__main__":
+    main()
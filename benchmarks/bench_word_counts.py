@@ -0,0 +1,87 @@
+"""Benchmark: top mots exact + prune quotidien vs sketch Space-Saving.
+
+Flux de mots suivant une loi de Zipf (vocabulaire à longue traîne). Compare
+la mémoire, le temps, et la justesse du top 50 par rapport au comptage exact
+jamais tronqué.
+
+Usage: python -m benchmarks.bench_word_counts [nombre_de_mots] [capacité]
+"""
+
+import heapq
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+from bot.heavy_hitters import SpaceSaving
+
+TOP_N = 50
+WORDS_PER_DAY = 200_000
+VOCABULARY = 500_000
+
+
+def zipf_stream(count: int, rng: random.Random) -> list[str]:
+    weights = [1 / rank for rank in range(1, VOCABULARY + 1)]
+    ranks = rng.choices(range(VOCABULARY), weights=weights, k=count)
+    return [f"mot{rank}" for rank in ranks]
+
+
+def top(counts: dict, n: int) -> list[tuple[str, int]]:
+    return heapq.nsmallest(n, counts.items(), key=lambda item: (-item[1], item[0]))
+
+
+def run_pruned(stream: list[str]) -> dict:
+    """Ancien comportement: dict exact, tronqué au top 50 une fois par jour."""
+    counts: dict[str, int] = {}
+    for i, word in enumerate(stream, 1):
+        counts[word] = counts.get(word, 0) + 1
+        if i % WORDS_PER_DAY == 0:
+            counts = dict(top(counts, TOP_N))
+    return counts
+
+
+def run_sketch(stream: list[str], capacity: int) -> SpaceSaving:
+    sketch = SpaceSaving(capacity)
+    sketch.update(stream)
+    return sketch
+
+
+def _measure(label: str, func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<24} {elapsed:>6.2f}s  pic mémoire={peak / 1024 / 1024:>7.1f} Mo")
+    return result
+
+
+def _accuracy(label: str, estimated: list[tuple[str, int]], truth: Counter):
+    true_top = {word for word, _ in truth.most_common(TOP_N)}
+    found = {word for word, _ in estimated}
+    max_error = max((abs(count - truth[word]) for word, count in estimated), default=0)
+    print(f"{label:<24} top {TOP_N}: {len(found & true_top)}/{TOP_N} corrects, écart max {max_error:,}")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    capacity = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    stream = zipf_stream(count, random.Random(42))
+    truth = Counter(stream)
+    print(f"{count:,} mots, {len(truth):,} distincts, {count // WORDS_PER_DAY} prunes, capacité sketch {capacity}")
+
+    pruned = _measure("dict + prune quotidien", lambda: run_pruned(stream))
+    sketch = _measure(f"Space-Saving ({capacity})", lambda: run_sketch(stream, capacity))
+
+    _accuracy("dict + prune quotidien", top(pruned, TOP_N), truth)
+    _accuracy(f"Space-Saving ({capacity})", [(w, c) for w, c, _ in sketch.top(TOP_N)], truth)
+    print(
+        f"Space-Saving: {len(sketch.guaranteed_top(TOP_N))}/{TOP_N} rangs garantis, "
+        f"mot non suivi <= {sketch.min_count():,} (N/capacité = {count // capacity:,})"
+    )
+
+
+if __name__ == "__main__":
+    main()
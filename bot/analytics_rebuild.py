@@ -0,0 +1,433 @@
+"""Reconstruction des analytics depuis l'archive des messages.
+
+Quand les stats sont perdues (shard illisible: le cog repart de zéro) ou
+qu'un champ ajouté par une migration doit couvrir tout l'historique, elles
+sont recalculées depuis `data/archive` avec les règles du comptage en direct
+(`bot/analytics_stats.py`, même tokenizer), bot arrêté (sa sauvegarde
+suivante écraserait le résultat):
+
+    python -m bot.analytics_rebuild [--archive data/archive] [--dir data/analytics] [--workers N] [--guild ID ...]
+
+Chaque serveur est découpé en plages de journées consécutives d'un nombre
+de messages comparable (d'après les manifestes), comptées en parallèle par
+un `ProcessPoolExecutor`. Chaque tâche relit l'archive en lecture seule
+(`ArchiveQuery`) et renvoie des compteurs partiels (`PartialStats`),
+fusionnés dans l'ordre chronologique. Les 20 min qui précèdent une plage
+sont relues sans être comptées: le cache de la détection de conversation
+y est dans le même état qu'en direct, et le résultat ne dépend pas du
+découpage (ni du nombre de processus).
+
+Écarts avec le comptage en direct:
+- jour et heure: date du message (heure de Paris), pas sa réception;
+- réponse: message cité retrouvé par `is_reply_to` parmi les messages
+  archivés des 5 dernières minutes (en direct: cache de Discord);
+- cache des conversations: un par serveur (en direct: un seul pour tous
+  les serveurs, son budget peut évincer plus tôt);
+- mots: comptes exacts sur tout l'historique, puis top N (comme le prune
+  quotidien) au lieu de comptes élagués chaque jour;
+- conversations et mentions: poids exacts, puis arêtes les plus fortes de
+  chaque membre (en direct: la plus faible est évincée à chaque nouvelle
+  arête d'un membre plein, la longue traîne peut différer, et une arête
+  évincée puis revenue n'exporte que son compte depuis son retour);
+- réactions (absentes de l'archive): reprises de l'ancien shard du serveur
+  s'il est lisible.
+
+Couverture: tous les compteurs reconstruits (messages_total, mots, compteurs
+par utilisateur, graphes de conversations et de mentions, séries
+d'activité) ne couvrent que les messages encore dans l'archive, et
+remplacent ceux de l'ancien shard. Les messages antérieurs à l'archive, ou
+supprimés par la rétention (`ANALYTICS_ARCHIVE_RETENTION_DAYS`), ne sont
+plus comptés: avec une rétention, une reconstruction remplace les stats de
+tout l'historique par celles des N derniers jours. La commande affiche le
+premier jour archivé de chaque serveur et signale les serveurs dont l'ancien
+shard comptait plus de messages.
+"""
+
+import argparse
+import heapq
+import logging
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from bot.analytics_stats import (
+    CONVERSATION_WINDOW_SECONDS,
+    CURRENT_SCHEMA_VERSION,
+    conversation_key,
+    empty_guild_stats,
+    in_conversation_window,
+    time_segment,
+)
+from bot.analytics_store import AnalyticsShardStore
+from bot.archive_query import DEFAULT_ARCHIVE_DIR, ArchiveQuery
+from bot.conversation_cache import ConversationCache
+from bot.constants import (
+    ANALYTICS_ARCHIVE_COMPRESSION,
+    ANALYTICS_ARCHIVE_RETENTION_DAYS,
+    ANALYTICS_CONVERSATION_CACHE_MAX_ENTRIES,
+    ANALYTICS_MESSAGE_CACHE_SIZE,
+    ANALYTICS_MESSAGE_CACHE_TTL_SECONDS,
+    ANALYTICS_REBUILD_MIN_TASK_MESSAGES,
+    ANALYTICS_REBUILD_TASKS_PER_WORKER,
+    ANALYTICS_WORD_COUNT_SKETCH_CAPACITY,
+    ANALYTICS_WORD_COUNT_SKETCH_ENABLED,
+    ANALYTICS_WORD_COUNT_TOP_N,
+    STATE_FILE_CODEC,
+)
+from bot.heavy_hitters import SpaceSaving
+from bot.message_archive import MANIFEST_NAME, MessageArchive
+from bot.message_features import COMMAND_PREFIXES, PARIS_TZ
+from bot.serialization import get_codec, load_file
+from bot.time_rollups import GuildRollups, week_of
+from bot.tokenizer import tokenize
+from bot.user_counters import SEGMENT_INDEX, SEGMENTS, GuildCounters
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANALYTICS_DIR = "data/analytics"
+DEFAULT_LEGACY_ARCHIVE = "data/messages_archive_v1.jsonl"
+
+# Relu avant chaque plage sans être compté: deux durées de vie du cache, le temps qu'un canal
+# encore actif peut garder un message (et peser dans le budget global du cache)
+WARMUP = timedelta(seconds=2 * ANALYTICS_MESSAGE_CACHE_TTL_SECONDS)
+
+# Tâche: (dossier de l'archive, serveur, début inclus, fin exclue ou None)
+Task = Tuple[str, str, datetime, Optional[datetime]]
+
+
+class PartialStats:
+    """Compteurs d'un serveur sur une plage de l'archive (fusionnables, envoyés entre processus)."""
+
+    __slots__ = (
+        "messages", "by_day", "by_hour", "segments_by_user", "users", "channels",
+        "words", "words_by_user", "emojis_by_user", "mentions", "conversations", "activity",
+    )
+
+    def __init__(self):
+        self.messages = 0
+        self.by_day = [0] * 7
+        self.by_hour = [0] * 24
+        self.segments_by_user: Dict[str, List[int]] = {}  # Ordre SEGMENTS
+        # Dicts utilisés comme ensembles ordonnés (ordre de première apparition, comme en direct)
+        self.users: Dict[str, None] = {}
+        self.channels: Dict[str, None] = {}
+        self.words: Counter = Counter()
+        self.words_by_user: Dict[str, Counter] = {}
+        self.emojis_by_user: Dict[str, Counter] = {}
+        self.mentions: Counter = Counter()  # (auteur, mentionné) -> mentions
+        self.conversations: Counter = Counter()  # "userA_userB" -> réponses
+        self.activity: Counter = Counter()  # (canal, heure epoch, jour local) -> messages
+
+    def count(self, entry: Dict[str, Any], epoch_hour: int, day: int, weekday: int, hour: int):
+        """Compte un message (mêmes règles que `AnalyticsCog.on_message_features`)."""
+        author_id = entry["author"]
+        self.messages += 1
+        self.by_day[weekday] += 1
+        self.by_hour[hour] += 1
+        self.activity[entry["channel"], epoch_hour, day] += 1
+        segments = self.segments_by_user.get(author_id)
+        if segments is None:
+            segments = self.segments_by_user[author_id] = [0] * len(SEGMENTS)
+        segments[SEGMENT_INDEX[time_segment(hour)]] += 1
+        self.users.setdefault(author_id)
+        self.channels.setdefault(entry["channel"])
+
+        content = entry.get("content") or ""
+        tokens = tokenize(content)
+        if tokens.kept_words and not content.startswith(COMMAND_PREFIXES):
+            self.words.update(tokens.kept_words)
+            _user_counter(self.words_by_user, author_id).update(tokens.kept_words)
+        if tokens.emojis:
+            _user_counter(self.emojis_by_user, author_id).update(tokens.emojis)
+        for mentioned_id in entry.get("mentions") or ():
+            self.mentions[author_id, mentioned_id] += 1
+
+    def merge(self, other: "PartialStats"):
+        """Ajoute les compteurs d'une plage suivante."""
+        self.messages += other.messages
+        self.by_day = [a + b for a, b in zip(self.by_day, other.by_day)]
+        self.by_hour = [a + b for a, b in zip(self.by_hour, other.by_hour)]
+        for user_id, segments in other.segments_by_user.items():
+            mine = self.segments_by_user.get(user_id)
+            if mine is None:
+                self.segments_by_user[user_id] = segments
+            else:
+                self.segments_by_user[user_id] = [a + b for a, b in zip(mine, segments)]
+        self.users.update(other.users)
+        self.channels.update(other.channels)
+        self.words.update(other.words)
+        for mine, theirs in ((self.words_by_user, other.words_by_user), (self.emojis_by_user, other.emojis_by_user)):
+            for user_id, counts in theirs.items():
+                if user_id in mine:
+                    mine[user_id].update(counts)
+                else:
+                    mine[user_id] = counts
+        self.mentions.update(other.mentions)
+        self.conversations.update(other.conversations)
+        self.activity.update(other.activity)
+
+    def to_guild_data(self, previous: Optional[Dict] = None) -> Dict:
+        """Données du serveur au format des shards (top mots élagués comme par le cog)."""
+        guild_data = empty_guild_stats()
+        stats = guild_data["global_stats"]
+        stats["messages_total"] = self.messages
+        stats["messages_by_day"] = list(self.by_day)
+        stats["messages_by_hour"] = list(self.by_hour)
+        stats["messages_by_segment"] = {
+            name: sum(segments[index] for segments in self.segments_by_user.values())
+            for index, name in enumerate(SEGMENTS)
+        }
+        stats["unique_users"] = list(self.users)
+        stats["unique_channels"] = list(self.channels)
+        stats["conversations"] = dict(self.conversations)
+        given = stats["mentions_graph"]["given"]  # `received` est reconstruit par `GuildCounters.to_stats`
+        for (author_id, mentioned_id), count in self.mentions.items():
+            given.setdefault(author_id, {})[mentioned_id] = count
+
+        if ANALYTICS_WORD_COUNT_SKETCH_ENABLED:
+            # Comptes exacts: le sketch n'en garde que le top, sans erreur
+            stats["word_counts"] = dict(self.words)
+            stats["word_counts_errors"] = {}
+            SpaceSaving(ANALYTICS_WORD_COUNT_SKETCH_CAPACITY, counts=stats["word_counts"], errors=stats["word_counts_errors"])
+        else:
+            top = heapq.nsmallest(ANALYTICS_WORD_COUNT_TOP_N, self.words.items(), key=lambda item: (-item[1], item[0]))
+            stats["word_counts"] = dict(top)
+
+        # Compteurs par utilisateur et graphes d'interactions (poids exacts, bornés aux arêtes les plus
+        # fortes de chaque membre): élagués et exportés par `GuildCounters`, comme à la sauvegarde du cog
+        stats["messages_by_segment_by_user"] = {
+            user_id: dict(zip(SEGMENTS, segments)) for user_id, segments in self.segments_by_user.items()
+        }
+        stats["word_counts_by_user"] = self.words_by_user
+        stats["emoji_text_usage"] = {"users": self.emojis_by_user}
+        counters = GuildCounters.from_stats(stats)
+        counters.prune_words(ANALYTICS_WORD_COUNT_TOP_N)
+        stats.update(counters.to_stats())
+
+        # Séries d'activité remplies dans l'ordre chronologique, comme en direct
+        rollups = GuildRollups()
+        for (channel_id, epoch_hour, day), count in sorted(self.activity.items(), key=lambda item: item[0][1]):
+            rollups.add_buckets(channel_id, (epoch_hour, day, week_of(day)), count)
+        rollups.drop_stale(week_of(datetime.now(PARIS_TZ).date().toordinal()))
+        guild_data["daily_snapshots"] = rollups.to_data()
+
+        if previous:
+            stats["reactions_stats"] = previous.get("global_stats", {}).get("reactions_stats", stats["reactions_stats"])
+        return guild_data
+
+
+def _user_counter(by_user: Dict[str, Counter], user_id: str) -> Counter:
+    counter = by_user.get(user_id)
+    if counter is None:
+        counter = by_user[user_id] = Counter()
+    return counter
+
+
+def _replay_range(task: Task) -> PartialStats:
+    """Compte une plage d'un serveur (exécuté dans un processus du pool)."""
+    archive_dir, guild_id, start, end = task
+    partial = PartialStats()
+    caches = ConversationCache(
+        ANALYTICS_CONVERSATION_CACHE_MAX_ENTRIES, ANALYTICS_MESSAGE_CACHE_SIZE, ANALYTICS_MESSAGE_CACHE_TTL_SECONDS
+    )
+    # Messages des 5 dernières minutes, pour retrouver l'auteur d'un message cité
+    recent: Dict[str, Tuple[str, datetime]] = {}
+    recent_order: Deque[Tuple[datetime, str]] = deque()
+    local_hours: Dict[int, Tuple[int, int, int]] = {}  # Heure epoch -> (jour ordinal, jour de semaine, heure) à Paris
+    for entry in ArchiveQuery(archive_dir).search(guild_id, since=start - WARMUP, until=end):
+        moment = datetime.fromisoformat(entry["ts"])
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        timestamp = moment.astimezone(timezone.utc).replace(tzinfo=None)
+        author_id = entry["author"]
+        channel_id = entry["channel"]
+        counted = moment >= start
+        if counted:
+            # Les fuseaux de Paris sont à l'heure pleine: une conversion par heure suffit
+            epoch_hour = int(moment.timestamp()) // 3600
+            local = local_hours.get(epoch_hour)
+            if local is None:
+                paris = moment.astimezone(PARIS_TZ)
+                local = local_hours[epoch_hour] = (paris.toordinal(), paris.weekday(), paris.hour)
+            partial.count(entry, epoch_hour, *local)
+
+        caches.add(channel_id, author_id, timestamp)
+        if counted:
+            replied = recent.get(entry.get("is_reply_to") or "")
+            if replied is not None and replied[0] != author_id and in_conversation_window(timestamp, replied[1]):
+                partner_id = replied[0]
+            else:
+                partner_id = caches.partner(channel_id, author_id, timestamp)
+            if partner_id is not None:
+                partial.conversations[conversation_key(author_id, partner_id)] += 1
+
+        msg_id = entry.get("msg_id")
+        if msg_id:
+            recent[msg_id] = (author_id, timestamp)
+            recent_order.append((timestamp, msg_id))
+        while recent_order and (timestamp - recent_order[0][0]).total_seconds() > CONVERSATION_WINDOW_SECONDS:
+            recent.pop(recent_order.popleft()[1], None)
+    return partial
+
+
+def _day_start(day: str) -> datetime:
+    return datetime.combine(date.fromisoformat(day), datetime.min.time(), tzinfo=timezone.utc)
+
+
+def plan(archive_dir: str, workers: int, guild_ids: Optional[Iterable[str]] = None) -> List[Task]:
+    """Tâches de tailles comparables (d'après les manifestes), par serveur puis par date."""
+    manifests = _manifests(archive_dir, guild_ids)
+    total = sum(segment["messages"] for segments in manifests.values() for segment in segments.values())
+    target = max(ANALYTICS_REBUILD_MIN_TASK_MESSAGES, total // (workers * ANALYTICS_REBUILD_TASKS_PER_WORKER) + 1)
+
+    tasks: List[Task] = []
+    for guild_id, segments in manifests.items():
+        days = sorted(segments)
+        first = 0
+        messages = 0
+        for index, day in enumerate(days):
+            messages += segments[day]["messages"]
+            if messages >= target and index + 1 < len(days):
+                tasks.append((archive_dir, guild_id, _day_start(days[first]), _day_start(days[index + 1])))
+                first = index + 1
+                messages = 0
+        if days:
+            # Dernière plage ouverte: inclut les messages plus récents que le manifeste lu
+            tasks.append((archive_dir, guild_id, _day_start(days[first]), None))
+    return tasks
+
+
+def _manifests(archive_dir: str, guild_ids: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Dict]]:
+    """Segments {jour: segment} de chaque serveur archivé (ou des seuls `guild_ids`)."""
+    if guild_ids is None:
+        guild_ids = [
+            name for name in sorted(os.listdir(archive_dir))
+            if os.path.exists(os.path.join(archive_dir, name, MANIFEST_NAME))
+        ]
+    manifests = {}
+    for guild_id in guild_ids:
+        path = os.path.join(archive_dir, str(guild_id), MANIFEST_NAME)
+        if os.path.exists(path):
+            manifests[str(guild_id)] = load_file(path)["segments"]
+    return manifests
+
+
+def coverage(
+    archive_dir: str, analytics_dir: str, guild_ids: Optional[Iterable[str]] = None
+) -> Dict[str, Tuple[Optional[str], Optional[int]]]:
+    """(premier jour archivé, messages_total de l'ancien shard) par serveur, à lire avant `rebuild`."""
+    store = AnalyticsShardStore(analytics_dir, get_codec(STATE_FILE_CODEC))
+    result = {}
+    for guild_id, segments in _manifests(archive_dir, guild_ids).items():
+        previous = _load_previous(store.guild_path(guild_id))
+        total = previous.get("global_stats", {}).get("messages_total") if previous else None
+        result[guild_id] = (min(segments) if segments else None, total)
+    return result
+
+
+def _load_previous(path: str) -> Optional[Dict]:
+    """Ancien shard (ou métadonnées) s'il est lisible."""
+    if not os.path.exists(path):
+        return None
+    try:
+        return load_file(path)
+    except Exception as e:
+        logger.warning(f"[Analytics] {path} illisible, ignoré: {e}")
+        return None
+
+
+def rebuild(
+    archive_dir: str = DEFAULT_ARCHIVE_DIR,
+    analytics_dir: str = DEFAULT_ANALYTICS_DIR,
+    workers: Optional[int] = None,
+    guild_ids: Optional[Iterable[str]] = None,
+) -> Dict[str, int]:
+    """Recalcule les shards des serveurs de l'archive; retourne les messages comptés par serveur.
+
+    Les shards des serveurs absents de l'archive ne sont pas touchés.
+    """
+    workers = workers or os.cpu_count() or 1
+    tasks = plan(archive_dir, workers, guild_ids)
+    merged: Dict[str, PartialStats] = {}
+    # Un seul processus: pas de pool (ni de copie des résultats entre processus)
+    with (ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext()) as pool:
+        results = pool.map(_replay_range, tasks) if pool is not None else map(_replay_range, tasks)
+        # Résultats dans l'ordre des tâches: fusion chronologique, au fil de l'eau
+        for (_, guild_id, _, _), partial in zip(tasks, results):
+            if guild_id in merged:
+                merged[guild_id].merge(partial)
+            else:
+                merged[guild_id] = partial
+
+    store = AnalyticsShardStore(analytics_dir, get_codec(STATE_FILE_CODEC))
+    shards = {
+        guild_id: partial.to_guild_data(_load_previous(store.guild_path(guild_id)))
+        for guild_id, partial in merged.items()
+    }
+    store.write(shards, _rebuilt_meta(_load_previous(store.meta_path), archive_dir, len(shards)))
+    return {guild_id: partial.messages for guild_id, partial in merged.items()}
+
+
+def _rebuilt_meta(previous: Optional[Dict], archive_dir: str, guilds: int) -> Dict[str, Any]:
+    """Métadonnées à la version courante du schéma (historique conservé s'il est lisible)."""
+    now = datetime.now().isoformat()
+    meta = dict(previous.get("_meta", {})) if previous else {}
+    history = list(previous.get("_schema_history", [])) if previous else []
+    history.append({
+        "from_version": meta.get("schema_version"),
+        "to_version": CURRENT_SCHEMA_VERSION,
+        "date": now,
+        "changes": [f"Rebuilt {guilds} guild(s) from {archive_dir}"],
+    })
+    meta.setdefault("created_at", now)
+    meta.setdefault("guilds", {})
+    meta.update({
+        "schema_version": CURRENT_SCHEMA_VERSION,
+        "last_migration": now,
+        "last_word_prune": datetime.now().date().isoformat(),  # Top mots déjà élagués
+    })
+    return {"_meta": meta, "_schema_history": history}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Reconstruit les analytics depuis l'archive des messages (bot arrêté).")
+    parser.add_argument("--archive", default=DEFAULT_ARCHIVE_DIR, help="Dossier de l'archive")
+    parser.add_argument("--dir", default=DEFAULT_ANALYTICS_DIR, help="Dossier des analytics (shards réécrits)")
+    parser.add_argument("--workers", type=int, help="Nombre de processus (défaut: nombre de cœurs)")
+    parser.add_argument("--guild", action="append", help="Serveur à reconstruire (répétable; défaut: tous)")
+    parser.add_argument("--legacy", default=DEFAULT_LEGACY_ARCHIVE, help="Ancienne archive unique, importée d'abord si présente")
+    args = parser.parse_args(argv)
+    if os.path.exists(args.legacy):
+        # Import que le bot aurait fait à sa première écriture d'archive
+        archive = MessageArchive(args.archive, ANALYTICS_ARCHIVE_COMPRESSION, ANALYTICS_ARCHIVE_RETENTION_DAYS)
+        try:
+            print(f"{archive.import_legacy(args.legacy)} messages importés depuis {args.legacy}")
+        finally:
+            archive.close()
+    print("Les compteurs reconstruits ne couvrent que les messages de l'archive et remplacent ceux des shards.")
+    if ANALYTICS_ARCHIVE_RETENTION_DAYS is not None:
+        print(
+            f"Rétention active ({ANALYTICS_ARCHIVE_RETENTION_DAYS} jours): "
+            f"l'historique plus ancien n'est plus dans l'archive et ne sera pas recompté."
+        )
+    before = coverage(args.archive, args.dir, args.guild)
+    start = time.perf_counter()
+    counts = rebuild(args.archive, args.dir, args.workers, args.guild)
+    shrunk = 0
+    for guild_id, messages in sorted(counts.items()):
+        first_day, previous = before.get(guild_id, (None, None))
+        print(f"{guild_id}: {messages} messages (archive depuis {first_day or '?'})")
+        if previous is not None and previous > messages:
+            shrunk += 1
+            print(f"  attention: l'ancien shard comptait {previous} messages, {previous - messages} sont absents de l'archive")
+    print(f"{len(counts)} serveur(s) reconstruit(s) dans {args.dir} en {time.perf_counter() - start:.1f} s")
+    if shrunk:
+        print(f"{shrunk} serveur(s) avec moins de messages qu'avant: totaux limités à l'archive")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Structure et règles de comptage des stats analytics.
+
+Partagées par le cog (`bot/cogs/analytics.py`, message par message) et la
+reconstruction depuis l'archive (`bot/analytics_rebuild.py`): une même
+règle (tranche horaire, détection de conversation) ne doit pas diverger
+entre le comptage en direct et sa relecture. Le cache des derniers messages
+par canal est `bot/conversation_cache.py`.
+"""
+
+from datetime import datetime
+from typing import Deque, Dict, Optional, Tuple
+
+CURRENT_SCHEMA_VERSION = 3
+
+# Une réponse compte comme conversation si elle suit le message d'un autre auteur de 5 min au plus
+CONVERSATION_WINDOW_SECONDS = 300
+
+# Cache d'un canal: (auteur, horodatage UTC naïf) des derniers messages
+MessageCache = Deque[Tuple[str, datetime]]
+
+
+def empty_guild_stats() -> Dict:
+    """Structure de stats vide pour un serveur."""
+    return {
+        "global_stats": {
+            "messages_total": 0,
+            "messages_by_day": [0] * 7,  # Lundi=0, Dimanche=6
+            "messages_by_hour": [0] * 24,  # 00h-23h
+            "messages_by_segment": {
+                "night": 0,
+                "morning": 0,
+                "afternoon": 0,
+                "evening": 0
+            },
+            "messages_by_segment_by_user": {},
+            "unique_users": [],  # Stocké comme liste pour JSON, mais on utilise des sets en mémoire
+            "unique_channels": [],
+            "word_counts": {},
+            "word_counts_by_user": {},
+            "emoji_text_usage": {
+                "users": {}
+            },
+            "conversations": {},  # "userA_userB": count
+            "mentions_graph": {
+                "given": {},  # user: {target: count}
+                "received": {}  # user: {source: count}
+            },
+            "reactions_stats": {
+                "total_added": 0,
+                "by_emoji": {}
+            }
+        },
+        "daily_snapshots": {}  # Séries d'activité heure/jour/semaine (`bot/time_rollups.py`)
+    }
+
+
+def time_segment(hour: int) -> str:
+    """Retourne la tranche horaire (night, morning, afternoon, evening)."""
+    if 0 <= hour <= 5:
+        return "night"
+    if 6 <= hour <= 11:
+        return "morning"
+    if 12 <= hour <= 17:
+        return "afternoon"
+    return "evening"
+
+
+def conversation_key(author_id: str, other_id: str) -> str:
+    """Clé unique d'une paire (ordre alphabétique pour éviter les doublons)."""
+    return "_".join(sorted([author_id, other_id]))
+
+
+def in_conversation_window(timestamp: datetime, previous: datetime) -> bool:
+    return 0 <= (timestamp - previous).total_seconds() <= CONVERSATION_WINDOW_SECONDS
+
+
+def cached_partner(cache: Optional[MessageCache], author_id: str, timestamp: datetime) -> Optional[str]:
+    """Auteur du dernier message d'un autre membre du canal, s'il est assez récent."""
+    if not cache:
+        return None
+
+    # Parcourir le cache à l'envers pour trouver le dernier message d'un autre auteur
+    for cached_author_id, cached_timestamp in reversed(cache):
+        # Ignorer ses propres messages
+        if cached_author_id == author_id:
+            continue
+        # Vérifier si c'est dans les 5 dernières minutes (on ne compte que la première réponse)
+        if in_conversation_window(timestamp, cached_timestamp):
+            return cached_author_id
+    return None
@@ -0,0 +1,67 @@
+"""Stockage des analytics en un fichier par serveur.
+
+    data/analytics/
+      _meta.json         # {"_meta": ..., "_schema_history": [...]}
+      <guild_id>.json    # données d'un serveur (global_stats, daily_snapshots)
+
+Seuls les serveurs modifiés depuis la dernière sauvegarde sont réécrits:
+le coût d'une sauvegarde suit l'activité, pas la taille totale des données.
+Chaque fichier est écrit dans un temporaire puis renommé (`os.replace`,
+atomique): un arrêt en pleine écriture laisse l'ancienne version intacte.
+Les écritures sont sérialisées et versionnées: si deux sauvegardes se
+chevauchent (sauvegarde périodique et arrêt du cog), un snapshot plus ancien
+n'écrase jamais un shard déjà écrit par un plus récent.
+Les fichiers gardent l'extension .json quel que soit le codec
+(`bot/serialization.py`, détecté à la lecture).
+"""
+
+import os
+import threading
+from typing import Any, Dict
+
+from bot.serialization import JSON_CODEC, Codec, dump_file, load_file
+
+META_FILE_NAME = "_meta.json"
+
+
+class AnalyticsShardStore:
+    """Dossier de shards: métadonnées + un fichier par serveur."""
+
+    def __init__(self, directory: str, codec: Codec = JSON_CODEC):
+        self.directory = directory
+        self.codec = codec
+        self.meta_path = os.path.join(directory, META_FILE_NAME)
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}  # Version du dernier snapshot écrit, par shard
+
+    def exists(self) -> bool:
+        return os.path.exists(self.meta_path)
+
+    def guild_path(self, guild_id: str) -> str:
+        return os.path.join(self.directory, f"{guild_id}.json")
+
+    def load(self) -> Dict[str, Any]:
+        """Données complètes au format historique ({"_meta", "_schema_history", guild_id: ...})."""
+        data = load_file(self.meta_path)
+        for name in sorted(os.listdir(self.directory)):
+            if name == META_FILE_NAME or not name.endswith(".json"):
+                continue  # Métadonnées, ou temporaire d'une écriture interrompue
+            data[name[:-len(".json")]] = load_file(os.path.join(self.directory, name))
+        return data
+
+    def write(self, shards: Dict[str, Dict], meta: Dict[str, Any], version: int = 0):
+        """Réécrit les serveurs de `shards` puis les métadonnées (lève en cas d'erreur).
+
+        `version` croît à chaque snapshot: un shard déjà écrit par une version
+        plus récente est ignoré.
+        """
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            for guild_id, guild_data in shards.items():
+                if self._versions.get(guild_id, -1) > version:
+                    continue
+                dump_file(self.guild_path(guild_id), guild_data, self.codec)
+                self._versions[guild_id] = version
+            if self._versions.get(META_FILE_NAME, -1) <= version:
+                dump_file(self.meta_path, meta, self.codec)
+                self._versions[META_FILE_NAME] = version
@@ -0,0 +1,483 @@
+"""Export en colonnes de l'archive des messages, pour les analyses hors ligne.
+
+    data/columns/
+      <AAAA-MM-JJ>.open.cols   # Journée en cours: un groupe de lignes par lot écrit
+      <AAAA-MM-JJ>.cols        # Journée terminée: un seul groupe de lignes
+
+Un fichier par journée UTC, tous serveurs confondus. Un groupe de lignes est
+un en-tête marshal (nombre de lignes, taille de chaque colonne) suivi des
+colonnes, compressées (zlib) une par une:
+- entiers, en `array` compacts: ts (ms epoch, en deltas), guild, channel,
+  author, msg_id, is_reply_to (0: aucun), has_attachments;
+- author_name: encodage par dictionnaire (noms distincts + codes);
+- mentions: liste (fin de chaque message + identifiants à plat);
+- content: blob (textes UTF-8 concaténés + fin de chaque texte).
+
+Lire une colonne (`ColumnReader.read`) ne lit et ne décompresse que ses
+blocs: les en-têtes donnent les tailles des autres, qui sont sautées. Une
+agrégation sur des mois d'historique ne touche donc qu'une fraction des
+octets de l'archive, sans construire un dict par message.
+
+Alimenté en direct par le thread d'écriture de l'archive (`ColumnWriter`),
+ou reconstruit depuis l'archive (bot arrêté, ou vers un autre dossier):
+    python -m bot.archive_columns convert [--archive data/archive] [--dir data/columns]
+    python -m bot.archive_columns info [--dir data/columns]
+"""
+
+import argparse
+import logging
+import marshal
+import os
+import struct
+import zlib
+from array import array
+from datetime import date, datetime, timedelta, timezone
+from itertools import accumulate
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COLUMNS_DIR = "data/columns"
+COLUMNS_MAGIC = b"ONYX-COLS\n"
+COLUMNS_VERSION = 1
+OPEN_SUFFIX = ".open.cols"
+SEALED_SUFFIX = ".cols"
+TMP_SUFFIX = ".tmp"
+_LENGTH = struct.Struct("<I")
+
+# Colonnes entières: type `array`
+INT_COLUMNS = {
+    "ts": "q",
+    "guild": "Q",
+    "channel": "Q",
+    "author": "Q",
+    "msg_id": "Q",
+    "is_reply_to": "Q",
+    "has_attachments": "B",
+}
+DELTA_COLUMNS = ("ts",)  # Presque croissantes: stockées en deltas (mieux compressés)
+DICT_COLUMNS = ("author_name",)
+LIST_COLUMNS = ("mentions",)
+BLOB_COLUMNS = ("content",)
+COLUMN_NAMES = tuple(INT_COLUMNS) + DICT_COLUMNS + LIST_COLUMNS + BLOB_COLUMNS
+
+
+def _int(value: Any) -> int:
+    """Identifiant Discord en entier non signé 64 bits (0 si absent ou invalide)."""
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return 0
+    return number if 0 <= number < 1 << 64 else 0
+
+
+def _ts_ms(value: str) -> int:
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+# --- Colonnes décodées ----------------------------------------------------------
+
+class DictColumn:
+    """Chaînes encodées par dictionnaire: les agrégations peuvent travailler sur les codes."""
+
+    __slots__ = ("dictionary", "codes")
+
+    def __init__(self, dictionary: List[str], codes: array):
+        self.dictionary = dictionary
+        self.codes = codes
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, row: int) -> str:
+        return self.dictionary[self.codes[row]]
+
+    def __iter__(self) -> Iterator[str]:
+        dictionary = self.dictionary
+        return (dictionary[code] for code in self.codes)
+
+
+class BlobColumn:
+    """Textes concaténés; un texte n'est décodé qu'à l'accès."""
+
+    __slots__ = ("ends", "data")
+
+    def __init__(self, ends: array, data: bytes):
+        self.ends = ends
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.ends)
+
+    def __getitem__(self, row: int) -> str:
+        start = self.ends[row - 1] if row else 0
+        return self.data[start:self.ends[row]].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[row] for row in range(len(self.ends)))
+
+
+class ListColumn:
+    """Listes d'entiers à plat (fin de la liste de chaque ligne dans `values`)."""
+
+    __slots__ = ("ends", "values")
+
+    def __init__(self, ends: array, values: array):
+        self.ends = ends
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.ends)
+
+    def __getitem__(self, row: int) -> array:
+        start = self.ends[row - 1] if row else 0
+        return self.values[start:self.ends[row]]
+
+    def __iter__(self) -> Iterator[array]:
+        return (self[row] for row in range(len(self.ends)))
+
+
+# --- Encodage -------------------------------------------------------------------
+
+def _empty_columns() -> Dict[str, list]:
+    return {name: [] for name in COLUMN_NAMES}
+
+
+def _add_entries(columns: Dict[str, list], entries: Iterable[Dict[str, Any]]):
+    """Ajoute des entrées d'archive aux colonnes (listes Python) en construction."""
+    for entry in entries:
+        columns["ts"].append(_ts_ms(entry["ts"]))
+        for name in ("guild", "channel", "author", "msg_id", "is_reply_to"):
+            columns[name].append(_int(entry.get(name)))
+        columns["has_attachments"].append(1 if entry.get("has_attachments") else 0)
+        columns["author_name"].append(entry.get("author_name") or "")
+        columns["mentions"].append([_int(mention) for mention in entry.get("mentions") or ()])
+        columns["content"].append(entry.get("content") or "")
+
+
+def _add_decoded(columns: Dict[str, list], decoded: Dict[str, Any], keep: Sequence[int]):
+    """Ajoute les lignes `keep` de colonnes décodées aux colonnes en construction."""
+    for name in COLUMN_NAMES:
+        column = decoded[name]
+        if name in LIST_COLUMNS:
+            columns[name].extend(column[row].tolist() for row in keep)
+        else:
+            columns[name].extend(column[row] for row in keep)
+
+
+def _encode_block(name: str, values: list) -> bytes:
+    if name in INT_COLUMNS:
+        if name in DELTA_COLUMNS:
+            values = [value - previous for value, previous in zip(values, [0] + values[:-1])]
+        raw = array(INT_COLUMNS[name], values).tobytes()
+    elif name in DICT_COLUMNS:
+        dictionary: Dict[str, int] = {}
+        codes = array("I", [dictionary.setdefault(value, len(dictionary)) for value in values])
+        raw = marshal.dumps((list(dictionary), codes.tobytes()))
+    elif name in LIST_COLUMNS:
+        ends = array("I")
+        flat = array("Q")
+        for items in values:
+            flat.extend(items)
+            ends.append(len(flat))
+        raw = marshal.dumps((ends.tobytes(), flat.tobytes()))
+    else:
+        ends = array("I")
+        data = bytearray()
+        for text in values:
+            data += text.encode("utf-8")
+            ends.append(len(data))
+        raw = marshal.dumps((ends.tobytes(), bytes(data)))
+    return zlib.compress(raw)
+
+
+def _decode_block(name: str, block: bytes):
+    raw = zlib.decompress(block)
+    if name in INT_COLUMNS:
+        values = array(INT_COLUMNS[name])
+        values.frombytes(raw)
+        if name in DELTA_COLUMNS:
+            values = array(INT_COLUMNS[name], accumulate(values))
+        return values
+    if name in DICT_COLUMNS:
+        dictionary, codes_raw = marshal.loads(raw)
+        codes = array("I")
+        codes.frombytes(codes_raw)
+        return DictColumn(dictionary, codes)
+    ends_raw, payload = marshal.loads(raw)
+    ends = array("I")
+    ends.frombytes(ends_raw)
+    if name in LIST_COLUMNS:
+        values = array("Q")
+        values.frombytes(payload)
+        return ListColumn(ends, values)
+    return BlobColumn(ends, payload)
+
+
+def _encode_group(columns: Dict[str, list]) -> bytes:
+    """Groupe de lignes: longueur de l'en-tête, en-tête marshal, blocs des colonnes."""
+    blocks = [_encode_block(name, columns[name]) for name in COLUMN_NAMES]
+    header = marshal.dumps({
+        "version": COLUMNS_VERSION,
+        "rows": len(columns["ts"]),
+        "columns": [(name, len(block)) for name, block in zip(COLUMN_NAMES, blocks)],
+    })
+    return _LENGTH.pack(len(header)) + header + b"".join(blocks)
+
+
+def _scan_groups(f, size: int) -> Iterator[Tuple[int, Dict[str, Any], int]]:
+    """(position, en-tête, début des blocs) des groupes complets d'un fichier ouvert."""
+    f.seek(0)
+    if f.read(len(COLUMNS_MAGIC)) != COLUMNS_MAGIC:
+        raise ValueError(f"fichier de colonnes invalide: {f.name}")
+    position = len(COLUMNS_MAGIC)
+    while position + _LENGTH.size <= size:
+        f.seek(position)
+        (header_size,) = _LENGTH.unpack(f.read(_LENGTH.size))
+        start = position + _LENGTH.size + header_size
+        if start > size:
+            return  # En-tête tronqué (écriture interrompue)
+        header = marshal.loads(f.read(header_size))
+        end = start + sum(length for _, length in header["columns"])
+        if end > size:
+            return  # Blocs tronqués
+        yield position, header, start
+        position = end
+
+
+# --- Écriture -------------------------------------------------------------------
+
+class ColumnWriter:
+    """Écrit les lots de l'archive en colonnes; compacte les journées terminées.
+
+    Appelé depuis un seul thread (celui de l'archive), comme `MessageArchive`.
+    """
+
+    def __init__(self, directory: str = DEFAULT_COLUMNS_DIR, retention_days: Optional[int] = None):
+        self.directory = directory
+        self.retention_days = retention_days
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith(TMP_SUFFIX):
+                os.remove(path)  # Compaction interrompue
+            elif name.endswith(OPEN_SUFFIX):
+                self._recover(path)
+
+    def _path(self, day: str, suffix: str) -> str:
+        return os.path.join(self.directory, day + suffix)
+
+    @staticmethod
+    def _recover(path: str):
+        """Coupe un groupe de lignes tronqué par un crash en fin de fichier ouvert."""
+        with open(path, 'r+b') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < len(COLUMNS_MAGIC):
+                f.truncate(0)
+                f.write(COLUMNS_MAGIC)
+                return
+            good = len(COLUMNS_MAGIC)
+            for _, header, start in _scan_groups(f, size):
+                good = start + sum(length for _, length in header["columns"])
+            if good < size:
+                logger.warning(f"[Colonnes] Groupe incomplet coupé: {path} (octet {good})")
+                f.truncate(good)
+
+    def append(self, entries: Iterable[Dict[str, Any]]):
+        """Ajoute un groupe de lignes par journée présente dans le lot."""
+        by_day: Dict[str, Dict[str, list]] = {}
+        for entry in entries:
+            day = entry["ts"][:10]
+            columns = by_day.get(day)
+            if columns is None:
+                columns = by_day[day] = _empty_columns()
+            _add_entries(columns, (entry,))
+        for day, columns in by_day.items():
+            path = self._path(day, OPEN_SUFFIX)
+            with open(path, 'ab') as f:
+                if f.tell() == 0:
+                    f.write(COLUMNS_MAGIC)
+                f.write(_encode_group(columns))
+
+    def seal_due(self, today: str) -> int:
+        """Compacte les journées antérieures à `today` (AAAA-MM-JJ), applique la rétention."""
+        sealed = 0
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(OPEN_SUFFIX) and name[:-len(OPEN_SUFFIX)] < today:
+                self._seal(name[:-len(OPEN_SUFFIX)])
+                sealed += 1
+        if self.retention_days is not None:
+            cutoff = (date.fromisoformat(today) - timedelta(days=self.retention_days)).isoformat()
+            for name in os.listdir(self.directory):
+                if name.endswith(SEALED_SUFFIX) and not name.endswith(OPEN_SUFFIX) and name[:10] < cutoff:
+                    os.remove(os.path.join(self.directory, name))
+        return sealed
+
+    def _seal(self, day: str):
+        """Réécrit une journée (fichier compacté existant + groupes ouverts) en un seul groupe.
+
+        Les lignes sont dédupliquées sur msg_id: un crash entre le renommage et la
+        suppression du fichier ouvert, ou une conversion relancée, ne double rien.
+        """
+        columns = _empty_columns()
+        seen = set()
+        for path in (self._path(day, SEALED_SUFFIX), self._path(day, OPEN_SUFFIX)):
+            if not os.path.exists(path):
+                continue
+            for decoded in _read_file(path, COLUMN_NAMES):
+                keep = []
+                for row, msg_id in enumerate(decoded["msg_id"]):
+                    if msg_id not in seen:
+                        seen.add(msg_id)
+                        keep.append(row)
+                _add_decoded(columns, decoded, keep)
+        path = self._path(day, SEALED_SUFFIX)
+        with open(path + TMP_SUFFIX, 'wb') as f:
+            f.write(COLUMNS_MAGIC + _encode_group(columns))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + TMP_SUFFIX, path)
+        os.remove(self._path(day, OPEN_SUFFIX))
+
+
+# --- Lecture --------------------------------------------------------------------
+
+def _read_file(path: str, names: Sequence[str], counter: Optional[List[int]] = None) -> Iterator[Dict[str, Any]]:
+    """Colonnes `names` de chaque groupe de lignes d'un fichier (les autres blocs sont sautés)."""
+    with open(path, 'rb') as f:
+        for _, header, start in _scan_groups(f, os.fstat(f.fileno()).st_size):
+            decoded: Dict[str, Any] = {"rows": header["rows"]}
+            offset = start
+            for name, length in header["columns"]:
+                if name in names:
+                    f.seek(offset)
+                    decoded[name] = _decode_block(name, f.read(length))
+                    if counter is not None:
+                        counter[0] += length
+                offset += length
+            yield decoded
+
+
+class ColumnReader:
+    """Lecture de colonnes choisies, journée par journée."""
+
+    def __init__(self, directory: str = DEFAULT_COLUMNS_DIR):
+        self.directory = directory
+        self._bytes_read = [0]  # Octets de blocs lus (hors en-têtes)
+
+    @property
+    def bytes_read(self) -> int:
+        return self._bytes_read[0]
+
+    def days(self, start: Optional[str] = None, end: Optional[str] = None) -> List[str]:
+        """Journées présentes avec `start <= jour < end` (AAAA-MM-JJ)."""
+        days = set()
+        for name in os.listdir(self.directory):
+            if name.endswith(SEALED_SUFFIX):
+                days.add(name[:10])
+        return sorted(day for day in days if (start is None or day >= start) and (end is None or day < end))
+
+    def read(
+        self, names: Sequence[str], start: Optional[str] = None, end: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Pour chaque groupe de lignes de la période: {"rows": n, colonne: valeurs} pour les seules `names`.
+
+        Colonnes entières: `array`; author_name: `DictColumn`; mentions:
+        `ListColumn`; content: `BlobColumn`.
+        """
+        unknown = set(names) - set(COLUMN_NAMES)
+        if unknown:
+            raise ValueError(f"colonnes inconnues: {sorted(unknown)}")
+        for day in self.days(start, end):
+            for suffix in (SEALED_SUFFIX, OPEN_SUFFIX):
+                path = os.path.join(self.directory, day + suffix)
+                try:
+                    yield from _read_file(path, names, self._bytes_read)
+                except FileNotFoundError:
+                    continue  # Compacté entre-temps (ou pas de fichier ouvert)
+
+    def value_counts(self, name: str, start: Optional[str] = None, end: Optional[str] = None) -> Dict[Any, int]:
+        """Nombre de messages par valeur d'une colonne entière ou par dictionnaire."""
+        counts: Dict[Any, int] = {}
+        for group in self.read((name,), start, end):
+            column = group[name]
+            if isinstance(column, DictColumn):
+                per_code = [0] * len(column.dictionary)
+                for code in column.codes:
+                    per_code[code] += 1
+                for value, count in zip(column.dictionary, per_code):
+                    if count:
+                        counts[value] = counts.get(value, 0) + count
+            else:
+                for value in column:
+                    counts[value] = counts.get(value, 0) + 1
+        return counts
+
+
+# --- Conversion -----------------------------------------------------------------
+
+def convert(archive_dir: str, columns_dir: str) -> int:
+    """Exporte toute l'archive en colonnes; retourne le nombre de messages.
+
+    Lecture seule de l'archive (`ArchiveQuery`); les journées terminées sont
+    compactées (et dédupliquées) à la fin.
+    """
+    from bot.archive_query import ArchiveQuery
+
+    query = ArchiveQuery(archive_dir)
+    writer = ColumnWriter(columns_dir)
+    total = 0
+    for guild_id in sorted(os.listdir(archive_dir)):
+        if not os.path.isdir(os.path.join(archive_dir, guild_id)):
+            continue
+        batch: List[Dict[str, Any]] = []
+        for entry in query.search(guild_id):
+            if batch and (entry["ts"][:10] != batch[-1]["ts"][:10]):
+                writer.append(batch)
+                total += len(batch)
+                batch = []
+            batch.append(entry)
+        writer.append(batch)
+        total += len(batch)
+    writer.seal_due(datetime.now(timezone.utc).date().isoformat())
+    return total
+
+
+def _info(directory: str):
+    sizes = {name: 0 for name in COLUMN_NAMES}
+    rows = groups = 0
+    reader = ColumnReader(directory)
+    days = reader.days()
+    for day in days:
+        for suffix in (SEALED_SUFFIX, OPEN_SUFFIX):
+            path = os.path.join(directory, day + suffix)
+            if not os.path.exists(path):
+                continue
+            with open(path, 'rb') as f:
+                for _, header, _ in _scan_groups(f, os.fstat(f.fileno()).st_size):
+                    rows += header["rows"]
+                    groups += 1
+                    for name, length in header["columns"]:
+                        sizes[name] += length
+    print(f"{len(days)} journées, {groups} groupes de lignes, {rows} messages")
+    for name in COLUMN_NAMES:
+        print(f"  {name:<16} {sizes[name] / 1024:>10.1f} Ko")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Export en colonnes de l'archive des messages.")
+    parser.add_argument("command", choices=("convert", "info"))
+    parser.add_argument("--archive", default="data/archive", help="Dossier de l'archive (convert)")
+    parser.add_argument("--dir", default=DEFAULT_COLUMNS_DIR, help="Dossier des colonnes")
+    args = parser.parse_args(argv)
+    if args.command == "convert":
+        print(f"{convert(args.archive, args.dir)} messages exportés dans {args.dir}")
+    else:
+        _info(args.dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Index des segments d'archive: canal, auteur et horodatage -> position des lignes.
+
+Construit pendant l'écriture de l'archive (`MessageArchive`), à côté de
+chaque segment:
+- segment actif: `<jour>.rows`, une entrée binaire de taille fixe par
+  message (`ROW`: canal, auteur, offset de la ligne dans le .jsonl,
+  horodatage epoch, longueur), ajoutée en même temps que la ligne;
+- segment scellé: `<jour>.idx` (marshal), colonnes par ligne (bloc, offset
+  dans le bloc décompressé, longueur, horodatage) et listes inversées
+  auteur -> lignes et canal -> lignes, triées.
+
+Une requête (`bot/archive_query.py`) intersecte ces listes puis filtre sur
+l'horodatage (un `.rows` est simplement parcouru: une journée au plus):
+seules les lignes retenues sont lues dans l'archive.
+"""
+
+import struct
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Entrée d'un segment actif: canal, auteur, offset, horodatage (s), longueur
+ROW = struct.Struct("<QQQII")
+ROWS_SUFFIX = ".rows"
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 1
+
+
+def _snowflake(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def entry_keys(entry: Dict[str, Any]) -> Tuple[int, int, int]:
+    """(canal, auteur, horodatage epoch en secondes) d'une entrée d'archive."""
+    ts = datetime.fromisoformat(entry["ts"])
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return _snowflake(entry.get("channel")), _snowflake(entry.get("author")), int(ts.timestamp())
+
+
+def scan_rows(
+    raw: bytes,
+    channel: Optional[int] = None,
+    author: Optional[int] = None,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+) -> List[Tuple[int, int]]:
+    """(offset, longueur) des lignes d'un `.rows` correspondant aux filtres (entrée finale partielle ignorée).
+
+    Parcours linéaire: un segment actif ne couvre qu'une journée.
+    """
+    return [
+        (offset, length)
+        for row_channel, row_author, offset, ts, length in ROW.iter_unpack(raw[:len(raw) - len(raw) % ROW.size])
+        if (channel is None or row_channel == channel)
+        and (author is None or row_author == author)
+        and (start is None or ts >= start)
+        and (end is None or ts < end)
+    ]
+
+
+def _contains(postings: Sequence[int], row: int) -> bool:
+    index = bisect_left(postings, row)
+    return index < len(postings) and postings[index] == row
+
+
+class SegmentIndex:
+    """Colonnes par ligne et listes inversées d'un segment."""
+
+    __slots__ = ("chunk", "offset", "length", "ts", "authors", "channels")
+
+    def __init__(self):
+        self.chunk = array("I")  # Bloc compressé (rang dans la table du manifeste)
+        self.offset = array("Q")  # Dans le bloc décompressé
+        self.length = array("I")
+        self.ts = array("I")
+        self.authors: Dict[int, array] = {}  # auteur -> lignes (croissantes)
+        self.channels: Dict[int, array] = {}  # canal -> lignes (croissantes)
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def add(self, channel: int, author: int, chunk: int, offset: int, length: int, ts: int):
+        row = len(self.ts)
+        self.chunk.append(chunk)
+        self.offset.append(offset)
+        self.length.append(length)
+        self.ts.append(ts)
+        for postings, key in ((self.authors, author), (self.channels, channel)):
+            rows = postings.get(key)
+            if rows is None:
+                rows = postings[key] = array("I")
+            rows.append(row)
+
+    def to_data(self) -> Dict[str, Any]:
+        """Forme sérialisable (bytes et entiers, pour le codec marshal)."""
+        return {
+            "version": INDEX_VERSION,
+            "chunk": self.chunk.tobytes(),
+            "offset": self.offset.tobytes(),
+            "length": self.length.tobytes(),
+            "ts": self.ts.tobytes(),
+            "authors": {key: rows.tobytes() for key, rows in self.authors.items()},
+            "channels": {key: rows.tobytes() for key, rows in self.channels.items()},
+        }
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any]) -> "SegmentIndex":
+        index = cls()
+        for name in ("chunk", "offset", "length", "ts"):
+            getattr(index, name).frombytes(data[name])
+        for name in ("authors", "channels"):
+            postings = getattr(index, name)
+            for key, raw in data[name].items():
+                postings[key] = rows = array("I")
+                rows.frombytes(raw)
+        return index
+
+    def select(
+        self,
+        channel: Optional[int] = None,
+        author: Optional[int] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> List[int]:
+        """Lignes correspondant aux filtres (`start <= ts < end`, epoch), dans l'ordre du segment."""
+        lists = []
+        if author is not None:
+            lists.append(self.authors.get(author, ()))
+        if channel is not None:
+            lists.append(self.channels.get(channel, ()))
+        if lists:
+            lists.sort(key=len)
+            rows = [row for row in lists[0] if all(_contains(other, row) for other in lists[1:])]
+        else:
+            rows = range(len(self.ts))
+        if start is None and end is None:
+            return list(rows)
+        ts = self.ts
+        return [row for row in rows if (start is None or ts[row] >= start) and (end is None or ts[row] < end)]
@@ -0,0 +1,428 @@
+"""Requêtes sur l'archive des messages via les index de segments et `mmap`.
+
+Ne lit que des fichiers (manifestes, index, segments): utilisable hors du
+bot, pendant qu'il écrit. Pour chaque segment de la période, l'index
+(`bot/archive_index.py`) donne les lignes qui correspondent aux filtres;
+le segment est projeté en mémoire (`mmap`) et seules ces lignes sont lues:
+directement pour un segment actif, après décompression des seuls blocs
+concernés pour un segment scellé.
+
+La recherche par mots-clés (`search_text`) passe par l'index plein texte
+(`bot/text_index.py`): listes des mots de la requête dans les runs
+scellées (en-têtes gardés en cache) et les `.tok` des segments actifs
+(relus de façon incrémentale). Les messages sont classés par la somme des
+idf (BM25) des mots qu'ils contiennent, puis du plus récent au plus ancien;
+seuls les messages retenus sont lus dans l'archive.
+
+Usage:
+    python -m bot.archive_query GUILD_ID [--author ID] [--channel ID]
+        [--since 2026-01-01] [--until 2026-02-01T12:00] [--limit N] [--count]
+        [--text "mots clés"] [--dir data/archive]
+"""
+
+import argparse
+import heapq
+import json
+import math
+import mmap
+import os
+import sys
+import time
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime, timezone
+from typing import Any, Collection, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from bot.archive_index import INDEX_SUFFIX, ROW, ROWS_SUFFIX, SegmentIndex, entry_keys, scan_rows
+from bot.message_archive import COMPRESSIONS, MANIFEST_NAME
+from bot.serialization import load_file
+from bot.text_index import ROW_BITS, TERMS_SUFFIX, TOKENS_SUFFIX, ActiveTerms, TermRun, make_ref, split_ref, terms
+
+DEFAULT_ARCHIVE_DIR = "data/archive"
+
+# Index de segments scellés gardés en mémoire entre deux requêtes
+INDEX_CACHE_SIZE = 64
+
+# En-têtes de runs plein texte gardés en mémoire entre deux recherches
+RUN_CACHE_SIZE = 128
+
+
+class SearchHit(NamedTuple):
+    score: float
+    entry: Dict[str, Any]
+
+
+def _epoch(moment: Optional[datetime]) -> Optional[int]:
+    if moment is None:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def _day(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).date().isoformat()
+
+
+class _Filters:
+    __slots__ = ("channel", "author", "start", "end")
+
+    def __init__(self, channel: Optional[int], author: Optional[int], start: Optional[int], end: Optional[int]):
+        self.channel = channel
+        self.author = author
+        self.start = start
+        self.end = end
+
+    def select(self, index: SegmentIndex) -> List[int]:
+        return index.select(self.channel, self.author, self.start, self.end)
+
+    def scan(self, raw_rows: bytes) -> List[Tuple[int, int]]:
+        return scan_rows(raw_rows, self.channel, self.author, self.start, self.end)
+
+    def matches(self, entry: Dict[str, Any]) -> bool:
+        channel, author, ts = entry_keys(entry)
+        return (
+            (self.channel is None or channel == self.channel)
+            and (self.author is None or author == self.author)
+            and (self.start is None or ts >= self.start)
+            and (self.end is None or ts < self.end)
+        )
+
+
+def _map(path: str):
+    """`mmap` en lecture seule de `path` (None si le fichier est vide)."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class ArchiveQuery:
+    """Recherche par serveur, canal, auteur et période dans `data/archive`."""
+
+    def __init__(self, directory: str = DEFAULT_ARCHIVE_DIR):
+        self.directory = directory
+        self._index_cache: OrderedDict = OrderedDict()  # (chemin, mtime, taille) -> SegmentIndex
+        self._run_cache: OrderedDict = OrderedDict()  # (chemin, mtime, taille) -> TermRun
+        self._active_terms: Dict[Tuple[str, str], ActiveTerms] = {}  # (guild_id, jour) -> .tok déjà lu
+
+    def _segments(self, guild_id: str) -> Dict[str, Dict[str, Any]]:
+        path = os.path.join(self.directory, guild_id, MANIFEST_NAME)
+        return load_file(path)["segments"] if os.path.exists(path) else {}
+
+    def _sealed_index(self, path: str) -> Optional[SegmentIndex]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        index = self._index_cache.get(key)
+        if index is None:
+            index = SegmentIndex.from_data(load_file(path))
+            self._index_cache[key] = index
+            if len(self._index_cache) > INDEX_CACHE_SIZE:
+                self._index_cache.popitem(last=False)
+        else:
+            self._index_cache.move_to_end(key)
+        return index
+
+    def _term_run(self, path: str) -> Optional[TermRun]:
+        try:
+            stat = os.stat(path)
+            key = (path, stat.st_mtime_ns, stat.st_size)
+            run = self._run_cache.get(key)
+            if run is None:
+                run = self._run_cache[key] = TermRun(path)
+                if len(self._run_cache) > RUN_CACHE_SIZE:
+                    self._run_cache.popitem(last=False)
+            else:
+                self._run_cache.move_to_end(key)
+            return run
+        except FileNotFoundError:
+            return None  # Fusionnée entre-temps
+
+    def _days(self, guild_id: str, filters: _Filters) -> Iterator[Dict[str, Any]]:
+        """Segments du serveur qui recoupent la période, par jour croissant."""
+        first_day = _day(filters.start) if filters.start is not None else None
+        last_day = _day(filters.end - 1) if filters.end is not None else None
+        segments = self._segments(guild_id)
+        for day in sorted(segments):
+            if (first_day is None or day >= first_day) and (last_day is None or day <= last_day):
+                yield segments[day]
+
+    def search(
+        self,
+        guild_id: str,
+        channel_id: Optional[int] = None,
+        author_id: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Messages d'un serveur filtrés par canal, auteur et `since <= ts < until` (UTC si naïf)."""
+        filters = _Filters(channel_id, author_id, _epoch(since), _epoch(until))
+        found = 0
+        for segment in self._days(str(guild_id), filters):
+            for entry in self._read_segment(str(guild_id), segment, filters):
+                yield entry
+                found += 1
+                if limit is not None and found >= limit:
+                    return
+
+    def count(
+        self,
+        guild_id: str,
+        channel_id: Optional[int] = None,
+        author_id: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> int:
+        """Nombre de messages correspondants (index seul, sans lire l'archive)."""
+        filters = _Filters(channel_id, author_id, _epoch(since), _epoch(until))
+        total = 0
+        for segment in self._days(str(guild_id), filters):
+            base = os.path.join(self.directory, str(guild_id), segment["day"])
+            index = self._sealed_index(base + INDEX_SUFFIX) if segment["sealed"] else None
+            if index is not None:
+                total += len(filters.select(index))
+            else:
+                # Segment actif (ou index absent): lecture des lignes
+                total += sum(1 for _ in self._read_segment(str(guild_id), segment, filters))
+        return total
+
+    def search_text(
+        self, guild_id: str, text: str, limit: int = 10, channels: Optional[Collection[str]] = None
+    ) -> List[SearchHit]:
+        """Messages d'un serveur contenant les mots de `text`, les plus pertinents d'abord.
+
+        `channels`: seuls les messages de ces canaux sont retenus (filtre
+        appliqué avant de garder les `limit` meilleurs).
+        """
+        guild_id = str(guild_id)
+        words = terms(text)
+        if not words:
+            return []
+        segments = self._segments(guild_id)
+        live_days = {date.fromisoformat(day).toordinal() for day in segments}
+        total = sum(segment["messages"] for segment in segments.values())
+        sources = self._term_sources(guild_id, segments)
+        scores: Dict[int, float] = defaultdict(float)
+        for word in words:
+            refs = set()
+            for source in sources:
+                refs.update(source(word))
+            # Références de journées expirées (run mensuelle pas encore supprimée) ignorées
+            refs = [ref for ref in refs if ref >> ROW_BITS in live_days]
+            if not refs:
+                continue
+            idf = math.log(1 + (total - len(refs) + 0.5) / (len(refs) + 0.5))
+            for ref in refs:
+                scores[ref] += idf
+        if channels is None:
+            ranked = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+        else:
+            ranked = sorted(scores.items(), key=lambda item: (item[1], item[0]), reverse=True)
+        hits = []
+        # Lecture par lots: avec un filtre de canaux, les lots suivants comblent les messages écartés
+        batch = limit if channels is None else 4 * limit
+        for start in range(0, len(ranked), batch):
+            chunk = ranked[start:start + batch]
+            entries = self._fetch_refs(guild_id, segments, [ref for ref, _ in chunk])
+            for ref, score in chunk:
+                entry = entries.get(ref)
+                if entry is None or (channels is not None and entry.get("channel") not in channels):
+                    continue
+                hits.append(SearchHit(score, entry))
+                if len(hits) >= limit:
+                    return hits
+        return hits
+
+    def _fetch_refs(self, guild_id: str, segments: Dict[str, Dict[str, Any]], refs: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Entrées de références (jour, ligne) de l'index plein texte."""
+        by_day: Dict[str, List[int]] = defaultdict(list)
+        for ref in refs:
+            day, row = split_ref(ref)
+            by_day[day].append(row)
+        entries = {}
+        for day, rows in by_day.items():
+            for row, entry in self._fetch(guild_id, segments[day], rows).items():
+                entries[make_ref(day, row)] = entry
+        return entries
+
+    def _term_sources(self, guild_id: str, segments: Dict[str, Dict[str, Any]]) -> list:
+        """Fonctions mot -> références: `.tok` des segments actifs, puis runs scellées."""
+        guild_dir = os.path.join(self.directory, guild_id)
+        sources = []
+        active_keys = set()
+        # Segments actifs d'abord: un segment scellé entre-temps a déjà sa run (écrite avant la suppression du .tok)
+        for day, segment in sorted(segments.items()):
+            if segment["sealed"]:
+                continue
+            key = (guild_id, day)
+            active = self._active_terms.get(key) or ActiveTerms(day)
+            try:
+                active.refresh(os.path.join(guild_dir, day + TOKENS_SUFFIX))
+            except FileNotFoundError:
+                continue
+            self._active_terms[key] = active
+            active_keys.add(key)
+            sources.append(lambda word, postings=active.postings: postings.get(word, ()))
+        for key in [key for key in self._active_terms if key[0] == guild_id and key not in active_keys]:
+            del self._active_terms[key]
+        try:
+            names = sorted(name for name in os.listdir(guild_dir) if name.endswith(TERMS_SUFFIX))
+        except FileNotFoundError:
+            return sources
+        for name in names:
+            run = self._term_run(os.path.join(guild_dir, name))
+            if run is not None:
+                sources.append(run.postings)
+        return sources
+
+    def _fetch(self, guild_id: str, segment: Dict[str, Any], rows: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Entrées des lignes `rows` d'un segment (rang de la ligne -> entrée)."""
+        base = os.path.join(self.directory, guild_id, segment["day"])
+        if not segment["sealed"]:
+            try:
+                found = {}
+                with open(base + ROWS_SUFFIX, 'rb') as f, open(base + ".jsonl", 'rb') as data:
+                    for row in rows:
+                        f.seek(row * ROW.size)
+                        raw = f.read(ROW.size)
+                        if len(raw) < ROW.size:
+                            continue
+                        _, _, offset, _, length = ROW.unpack(raw)
+                        data.seek(offset)
+                        line = data.read(length)
+                        if len(line) == length:
+                            found[row] = json.loads(line)
+                return found
+            except FileNotFoundError:
+                segment = self._segments(guild_id).get(segment["day"])  # Scellé entre-temps
+                if segment is None or not segment["sealed"]:
+                    return {}
+        decompress = COMPRESSIONS[segment["compression"]][2]
+        index = self._sealed_index(base + INDEX_SUFFIX)
+        try:
+            mapped = _map(os.path.join(self.directory, guild_id, segment["file"]))
+        except FileNotFoundError:
+            return {}  # Expiré entre-temps
+        if mapped is None:
+            return {}
+        found = {}
+        with mapped:
+            chunks = segment["chunks"]
+            if index is None:
+                lines = [
+                    line
+                    for offset, length, _, _, _ in chunks
+                    for line in decompress(mapped[offset:offset + length]).splitlines()
+                ]
+                return {row: json.loads(lines[row]) for row in rows if row < len(lines)}
+            by_chunk: Dict[int, List[int]] = defaultdict(list)
+            for row in rows:
+                if row < len(index):
+                    by_chunk[index.chunk[row]].append(row)
+            for chunk_no, chunk_rows in by_chunk.items():
+                offset, length = chunks[chunk_no][0], chunks[chunk_no][1]
+                raw = decompress(mapped[offset:offset + length])
+                for row in chunk_rows:
+                    start = index.offset[row]
+                    found[row] = json.loads(raw[start:start + index.length[row]])
+        return found
+
+    def _read_segment(self, guild_id: str, segment: Dict[str, Any], filters: _Filters) -> Iterator[Dict[str, Any]]:
+        if not segment["sealed"]:
+            try:
+                yield from self._read_active(guild_id, segment, filters)
+                return
+            except FileNotFoundError:
+                # Scellé par le bot entre la lecture du manifeste et celle du segment
+                segment = self._segments(guild_id).get(segment["day"])
+                if segment is None or not segment["sealed"]:
+                    return
+        yield from self._read_sealed(guild_id, segment, filters)
+
+    def _read_active(self, guild_id: str, segment: Dict[str, Any], filters: _Filters) -> Iterator[Dict[str, Any]]:
+        base = os.path.join(self.directory, guild_id, segment["day"])
+        with open(base + ROWS_SUFFIX, 'rb') as f:
+            rows = filters.scan(f.read())
+        mapped = _map(base + ".jsonl") if rows else None
+        if mapped is None:
+            return
+        with mapped:
+            size = len(mapped)
+            for offset, length in rows:
+                if offset + length <= size:  # Ligne pas encore écrite (index en avance)
+                    yield json.loads(mapped[offset:offset + length])
+
+    def _read_sealed(self, guild_id: str, segment: Dict[str, Any], filters: _Filters) -> Iterator[Dict[str, Any]]:
+        path = os.path.join(self.directory, guild_id, segment["file"])
+        decompress = COMPRESSIONS[segment["compression"]][2]
+        index = self._sealed_index(os.path.join(self.directory, guild_id, segment["day"] + INDEX_SUFFIX))
+        try:
+            mapped = _map(path)
+        except FileNotFoundError:
+            return  # Expiré entre-temps
+        if mapped is None:
+            return
+        with mapped:
+            chunks = segment["chunks"]
+            if index is None:
+                # Index absent: relecture complète des blocs de la période
+                for offset, length, _, _, _ in chunks:
+                    for line in decompress(mapped[offset:offset + length]).splitlines():
+                        entry = json.loads(line)
+                        if filters.matches(entry):
+                            yield entry
+                return
+            by_chunk: Dict[int, List[int]] = defaultdict(list)
+            for row in filters.select(index):
+                by_chunk[index.chunk[row]].append(row)
+            for chunk_no in sorted(by_chunk):
+                offset, length = chunks[chunk_no][0], chunks[chunk_no][1]
+                raw = decompress(mapped[offset:offset + length])
+                for row in by_chunk[chunk_no]:
+                    start = index.offset[row]
+                    yield json.loads(raw[start:start + index.length[row]])
+
+
+def _parse_moment(value: str) -> datetime:
+    moment = datetime.fromisoformat(value)
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Recherche dans l'archive des messages (index + mmap).")
+    parser.add_argument("guild", help="Identifiant du serveur")
+    parser.add_argument("--author", type=int, help="Identifiant de l'auteur")
+    parser.add_argument("--channel", type=int, help="Identifiant du canal")
+    parser.add_argument("--since", type=_parse_moment, help="Début inclus (ISO, UTC si sans fuseau)")
+    parser.add_argument("--until", type=_parse_moment, help="Fin exclue (ISO, UTC si sans fuseau)")
+    parser.add_argument("--limit", type=int, help="Nombre max de messages affichés")
+    parser.add_argument("--count", action="store_true", help="Affiche seulement le nombre de messages")
+    parser.add_argument("--text", help="Mots-clés (index plein texte, résultats classés; --limit, défaut 10)")
+    parser.add_argument("--dir", default=DEFAULT_ARCHIVE_DIR, help="Dossier de l'archive")
+    args = parser.parse_args(argv)
+
+    query = ArchiveQuery(args.dir)
+    start = time.perf_counter()
+    if args.count:
+        print(query.count(args.guild, args.channel, args.author, args.since, args.until))
+        found = None
+    elif args.text is not None:
+        hits = query.search_text(args.guild, args.text, args.limit or 10)
+        for hit in hits:
+            print(f"{hit.score:.2f}\t{json.dumps(hit.entry, ensure_ascii=False)}")
+        found = len(hits)
+    else:
+        found = 0
+        for entry in query.search(args.guild, args.channel, args.author, args.since, args.until, args.limit):
+            print(json.dumps(entry, ensure_ascii=False))
+            found += 1
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    summary = f"{elapsed_ms:.1f} ms" if found is None else f"{found} messages en {elapsed_ms:.1f} ms"
+    print(summary, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
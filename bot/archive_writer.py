@@ -0,0 +1,147 @@
+"""Tâche d'écriture de l'archive: file bornée, lots ordonnés, flush sur taille ou délai.
+
+Le cog analytics dépose chaque entrée dans une `asyncio.Queue` bornée. Une
+seule coroutine, lancée pour la durée de vie du cog, la vide: un lot part
+dès `batch_size` entrées ou `max_delay` secondes après sa première entrée
+(un canal calme n'attend plus la sauvegarde périodique). Les lots sont
+écrits un par un sur un thread dédié, donc dans l'ordre d'arrivée. Si
+l'écriture prend du retard, la file se remplit et `put` attend: le
+producteur ralentit au lieu de laisser la mémoire grossir. Un lot en échec
+est retenté tel quel (ni perte ni réordonnancement): `write` ne doit donc
+lever que si rien n'a été écrit, les étapes suivant l'ajout (scellement,
+rétention, exports) gèrent leurs propres erreurs.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Attente avant de retenter un lot dont l'écriture a échoué
+RETRY_DELAY_SECONDS = 5
+
+_STOP = object()  # Sentinelle de fin (déposée par `stop`)
+
+
+class ArchiveWriter:
+    """File bornée + coroutine d'écriture unique pour l'archive des messages.
+
+    `write(batch)` est appelée sur le thread dédié, un lot à la fois; avec
+    un lot vide quand la file est restée inactive `idle_seconds` (permet de
+    sceller les journées passées sans nouveau message).
+    """
+
+    def __init__(
+        self,
+        write: Callable[[List[Dict[str, Any]]], None],
+        batch_size: int,
+        max_delay: float,
+        queue_size: int,
+        idle_seconds: float,
+    ):
+        self._write = write
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.idle_seconds = idle_seconds
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="archive-writer")
+        self._task: asyncio.Task | None = None
+        # Mesures (lues par `stats`)
+        self._batches = 0
+        self._written = 0
+        self._blocked_puts = 0  # `put` ayant dû attendre une place dans la file
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def put(self, entry: Dict[str, Any]):
+        """Ajoute une entrée; attend si la file est pleine (contre-pression)."""
+        if self._queue.full():
+            self._blocked_puts += 1
+        await self._queue.put(entry)
+
+    async def stop(self):
+        """Écrit les entrées déjà en file, puis arrête la coroutine et le thread."""
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        self._executor.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Profondeur de file et latences d'écriture (ms) depuis le démarrage."""
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_size": self._queue.maxsize,
+            "batches": self._batches,
+            "messages": self._written,
+            "blocked_puts": self._blocked_puts,
+            "last_flush_ms": self._last_flush_ms,
+            "avg_flush_ms": self._total_flush_ms / self._batches if self._batches else 0.0,
+            "max_flush_ms": self._max_flush_ms,
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch: List[Dict[str, Any]] = []
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout=self.idle_seconds)
+            except asyncio.TimeoutError:
+                item = None  # File inactive: lot vide
+            deadline = loop.time() + self.max_delay
+            while item is not None:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                if not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch, stopping)
+
+    async def _flush(self, batch: List[Dict[str, Any]], stopping: bool):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = time.perf_counter()
+            try:
+                await loop.run_in_executor(self._executor, self._write, batch)
+            except Exception as e:
+                if not batch:
+                    logger.error(f"[Archive] Erreur écriture (lot vide): {e}")
+                    return
+                if stopping:
+                    logger.error(f"[Archive] Écriture impossible à l'arrêt, {len(batch)} messages perdus: {e}")
+                    return
+                logger.error(f"[Archive] Erreur écriture ({len(batch)} messages), nouvel essai dans {RETRY_DELAY_SECONDS}s: {e}")
+                await asyncio.sleep(RETRY_DELAY_SECONDS)
+                continue
+            break
+        if not batch:
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._batches += 1
+        self._written += len(batch)
+        self._last_flush_ms = elapsed_ms
+        self._total_flush_ms += elapsed_ms
+        self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+        logger.debug(
+            f"[Archive] {len(batch)} messages archivés en {elapsed_ms:.1f} ms (file: {self._queue.qsize()})"
+        )
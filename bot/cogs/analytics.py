@@ -1,105 +1,65 @@
 import asyncio
-import json
 import logging
 import os
-import re
-from collections import deque
-from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Set
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from discord import Reaction, User
 from discord.ext import commands, tasks
 
+from bot.analytics_stats import (
+    CURRENT_SCHEMA_VERSION,
+    empty_guild_stats,
+    in_conversation_window,
+    time_segment,
+)
+from bot.analytics_store import AnalyticsShardStore
+from bot.archive_columns import ColumnWriter
+from bot.archive_writer import ArchiveWriter
+from bot.conversation_cache import ConversationCache
 from bot.constants import (
     ANALYTICS_ARCHIVE_BUFFER_SIZE,
+    ANALYTICS_ARCHIVE_COLUMNS_ENABLED,
+    ANALYTICS_ARCHIVE_COMPRESSION,
+    ANALYTICS_ARCHIVE_FLUSH_DELAY_SECONDS,
+    ANALYTICS_ARCHIVE_QUEUE_SIZE,
+    ANALYTICS_ARCHIVE_RETENTION_DAYS,
+    ANALYTICS_CONVERSATION_CACHE_MAX_ENTRIES,
     ANALYTICS_MESSAGE_CACHE_SIZE,
     ANALYTICS_MESSAGE_CACHE_TTL_SECONDS,
     ANALYTICS_SAVE_INTERVAL_MINUTES,
+    ANALYTICS_WORD_COUNT_SKETCH_CAPACITY,
+    ANALYTICS_WORD_COUNT_SKETCH_ENABLED,
     ANALYTICS_WORD_COUNT_TOP_N,
     ANALYTICS_DEBUG_WORDS,
+    STATE_FILE_CODEC,
 )
+from bot.heavy_hitters import SpaceSaving
+from bot.message_archive import MessageArchive
+from bot.message_features import PARIS_TZ, MessageFeatures, get_message_dispatcher
+from bot.serialization import get_codec, load_file
+from bot.snapshots import CopyOnWrite
+from bot.time_rollups import GuildRollups, week_of
+from bot.user_counters import GuildCounters
 
 # Configuration
-ANALYTICS_FILE = "data/analytics_v1.json"
-ARCHIVE_FILE = "data/messages_archive_v1.jsonl"
+ANALYTICS_DIR = "data/analytics"  # Un fichier par serveur + _meta.json (codec STATE_FILE_CODEC)
+ANALYTICS_FILE = "data/analytics_v1.json"  # Ancien fichier unique (migré vers ANALYTICS_DIR en v2)
+ARCHIVE_DIR = "data/archive"  # Segments par serveur et par jour + _manifest.json
+ARCHIVE_FILE = "data/messages_archive_v1.jsonl"  # Ancienne archive unique (importée dans ARCHIVE_DIR)
+COLUMNS_DIR = "data/columns"  # Export en colonnes de l'archive (analyses hors ligne)
 CONFIG_FILE = "data/analytics_config.json"
 SAVE_INTERVAL_MINUTES = ANALYTICS_SAVE_INTERVAL_MINUTES
 ARCHIVE_BUFFER_SIZE = ANALYTICS_ARCHIVE_BUFFER_SIZE
+ARCHIVE_FLUSH_DELAY_SECONDS = ANALYTICS_ARCHIVE_FLUSH_DELAY_SECONDS
+ARCHIVE_QUEUE_SIZE = ANALYTICS_ARCHIVE_QUEUE_SIZE
+ARCHIVE_COMPRESSION = ANALYTICS_ARCHIVE_COMPRESSION
+ARCHIVE_RETENTION_DAYS = ANALYTICS_ARCHIVE_RETENTION_DAYS
+ARCHIVE_COLUMNS_ENABLED = ANALYTICS_ARCHIVE_COLUMNS_ENABLED
+# Top mots du serveur: sketch Space-Saving (mémoire bornée) au lieu du comptage exact + prune quotidien
+WORD_COUNT_SKETCH_ENABLED = ANALYTICS_WORD_COUNT_SKETCH_ENABLED
+WORD_COUNT_SKETCH_CAPACITY = ANALYTICS_WORD_COUNT_SKETCH_CAPACITY
 
-# Mots courants à exclure du word count
-COMMON_WORDS = {
-    # Articles / déterminants
-    "le", "la", "les", "un", "une", "des", "de", "du", "au", "aux",
-    # Pronoms personnels / réfléchis
-    "je", "tu", "il", "elle", "on", "nous", "vous", "ils", "elles",
-    "me", "te", "se", "lui", "soi", "en", "y", "moi", "toi", "eux",
-    # Pronoms démonstratifs / relatifs / interrogatifs
-    "ce", "cet", "cette", "ces", "que", "qui", "quoi", "dont", "où",
-    # Possessifs
-    "mon", "ton", "son", "ma", "ta", "sa", "mes", "tes", "ses",
-    "notre", "votre", "leur", "nos", "vos", "leurs",
-    # Conjonctions
-    "et", "ou", "mais", "donc", "car", "ni", "puis", "sinon",
-    # Prépositions
-    "à", "dans", "par", "pour", "avec", "sans", "sur", "sous",
-    "entre", "devant", "derrière", "vers", "chez", "après", "avant",
-    "pendant", "depuis", "contre", "jusque",
-    # Adverbes courants
-    "plus", "moins", "très", "trop", "peu", "bien", "mal",
-    "aussi", "encore", "même", "tout", "tous", "toute", "toutes",
-    "rien", "jamais", "toujours", "alors", "comme", "quand", "comment",
-    "vraiment", "juste", "déjà", "assez", "tant", "tellement",
-    "là", "ici", "maintenant", "peut", "être",
-    # Verbes auxiliaires / très courants (conjugaisons)
-    "est", "ai", "as", "a", "avons", "avez", "ont", "été", "être", "avoir",
-    "faire", "fait", "fais", "dit", "dis", "suis", "était", "sont", "sera",
-    "vais", "vas", "aller", "peux", "peut", "veut", "veux", "faut", "doit",
-    "voit", "sait", "met", "mis",
-    # Négation / affirmation
-    "oui", "non", "si", "pas", "ne", "ça", "ca",
-    # Fragments d'élision
-    "l", "d", "s", "n", "c", "j", "m", "t", "qu",
-    # Argot / mots informels Discord
-    "mdr", "lol", "ptdr", "xd", "haha", "ahah", "hihi", "hehe",
-    "osef", "tkt", "stp", "svp", "btw", "omg", "jsp", "jpp",
-    "tmtc", "oklm", "fdp", "wtf", "imo", "afk", "gg", "wp",
-}
-
-CUSTOM_EMOJI_RE = re.compile(r"<a?:([A-Za-z0-9_]+):\d+>")
-SHORTCODE_EMOJI_RE = re.compile(r":([A-Za-z0-9_]+):")
-URL_RE = re.compile(r"https?://\S+")
-MENTION_RE = re.compile(r"<[@#][!&]?\d+>")
-REPEATED_CHAR_RE = re.compile(r"(.)\1{2,}")
-UNICODE_EMOJI_RE = re.compile(
-    "["
-    "\U0001F300-\U0001F5FF"  # Misc Symbols and Pictographs
-    "\U0001F600-\U0001F64F"  # Emoticons
-    "\U0001F680-\U0001F6FF"  # Transport and Map
-    "\U0001F700-\U0001F77F"  # Alchemical Symbols
-    "\U0001F780-\U0001F7FF"  # Geometric Shapes Extended
-    "\U0001F800-\U0001F8FF"  # Supplemental Arrows-C
-    "\U0001F900-\U0001F9FF"  # Supplemental Symbols and Pictographs
-    "\U0001FA00-\U0001FA6F"  # Chess Symbols
-    "\U0001FA70-\U0001FAFF"  # Symbols and Pictographs Extended-A
-    "\U00002700-\U000027BF"  # Dingbats
-    "\U00002600-\U000026FF"  # Misc Symbols
-    "\U0001F1E0-\U0001F1FF"  # Drapeaux (Regional Indicators)
-    "\U0000FE00-\U0000FE0F"  # Variation Selectors
-    "\U0000200D"             # Zero Width Joiner
-    "\U00002300-\U000023FF"  # Misc Technical
-    "\U00002B50-\U00002B55"  # Stars
-    "\U000000A9"             # Copyright
-    "\U000000AE"             # Registered
-    "\U0000203C-\U00003299"  # Misc symbols CJK
-    "]",
-    re.UNICODE,
-)
-
-# Cache pour conversations: garde les 20 derniers messages par canal (max 10 min)
-MESSAGE_CACHE_SIZE = ANALYTICS_MESSAGE_CACHE_SIZE
-MESSAGE_CACHE_TTL_SECONDS = ANALYTICS_MESSAGE_CACHE_TTL_SECONDS
-
-CURRENT_SCHEMA_VERSION = 1
 logger = logging.getLogger(__name__)
 
 
@@ -111,48 +71,107 @@ class AnalyticsCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.data: Dict[str, Any] = {}
-        self.archive_buffer: List[Dict] = []
         self.last_save: Optional[datetime] = None
         
-        # Cache mémoire pour conversations: {channel_id: deque[(author_id, timestamp), ...]}
-        self.message_cache: Dict[str, deque] = {}
+        # Cache mémoire pour conversations: derniers messages par canal, budget global, LRU par canal
+        self.message_cache = ConversationCache(
+            ANALYTICS_CONVERSATION_CACHE_MAX_ENTRIES, ANALYTICS_MESSAGE_CACHE_SIZE, ANALYTICS_MESSAGE_CACHE_TTL_SECONDS
+        )
         
         # Sets pour utilisateurs/canaux uniques (recherche O(1) vs O(n) avec liste)
         self._unique_users_cache: Dict[str, Set[str]] = {}
         self._unique_channels_cache: Dict[str, Set[str]] = {}
         
+        # Sketchs Space-Saving par serveur (branchés sur stats["word_counts"])
+        self._word_sketches: Dict[str, SpaceSaving] = {}
+        
+        # Compteurs par utilisateur à clés entières (mots, emojis, tranches), par serveur.
+        # Remplacent en mémoire les champs JSON correspondants, recréés à l'export.
+        self._user_counters: Dict[str, GuildCounters] = {}
+        
+        # Séries d'activité heure/jour/semaine par serveur et par canal (exportées dans daily_snapshots)
+        self._rollups: Dict[str, GuildRollups] = {}
+        
+        # Persistance par serveur: seuls les serveurs modifiés sont réécrits
+        self._store = AnalyticsShardStore(ANALYTICS_DIR, get_codec(STATE_FILE_CODEC))
+        self._dirty_guilds: Set[str] = set()
+        # Copy-on-write par serveur: la sauvegarde écrit hors de l'event loop une vue figée,
+        # les conteneurs modifiés pendant l'écriture sont copiés d'abord (`writable`)
+        self._cow: Dict[str, CopyOnWrite] = {}
+        self._save_version = 0  # Incrémenté à chaque snapshot (ordre des écritures)
+        
         # Créer le dossier data s'il n'existe pas
         os.makedirs("data", exist_ok=True)
         
+        # Archive des messages: segments par serveur et par jour, compressés une fois scellés
+        self._archive = MessageArchive(ARCHIVE_DIR, ARCHIVE_COMPRESSION, ARCHIVE_RETENTION_DAYS)
+        # Copie en colonnes, écrite par le même thread (secondaire: reconstructible depuis l'archive)
+        self._columns = ColumnWriter(COLUMNS_DIR, ARCHIVE_RETENTION_DAYS) if ARCHIVE_COLUMNS_ENABLED else None
+        # Écriture par une seule tâche: lots ordonnés, flush sur taille ou délai, file bornée.
+        # Inactive, elle écrit un lot vide à chaque intervalle de sauvegarde (scellement)
+        self._archive_writer = ArchiveWriter(
+            self._write_archive_sync,
+            batch_size=ARCHIVE_BUFFER_SIZE,
+            max_delay=ARCHIVE_FLUSH_DELAY_SECONDS,
+            queue_size=ARCHIVE_QUEUE_SIZE,
+            idle_seconds=SAVE_INTERVAL_MINUTES * 60,
+        )
+        
         # Charger ou initialiser les données
         self._load_data()
         
-        # Démarrer la sauvegarde périodique
+        # Démarrer la sauvegarde périodique et l'écriture de l'archive
         self.periodic_save.start()
+        self._archive_writer.start()
+        get_message_dispatcher(bot).subscribe(self.on_message_features)
     
     def cog_unload(self):
         """Appelé quand le cog est déchargé - force la sauvegarde."""
+        get_message_dispatcher(self.bot).unsubscribe(self.on_message_features)
         self.periodic_save.cancel()
-        asyncio.create_task(self._force_save())
+        asyncio.create_task(self._shutdown())
+    
+    async def _shutdown(self):
+        """Sauvegarde finale, puis écriture des messages encore en file."""
+        await self._force_save()
+        try:
+            await self._archive_writer.stop()
+        finally:
+            self._archive.close()
     
     def _load_data(self):
-        """Charge les données depuis le fichier JSON ou initialise."""
-        if os.path.exists(ANALYTICS_FILE):
+        """Charge les données depuis les shards (ou l'ancien fichier unique) ou initialise."""
+        if self._store.exists() or os.path.exists(ANALYTICS_FILE):
             try:
-                with open(ANALYTICS_FILE, 'r', encoding='utf-8') as f:
-                    self.data = json.load(f)
+                if self._store.exists():
+                    self.data = self._store.load()
+                else:
+                    self.data = load_file(ANALYTICS_FILE)
                 
                 # Vérifier et migrer si nécessaire
                 self._migrate_if_needed()
+                
+                # Convertir dès le chargement les compteurs par utilisateur
+                for guild_id in self.data:
+                    if not guild_id.startswith("_"):
+                        self._get_user_counters(guild_id)
+                        self._get_rollups(guild_id)
                 logger.info(f"[Analytics] Données chargées - Schema v{self.data['_meta']['schema_version']}")
             except Exception as e:
-                logger.error(f"[Analytics] Erreur chargement: {e}")
+                logger.error(
+                    f"[Analytics] Erreur chargement (reconstructible depuis l'archive, bot arrêté: "
+                    f"python -m bot.analytics_rebuild): {e}"
+                )
                 self._init_empty_data()
         else:
             self._init_empty_data()
     
     def _init_empty_data(self):
         """Initialise une structure de données vide."""
+        self._user_counters.clear()
+        self._rollups.clear()
+        self._dirty_guilds.clear()
+        self._cow.clear()
         self.data = {
             "_meta": {
                 "schema_version": CURRENT_SCHEMA_VERSION,
@@ -171,6 +190,7 @@ class AnalyticsCog(commands.Cog):
         
         if current_version < CURRENT_SCHEMA_VERSION:
             logger.info(f"[Analytics] Migration v{current_version} → v{CURRENT_SCHEMA_VERSION}")
+            changes = []
             
             # Migration v0 → v1 (structure initiale)
             if current_version < 1:
@@ -188,6 +208,20 @@ class AnalyticsCog(commands.Cog):
                 for guild_id in guild_ids:
                     if guild_id not in self.data:
                         self.data[guild_id] = self._create_empty_guild_stats()
+                changes.append("Initial schema setup")
+            
+            # Migration v1 → v2 (fichier unique → un fichier par serveur)
+            if current_version < 2:
+                self._dirty_guilds.update(key for key in self.data if not key.startswith("_"))
+                changes.append(f"Split {ANALYTICS_FILE} into one file per guild in {ANALYTICS_DIR}")
+            
+            # Migration v2 → v3 (daily_snapshots: liste jamais remplie → séries d'activité)
+            if current_version < 3:
+                for guild_id in [key for key in self.data if not key.startswith("_")]:
+                    if not isinstance(self.data[guild_id].get("daily_snapshots"), dict):
+                        self.data[guild_id]["daily_snapshots"] = {}
+                    self._dirty_guilds.add(guild_id)
+                changes.append("daily_snapshots: hourly/daily/weekly activity rollups per guild and channel")
             
             # Mettre à jour la version
             self.data["_meta"]["schema_version"] = CURRENT_SCHEMA_VERSION
@@ -196,45 +230,18 @@ class AnalyticsCog(commands.Cog):
                 "from_version": current_version,
                 "to_version": CURRENT_SCHEMA_VERSION,
                 "date": datetime.now().isoformat(),
-                "changes": ["Initial schema setup"]
+                "changes": changes
             })
             
-            self._save_data()
+            # Métadonnées écrites en dernier: tant qu'elles manquent, l'ancien fichier reste la source.
+            # Une fois les shards écrits, il est gardé à côté mais n'est plus relu.
+            if self._save_data() and os.path.exists(ANALYTICS_FILE):
+                os.replace(ANALYTICS_FILE, ANALYTICS_FILE + ".migrated")
             logger.info("[Analytics] Migration terminée")
     
     def _create_empty_guild_stats(self) -> Dict:
         """Crée une structure de stats vide pour un serveur."""
-        return {
-            "global_stats": {
-                "messages_total": 0,
-                "messages_by_day": [0] * 7,  # Lundi=0, Dimanche=6
-                "messages_by_hour": [0] * 24,  # 00h-23h
-                "messages_by_segment": {
-                    "night": 0,
-                    "morning": 0,
-                    "afternoon": 0,
-                    "evening": 0
-                },
-                "messages_by_segment_by_user": {},
-                "unique_users": [],  # Stocké comme liste pour JSON, mais on utilise des sets en mémoire
-                "unique_channels": [],
-                "word_counts": {},
-                "word_counts_by_user": {},
-                "emoji_text_usage": {
-                    "users": {}
-                },
-                "conversations": {},  # "userA_userB": count
-                "mentions_graph": {
-                    "given": {},  # user: {target: count}
-                    "received": {}  # user: {source: count}
-                },
-                "reactions_stats": {
-                    "total_added": 0,
-                    "by_emoji": {}
-                }
-            },
-            "daily_snapshots": []
-        }
+        return empty_guild_stats()
     
     def _init_cache_for_guild(self, guild_id: str):
         """Initialise les caches en mémoire pour un serveur."""
@@ -245,23 +252,69 @@ class AnalyticsCog(commands.Cog):
     
     def _update_message_cache(self, channel_id: str, author_id: str, timestamp: datetime):
         """Met à jour le cache de messages pour un canal."""
-        if channel_id not in self.message_cache:
-            self.message_cache[channel_id] = deque(maxlen=MESSAGE_CACHE_SIZE)
-        
-        # Nettoyer les anciens messages (> 10 min) du cache
-        cutoff = timestamp - timedelta(seconds=MESSAGE_CACHE_TTL_SECONDS)
-        cache = self.message_cache[channel_id]
-        while cache and cache[0][1] < cutoff:
-            cache.popleft()
-        
-        # Ajouter le nouveau message
-        cache.append((author_id, timestamp))
+        self.message_cache.add(channel_id, author_id, timestamp)
+    
+    def _get_cow(self, guild_id: str) -> CopyOnWrite:
+        cow = self._cow.get(guild_id)
+        if cow is None:
+            cow = self._cow[guild_id] = CopyOnWrite()
+        return cow
+    
+    def _writable_stats(self, guild_id: str) -> Dict:
+        """`global_stats` modifiable d'un serveur (copié d'abord si une sauvegarde l'écrit)."""
+        self._get_guild_data(guild_id)
+        writable = self._get_cow(guild_id).writable
+        return writable(writable(self.data, guild_id), "global_stats")
+    
+    def _get_word_sketch(self, guild_id: str, stats: Dict) -> SpaceSaving:
+        """Sketch top mots d'un serveur (compte dans stats["word_counts"], erreurs à côté).
+
+        `stats` doit être modifiable (`_writable_stats`).
+        """
+        writable = self._get_cow(guild_id).writable
+        stats.setdefault("word_counts_errors", {})
+        counts = writable(stats, "word_counts")
+        errors = writable(stats, "word_counts_errors")
+        sketch = self._word_sketches.get(guild_id)
+        # Reconstruit aussi après une copie (copy-on-write): le tas ne dépend que des comptes
+        if sketch is None or sketch.counts is not counts or sketch.errors is not errors:
+            sketch = SpaceSaving(WORD_COUNT_SKETCH_CAPACITY, counts=counts, errors=errors)
+            self._word_sketches[guild_id] = sketch
+        return sketch
+    
+    def _get_user_counters(self, guild_id: str) -> GuildCounters:
+        """Compteurs par utilisateur d'un serveur (convertis depuis le JSON au premier accès)."""
+        counters = self._user_counters.get(guild_id)
+        if counters is None:
+            stats = self._writable_stats(guild_id)
+            counters = self._user_counters[guild_id] = GuildCounters.from_stats(stats)
+        return counters
+    
+    def get_user_snapshot(self, guild_id: str, user_id: int) -> Dict:
+        """Emojis, mots, tranches horaires et interactions d'un utilisateur (format JSON)."""
+        return self._get_user_counters(guild_id).user_snapshot(user_id)
+    
+    def _get_rollups(self, guild_id: str) -> GuildRollups:
+        """Séries d'activité d'un serveur (converties depuis daily_snapshots au premier accès)."""
+        rollups = self._rollups.get(guild_id)
+        if rollups is None:
+            guild_data = self._get_guild_data(guild_id)
+            rollups = self._rollups[guild_id] = GuildRollups.from_data(guild_data.get("daily_snapshots"))
+        return rollups
+    
+    def get_activity(self, guild_id: str, resolution: str, n: int, channel_id: Optional[str] = None) -> List[Optional[int]]:
+        """Messages des `n` dernières heures / jours / semaines ("hour", "day", "week"), du plus ancien au plus récent.
+
+        None pour un bucket plus ancien que ce que garde la série.
+        """
+        return self._get_rollups(guild_id).recent(resolution, n, datetime.now(PARIS_TZ), channel_id)
     
     def _get_guild_data(self, guild_id: str) -> Dict:
         """Récupère ou crée les données d'un serveur."""
         if guild_id not in self.data:
             self.data[guild_id] = self._create_empty_guild_stats()
             self._init_cache_for_guild(guild_id)
+            self._dirty_guilds.add(guild_id)
         
         # Synchroniser les sets mémoire avec les données JSON si premier accès
         if guild_id not in self._unique_users_cache:
@@ -271,67 +324,56 @@ class AnalyticsCog(commands.Cog):
         
         return self.data[guild_id]
     
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        """Collecte les données à chaque message."""
-        # Ignorer les bots
-        if message.author.bot:
-            return
-        
-        # Ignorer les DM
-        if not message.guild:
-            return
-        
-        guild_id = str(message.guild.id)
-        author_id = str(message.author.id)
-        channel_id = str(message.channel.id)
-        now = datetime.now()
+    async def on_message_features(self, features: MessageFeatures):
+        """Collecte les données à chaque message (bots et DM déjà filtrés)."""
+        message = features.message
+        guild_id = str(features.guild_id)
+        author_id = str(features.author_id)
+        channel_id = str(features.channel_id)
+        now = features.now
         msg_timestamp = message.created_at.replace(tzinfo=None) if message.created_at.tzinfo else message.created_at
         
-        # Récupérer les données du serveur
-        guild_data = self._get_guild_data(guild_id)
-        stats = guild_data["global_stats"]
+        # Récupérer les données du serveur. Tout conteneur modifié passe par `writable`:
+        # copié d'abord s'il appartient à une sauvegarde en cours d'écriture
+        stats = self._writable_stats(guild_id)
+        writable = self._get_cow(guild_id).writable
+        user_counters = self._get_user_counters(guild_id)
+        self._dirty_guilds.add(guild_id)
         
         # 1. Stats temporelles
         stats["messages_total"] += 1
-        stats["messages_by_day"][now.weekday()] += 1
-        stats["messages_by_hour"][now.hour] += 1
+        writable(stats, "messages_by_day")[now.weekday()] += 1
+        writable(stats, "messages_by_hour")[now.hour] += 1
         if "messages_by_segment" not in stats:
             stats["messages_by_segment"] = {"night": 0, "morning": 0, "afternoon": 0, "evening": 0}
         segment = self._get_time_segment(now.hour)
-        stats["messages_by_segment"][segment] = stats["messages_by_segment"].get(segment, 0) + 1
-        user_segments = stats.setdefault("messages_by_segment_by_user", {}).setdefault(
-            author_id,
-            {"night": 0, "morning": 0, "afternoon": 0, "evening": 0},
-        )
-        user_segments[segment] = user_segments.get(segment, 0) + 1
+        by_segment = writable(stats, "messages_by_segment")
+        by_segment[segment] = by_segment.get(segment, 0) + 1
+        user_counters.add_segment(features.author_id, segment)
+        self._get_rollups(guild_id).add(channel_id, now)
         
         # 2. Utilisateurs uniques (utilisation de set pour O(1))
         if author_id not in self._unique_users_cache[guild_id]:
             self._unique_users_cache[guild_id].add(author_id)
-            stats["unique_users"].append(author_id)
+            writable(stats, "unique_users").append(author_id)
         
         # 3. Canaux uniques (utilisation de set pour O(1))
         if channel_id not in self._unique_channels_cache[guild_id]:
             self._unique_channels_cache[guild_id].add(channel_id)
-            stats["unique_channels"].append(channel_id)
+            writable(stats, "unique_channels").append(channel_id)
         
         # 4. Word count
-        if message.content and not message.content.startswith(("o!", "O!", "!", "?", ".", "/", "$", "~", "-", "+")):
-            words = self._extract_words(message.content)
-            kept_words = [
-                word for word in words
-                if word not in COMMON_WORDS
-                and len(word) >= 3
-                and not word.isdigit()
-                and not REPEATED_CHAR_RE.fullmatch(word)
-            ]
+        if not features.is_command:
+            # Mots déjà filtrés par le tokenizer (mots courants, longueur, nombres, répétitions)
+            kept_words = features.words
             if kept_words:
-                for word in kept_words:
-                    stats["word_counts"][word] = stats["word_counts"].get(word, 0) + 1
-                user_words = stats.setdefault("word_counts_by_user", {}).setdefault(author_id, {})
-                for word in kept_words:
-                    user_words[word] = user_words.get(word, 0) + 1
+                if WORD_COUNT_SKETCH_ENABLED:
+                    self._get_word_sketch(guild_id, stats).update(kept_words)
+                else:
+                    word_counts = writable(stats, "word_counts")
+                    for word in kept_words:
+                        word_counts[word] = word_counts.get(word, 0) + 1
+                user_counters.add_words(features.author_id, kept_words)
             if ANALYTICS_DEBUG_WORDS and kept_words:
                 logger.debug(
                     "[Analytics] Words kept guild=%s author=%s words=%s",
@@ -347,122 +389,44 @@ class AnalyticsCog(commands.Cog):
                     pass
 
         # 4b. Emojis texte (par utilisateur)
-        if message.content:
-            emojis = self._extract_text_emojis(message.content)
-            if emojis:
-                if "emoji_text_usage" not in stats:
-                    stats["emoji_text_usage"] = {"users": {}}
-                user_emojis = stats["emoji_text_usage"]["users"].setdefault(author_id, {})
-                for emoji in emojis:
-                    user_emojis[emoji] = user_emojis.get(emoji, 0) + 1
+        if features.emojis:
+            user_counters.add_emojis(features.author_id, features.emojis)
         
-        # 5. Mentions
-        if message.mentions:
-            for mentioned in message.mentions:
-                if not mentioned.bot:  # Ignorer les bots mentionnés
-                    mentioned_id = str(mentioned.id)
-                    
-                    # Given (l'auteur mentionne)
-                    if author_id not in stats["mentions_graph"]["given"]:
-                        stats["mentions_graph"]["given"][author_id] = {}
-                    stats["mentions_graph"]["given"][author_id][mentioned_id] = \
-                        stats["mentions_graph"]["given"][author_id].get(mentioned_id, 0) + 1
-                    
-                    # Received (la personne est mentionnée)
-                    if mentioned_id not in stats["mentions_graph"]["received"]:
-                        stats["mentions_graph"]["received"][mentioned_id] = {}
-                    stats["mentions_graph"]["received"][mentioned_id][author_id] = \
-                        stats["mentions_graph"]["received"][mentioned_id].get(author_id, 0) + 1
+        # 5. Mentions (bots mentionnés déjà ignorés; arête auteur -> mentionné, entrées dans les deux sens)
+        for mentioned in features.mentions:
+            user_counters.add_mention(features.author_id, mentioned)
         
         # 6. Mettre à jour le cache de messages
         self._update_message_cache(channel_id, author_id, msg_timestamp)
         
         # 7. Détecter les conversations via le cache (sans appel API)
-        self._detect_conversation(message, guild_data, author_id, channel_id, msg_timestamp)
+        partner_id = self._detect_conversation(message, author_id, channel_id, msg_timestamp)
+        if partner_id is not None:
+            user_counters.add_conversation(features.author_id, int(partner_id))
         
-        # 8. Archiver le message
-        self._archive_message(message, guild_id)
+        # 8. Archiver le message (attend si la file d'écriture est pleine)
+        await self._archive_message(message, guild_id)
     
-    def _extract_words(self, text: str) -> List[str]:
-        """Extrait les mots d'un texte (minuscules, sans ponctuation)."""
-        # Convertir en minuscules
-        text = text.lower()
-
-        # Retirer liens, mentions et emojis
-        text = URL_RE.sub(" ", text)
-        text = MENTION_RE.sub(" ", text)
-        text = CUSTOM_EMOJI_RE.sub(" ", text)
-        text = SHORTCODE_EMOJI_RE.sub(" ", text)
-        text = UNICODE_EMOJI_RE.sub(" ", text)
-        
-        # Remplacer la ponctuation par des espaces
-        for char in ".,;:!?\"'()[]{}@#&-_=+/*$%~`^|<>\\":
-            text = text.replace(char, " ")
-        
-        # Split et filtrer
-        words = [w.strip() for w in text.split() if w.strip()]
-        return words
-
     def _get_time_segment(self, hour: int) -> str:
         """Retourne la tranche horaire (night, morning, afternoon, evening)."""
-        if 0 <= hour <= 5:
-            return "night"
-        if 6 <= hour <= 11:
-            return "morning"
-        if 12 <= hour <= 17:
-            return "afternoon"
-        return "evening"
-
-    def _extract_text_emojis(self, text: str) -> List[str]:
-        """Extrait les emojis du texte (unicode + custom)."""
-        emojis: List[str] = []
-        if not text:
-            return emojis
-
-        for name in CUSTOM_EMOJI_RE.findall(text):
-            emojis.append(f":{name}:")
+        return time_segment(hour)
 
-        emojis.extend(UNICODE_EMOJI_RE.findall(text))
-        return emojis
-    
-    def _detect_conversation(self, message, guild_data: Dict, author_id: str, channel_id: str, timestamp: datetime):
-        """Détecte si le message est une réponse (référence si dispo, sinon cache)."""
+    def _detect_conversation(self, message, author_id: str, channel_id: str, timestamp: datetime) -> Optional[str]:
+        """Auteur auquel le message répond (référence si dispo, sinon cache), ou None."""
         reference = getattr(message, "reference", None)
         resolved = getattr(reference, "resolved", None) if reference else None
         if resolved and getattr(resolved, "author", None):
             ref_author_id = str(resolved.author.id)
             if ref_author_id != author_id and not resolved.author.bot:
                 ref_timestamp = resolved.created_at.replace(tzinfo=None) if resolved.created_at.tzinfo else resolved.created_at
-                time_diff = (timestamp - ref_timestamp).total_seconds()
-                if 0 <= time_diff <= 300:
-                    pair_key = "_".join(sorted([author_id, ref_author_id]))
-                    stats = guild_data["global_stats"]
-                    stats["conversations"][pair_key] = stats["conversations"].get(pair_key, 0) + 1
-                    return
+                if in_conversation_window(timestamp, ref_timestamp):
+                    return ref_author_id
 
-        # Fallback: cache mémoire
-        cache = self.message_cache.get(channel_id)
-        if not cache:
-            return
-        
-        # Parcourir le cache à l'envers pour trouver le dernier message d'un autre auteur
-        for cached_author_id, cached_timestamp in reversed(cache):
-            # Ignorer ses propres messages
-            if cached_author_id == author_id:
-                continue
-            
-            # Vérifier si c'est dans les 5 dernières minutes
-            time_diff = (timestamp - cached_timestamp).total_seconds()
-            if 0 <= time_diff <= 300:  # 5 minutes
-                # Clé unique pour la paire (ordre alphabétique pour éviter doublons)
-                pair_key = "_".join(sorted([author_id, cached_author_id]))
-                
-                stats = guild_data["global_stats"]
-                stats["conversations"][pair_key] = stats["conversations"].get(pair_key, 0) + 1
-                break  # On ne compte que la première réponse
+        # Fallback: cache mémoire (le message courant y est déjà: ignoré comme message de l'auteur)
+        return self.message_cache.partner(channel_id, author_id, timestamp)
     
-    def _archive_message(self, message, guild_id: str):
-        """Ajoute le message à l'archive buffer."""
+    async def _archive_message(self, message, guild_id: str):
+        """Ajoute le message à la file d'écriture de l'archive."""
         archive_entry = {
             "ts": message.created_at.isoformat(),
             "guild": guild_id,
@@ -476,11 +440,7 @@ class AnalyticsCog(commands.Cog):
             "msg_id": str(message.id)
         }
         
-        self.archive_buffer.append(archive_entry)
-        
-        # Flush si buffer plein
-        if len(self.archive_buffer) >= ARCHIVE_BUFFER_SIZE:
-            asyncio.create_task(self._flush_archive())
+        await self._archive_writer.put(archive_entry)
 
     def _prune_word_counts_if_needed(self):
         """Garde uniquement le top N des mots une fois par jour."""
@@ -489,25 +449,19 @@ class AnalyticsCog(commands.Cog):
         if last_prune == today:
             return
 
-        for guild_id, guild_data in self.data.items():
-            if guild_id.startswith("_"):
-                continue
-            stats = guild_data.get("global_stats", {})
+        for guild_id in [key for key in self.data if not key.startswith("_")]:
+            stats = self._writable_stats(guild_id)
             word_counts = stats.get("word_counts", {})
-            if word_counts:
+            # Avec le sketch, le top mots du serveur est déjà borné (rien à tronquer)
+            if word_counts and not WORD_COUNT_SKETCH_ENABLED:
                 # Trier par occurrences (desc), puis par mot (asc) pour stabilite
                 top_items = sorted(word_counts.items(), key=lambda item: (-item[1], item[0]))
                 top_items = top_items[:ANALYTICS_WORD_COUNT_TOP_N]
                 stats["word_counts"] = {word: count for word, count in top_items}
 
-            word_counts_by_user = stats.get("word_counts_by_user", {})
-            if word_counts_by_user:
-                for user_id, counts in list(word_counts_by_user.items()):
-                    if not counts:
-                        continue
-                    top_items = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
-                    top_items = top_items[:ANALYTICS_WORD_COUNT_TOP_N]
-                    word_counts_by_user[user_id] = {word: count for word, count in top_items}
+            # Top N par utilisateur, puis vocabulaire compacté (mots disparus retirés)
+            self._get_user_counters(guild_id).prune_words(ANALYTICS_WORD_COUNT_TOP_N)
+            self._dirty_guilds.add(guild_id)
 
         self.data["_meta"]["last_word_prune"] = today
     
@@ -521,8 +475,9 @@ class AnalyticsCog(commands.Cog):
             return
         
         guild_id = str(reaction.message.guild.id)
-        guild_data = self._get_guild_data(guild_id)
-        stats = guild_data["global_stats"]["reactions_stats"]
+        writable = self._get_cow(guild_id).writable
+        stats = writable(self._writable_stats(guild_id), "reactions_stats")
+        self._dirty_guilds.add(guild_id)
         
         # Compter la réaction
         stats["total_added"] += 1
@@ -532,12 +487,22 @@ class AnalyticsCog(commands.Cog):
         if hasattr(reaction.emoji, 'name'):
             emoji_str = reaction.emoji.name  # Emoji personnalisé
         
-        stats["by_emoji"][emoji_str] = stats["by_emoji"].get(emoji_str, 0) + 1
+        by_emoji = writable(stats, "by_emoji")
+        by_emoji[emoji_str] = by_emoji.get(emoji_str, 0) + 1
     
     @tasks.loop(minutes=SAVE_INTERVAL_MINUTES)
     async def periodic_save(self):
-        """Sauvegarde périodique des données."""
+        """Sauvegarde périodique des données (balayage du cache des conversations et des séries d'activité)."""
+        self.message_cache.sweep(datetime.now(timezone.utc).replace(tzinfo=None))
+        self._drop_stale_rollups()
         await self._force_save()
+
+    def _drop_stale_rollups(self):
+        """Retire les séries des canaux inactifs depuis plus que le tampon des semaines."""
+        week = week_of(datetime.now(PARIS_TZ).date().toordinal())
+        for guild_id, rollups in self._rollups.items():
+            if rollups.drop_stale(week):
+                self._dirty_guilds.add(guild_id)
     
     @periodic_save.before_loop
     async def before_periodic_save(self):
@@ -549,54 +514,152 @@ class AnalyticsCog(commands.Cog):
         try:
             self._prune_word_counts_if_needed()
             await self._save_data_async()
-            await self._flush_archive()
             self.last_save = datetime.now()
             logger.info(f"[Analytics] Sauvegarde effectuée à {self.last_save}")
+            writer = self._archive_writer.stats()
+            logger.info(
+                f"[Analytics] Archive: file {writer['queue_depth']}/{writer['queue_size']}, "
+                f"{writer['messages']} messages en {writer['batches']} lots, "
+                f"écriture {writer['avg_flush_ms']:.1f} ms en moyenne (max {writer['max_flush_ms']:.1f} ms), "
+                f"{writer['blocked_puts']} attentes de place"
+            )
+            cache = self.message_cache.stats()
+            logger.info(
+                f"[Analytics] Cache conversations: {cache['channels']} canaux, "
+                f"{cache['entries']}/{cache['max_entries']} messages (~{cache['memory_bytes'] / 1024:.0f} Ko), "
+                f"partenaire trouvé {cache['hit_rate']:.0%} sur {cache['lookups']} recherches, "
+                f"{cache['evicted_channels']} canaux évincés, {cache['expired_entries']} messages expirés"
+            )
         except Exception as e:
             logger.error(f"[Analytics] Erreur sauvegarde: {e}")
     
-    def _save_data(self):
-        """Sauvegarde synchrone des données (pour shutdown)."""
+    def _snapshot_dirty_guilds(
+        self,
+    ) -> Tuple[Dict[str, Tuple[Dict, Optional[GuildCounters], Optional[GuildRollups]]], List[Tuple[CopyOnWrite, int]], int]:
+        """Vue figée des serveurs modifiés depuis la dernière sauvegarde (sur l'event loop).
+
+        Rien n'est copié en profondeur: chaque serveur et ses compteurs sont
+        gelés (copy-on-write) jusqu'à ce que les générations retournées soient
+        relâchées (`_release_snapshot`), après l'écriture; les séries d'activité,
+        de taille fixe, sont copiées. Retourne aussi la
+        version du snapshot (deux écritures peuvent se chevaucher).
+        """
+        self._save_version += 1
+        dirty, self._dirty_guilds = self._dirty_guilds, set()
+        snapshot = {}
+        generations = []
+        for guild_id in dirty:
+            if guild_id not in self.data:
+                continue
+            cow = self._get_cow(guild_id)
+            generations.append((cow, cow.freeze()))
+            counters = self._user_counters.get(guild_id)
+            if counters is not None:
+                counters, generation = counters.snapshot()
+                generations.append((self._user_counters[guild_id].cow, generation))
+            rollups = self._rollups.get(guild_id)
+            snapshot[guild_id] = (self.data[guild_id], counters, rollups.snapshot() if rollups is not None else None)
+        return snapshot, generations, self._save_version
+    
+    @staticmethod
+    def _release_snapshot(generations: List[Tuple[CopyOnWrite, int]]):
+        for cow, generation in generations:
+            cow.release(generation)
+    
+    @staticmethod
+    def _export_guild(
+        guild_data: Dict, counters: Optional[GuildCounters], rollups: Optional[GuildRollups] = None
+    ) -> Dict[str, Any]:
+        """Données d'un serveur au format JSON (compteurs par utilisateur et séries d'activité reconvertis)."""
+        exported = dict(guild_data)
+        if counters is not None:
+            exported["global_stats"] = {**guild_data["global_stats"], **counters.to_stats()}
+        if rollups is not None:
+            exported["daily_snapshots"] = rollups.to_data()
+        return exported
+    
+    def _write_snapshot(
+        self,
+        snapshot: Dict[str, Tuple[Dict, Optional[GuildCounters], Optional[GuildRollups]]],
+        meta: Dict[str, Any],
+        version: int,
+    ):
+        """Exporte et écrit les shards d'un snapshot figé (appelable hors de l'event loop)."""
+        shards = {
+            guild_id: self._export_guild(guild_data, counters, rollups)
+            for guild_id, (guild_data, counters, rollups) in snapshot.items()
+        }
+        self._store.write(shards, meta, version)
+    
+    def _export_meta(self) -> Dict[str, Any]:
+        return {
+            "_meta": dict(self.data["_meta"]),
+            "_schema_history": list(self.data.get("_schema_history", [])),
+        }
+    
+    def _save_data(self) -> bool:
+        """Sauvegarde synchrone des serveurs modifiés et des métadonnées (pour shutdown)."""
+        snapshot, generations, version = self._snapshot_dirty_guilds()
         try:
-            with open(ANALYTICS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, ensure_ascii=False, indent=2)
+            self._write_snapshot(snapshot, self._export_meta(), version)
+            return True
         except Exception as e:
+            self._dirty_guilds.update(snapshot)
             logger.error(f"[Analytics] Erreur écriture JSON: {e}")
+            return False
+        finally:
+            self._release_snapshot(generations)
     
     async def _save_data_async(self):
-        """Sauvegarde asynchrone des données dans un executor pour ne pas bloquer."""
-        try:
-            # Utiliser run_in_executor pour ne pas bloquer l'event loop
-            loop = asyncio.get_running_loop()
-            await loop.run_in_executor(None, self._save_data)
-        except Exception as e:
-            logger.error(f"[Analytics] Erreur sauvegarde async: {e}")
-    
-    async def _flush_archive(self):
-        """Flush le buffer d'archive vers le fichier JSONL."""
-        if not self.archive_buffer:
+        """Sauvegarde asynchrone: snapshot figé sur l'event loop, export et écriture dans un executor."""
+        snapshot, generations, version = self._snapshot_dirty_guilds()
+        if not snapshot:
+            self._release_snapshot(generations)
             return
-        
-        # Copier le buffer pour éviter les modifications pendant l'écriture
-        buffer_to_flush = self.archive_buffer.copy()
-        self.archive_buffer.clear()
-        
         try:
-            # Utiliser run_in_executor pour l'I/O fichier
             loop = asyncio.get_running_loop()
-            await loop.run_in_executor(None, self._write_archive_sync, buffer_to_flush)
-            logger.info(f"[Analytics] {len(buffer_to_flush)} messages archivés")
+            await loop.run_in_executor(None, self._write_snapshot, snapshot, self._export_meta(), version)
+            logger.debug(f"[Analytics] {len(snapshot)} serveur(s) sauvegardé(s)")
         except Exception as e:
-            logger.error(f"[Analytics] Erreur flush archive: {e}")
-            # Remettre les messages dans le buffer en cas d'erreur
-            self.archive_buffer.extend(buffer_to_flush)
+            # Serveurs remis en attente pour la prochaine sauvegarde
+            self._dirty_guilds.update(snapshot)
+            logger.error(f"[Analytics] Erreur sauvegarde async: {e}")
+        finally:
+            self._release_snapshot(generations)
     
     def _write_archive_sync(self, buffer: List[Dict]):
-        """Écriture synchrone de l'archive (appelée dans un executor)."""
-        with open(ARCHIVE_FILE, 'a', encoding='utf-8') as f:
-            for entry in buffer:
-                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        """Écriture synchrone d'un lot d'archive (thread de `ArchiveWriter`, un lot à la fois).
 
+        Seul l'ajout du lot lève (et fait retenter le lot par `ArchiveWriter`):
+        import de l'ancienne archive, scellement, rétention et export en
+        colonnes sont journalisés à part, un échec après l'ajout ne doit pas
+        réécrire des messages déjà archivés.
+        """
+        if os.path.exists(ARCHIVE_FILE):
+            # Import unique de l'ancienne archive (ici pour ne pas bloquer le démarrage)
+            try:
+                self._archive.import_legacy(ARCHIVE_FILE)
+            except Exception as e:
+                logger.error(f"[Analytics] Import de l'ancienne archive en échec (nouvel essai au prochain lot): {e}")
+        if buffer:
+            self._archive.append(buffer)
+        # Scelle les journées (UTC, comme les ts) terminées, même sans nouveau message
+        today = datetime.now(timezone.utc).date().isoformat()
+        try:
+            self._archive.seal_due(today)
+        except Exception as e:
+            logger.error(f"[Analytics] Scellement/rétention de l'archive en échec (nouvel essai au prochain lot): {e}")
+        if self._columns is not None:
+            # Hors du nouvel essai du lot: l'archive est déjà écrite, un échec ici ne la duplique pas
+            try:
+                if buffer:
+                    self._columns.append(buffer)
+                self._columns.seal_due(today)
+            except Exception as e:
+                logger.error(
+                    f"[Analytics] Export en colonnes en échec ({len(buffer)} messages, "
+                    f"reconstructible: python -m bot.archive_columns convert): {e}"
+                )
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(AnalyticsCog(bot))
@@ -1,21 +1,40 @@
 import asyncio
-import json
 import logging
 import os
 import random
 import re
-from datetime import datetime, timedelta
-from typing import TypedDict
+from datetime import datetime, time
 
 import pytz
 from discord import Embed
 from discord.ext import commands, tasks
 
 from bot.command_limits import notify_user_in_channel
+from bot.cooldowns import CooldownStore
+from bot.engagement_records import UserRecord
+from bot.engagement_store import FlushBatch, SQLiteEngagementStore, user_row
+from bot.journal import StateJournal
+from bot.name_resolver import NameResolver
+from bot.message_features import MessageFeatures, get_message_dispatcher
+from bot.levels import calculate_level, calculate_levels, get_level_progress, get_levels_progress
+from bot.rank_index import GuildRanking
+from bot.scheduler import DeadlineScheduler, next_weekly_deadline
+from bot.serialization import dump_file, get_codec, load_file
+from bot.snapshots import CopyOnWrite, SnapshotOrder
 from bot.constants import (
     ENGAGEMENT_COOLDOWN_SECONDS,
+    ENGAGEMENT_NAME_CACHE_SIZE,
+    ENGAGEMENT_NAME_CACHE_TTL_SECONDS,
+    ENGAGEMENT_NAME_FETCH_CONCURRENCY,
     ENGAGEMENT_SAVE_INTERVAL_SECONDS,
+    ENGAGEMENT_STORAGE_BACKEND,
+    ENGAGEMENT_WEEKLY_RESET_CONCURRENCY,
     COMMAND_CHANNEL_IDS_GENERAL_ONLY,
+    STATE_FILE_CODEC,
+    STATE_JOURNAL_COMPACT_BYTES,
+    STATE_JOURNAL_COMPACT_INTERVAL_SECONDS,
+    STATE_JOURNAL_ENABLED,
+    STATE_JOURNAL_FLUSH_INTERVAL_SECONDS,
     XP_GM_BONUS as CONST_XP_GM_BONUS,
     XP_PER_MESSAGE_MAX as CONST_XP_PER_MESSAGE_MAX,
     XP_PER_MESSAGE_MIN as CONST_XP_PER_MESSAGE_MIN,
@@ -24,8 +43,13 @@ from bot.constants import (
 # Configuration
 PARIS_TZ = pytz.timezone('Europe/Paris')
 DATA_FILE = "engagement_data.json"
+SQLITE_FILE = "engagement_data.sqlite3"
+JOURNAL_PREFIX = "engagement_data.journal"  # Segments engagement_data.journal.<seq>.jsonl
+STORAGE_BACKEND = ENGAGEMENT_STORAGE_BACKEND  # "json" (snapshot complet) ou "sqlite" (upserts par utilisateur)
 COOLDOWN_SECONDS = ENGAGEMENT_COOLDOWN_SECONDS  # Anti-spam: 15 secondes entre chaque comptabilisation
 SAVE_INTERVAL_SECONDS = ENGAGEMENT_SAVE_INTERVAL_SECONDS  # Sauvegarde toutes les 60s max
+WEEKLY_RESET_WEEKDAY = 6  # Dimanche
+WEEKLY_RESET_TIME = time(20, 0)
 
 # Gains d'XP
 XP_PER_MESSAGE_MIN = CONST_XP_PER_MESSAGE_MIN
@@ -34,6 +58,8 @@ XP_GM_BONUS = CONST_XP_GM_BONUS
 
 logger = logging.getLogger(__name__)
 
+# Éligibilité à l'XP: prédicat historique de l'engagement, distinct du tokenizer des analytics
+# (un message de symboles, "^^", "~", backticks ou une simple mention rapporte de l'XP)
 URL_RE = re.compile(r"https?://\S+")
 CUSTOM_EMOJI_RE = re.compile(r"<a?:([A-Za-z0-9_]+):\d+>")
 SHORTCODE_EMOJI_RE = re.compile(r":([A-Za-z0-9_]+):")
@@ -71,54 +97,55 @@ async def _ensure_allowed_channel(ctx, allowed_channel_ids: set[int]) -> bool:
     return True
 
 
-class EngagementUser(TypedDict):
-    xp: int
-    weekly_xp: int
-    messages: int
-    last_active: str | None
-    display_name: str | None
-    streak_days: int
-    last_streak_date: str | None
-
-
-def calculate_level(xp):
-    """Calcule le niveau basé sur l'XP."""
-    level = 1
-    while xp >= 100 * (level ** 1.5):
-        xp -= 100 * (level ** 1.5)
-        level += 1
-    return level
-
-
-def get_level_progress(xp):
-    """Retourne la progression dans le niveau actuel (0-100%)."""
-    level = 1
-    xp_remaining = xp
-    while xp_remaining >= 100 * (level ** 1.5):
-        xp_remaining -= 100 * (level ** 1.5)
-        level += 1
-    
-    xp_for_next = 100 * (level ** 1.5)
-    progress = (xp_remaining / xp_for_next) * 100
-    return progress, level
-
-
 class EngagementCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.data = {"guilds": {}}  # Structure: {guild_id: {users: {}, weekly_reset: None, channel_id: None}}
-        self.cooldowns = {}  # {(guild_id, user_id): last_message_time}
+        self.data = {"guilds": {}}  # Structure: {guild_id: {users: {user_id (int): UserRecord}, weekly_reset: None, channel_id: None}}
+        self.cooldowns = CooldownStore(COOLDOWN_SECONDS)  # {(guild_id, user_id): dernier message (monotone)}
+        self._rankings: dict[str, GuildRanking] = {}  # {guild_id: classements XP totale/hebdo}
+        self._names = NameResolver(
+            self._fetch_user_name,
+            ttl_seconds=ENGAGEMENT_NAME_CACHE_TTL_SECONDS,
+            max_size=ENGAGEMENT_NAME_CACHE_SIZE,
+            max_concurrency=ENGAGEMENT_NAME_FETCH_CONCURRENCY,
+        )
         self._dirty = False  # Flag: True si données modifiées depuis dernière sauvegarde
+        # Suivi fin des modifications (backend SQLite: seules ces lignes sont écrites)
+        self._store: SQLiteEngagementStore | None = None
+        self._dirty_users: set[tuple[str, int]] = set()
+        self._dirty_guilds: set[str] = set()
+        # Snapshots copy-on-write des enregistrements pour l'écriture JSON hors de la boucle
+        self._cow = CopyOnWrite()
+        # Sauvegardes qui se chevauchent: un snapshot ancien n'écrase pas un plus récent
+        self._save_order = SnapshotOrder()
+        # Journal des modifications (rejoué par-dessus le snapshot au démarrage)
+        self._journal: StateJournal | None = None
+        # Resets hebdo: tas d'échéances par serveur (remplace le polling à la minute)
+        self._scheduler = DeadlineScheduler(
+            self._run_weekly_reset,
+            max_concurrency=ENGAGEMENT_WEEKLY_RESET_CONCURRENCY,
+            after_batch=self._save_after_weekly_reset,
+        )
         self._load_data()
+        self._schedule_all_weekly_resets()
         self.periodic_save.start()  # Sauvegarde périodique
-        self.weekly_ranking.start()
+        self.journal_flush.start()
+        self._weekly_task = asyncio.create_task(self.weekly_ranking())
+        get_message_dispatcher(bot).subscribe(self.on_message_features)
     
     def cog_unload(self):
+        get_message_dispatcher(self.bot).unsubscribe(self.on_message_features)
         self.periodic_save.cancel()
-        self.weekly_ranking.cancel()
+        self._weekly_task.cancel()
+        self.journal_flush.cancel()
         # Sauvegarder à la fermeture
-        if self._dirty:
-            self._save_data_sync()
+        sealed = self._journal.rotate() if self._journal else []
+        saved = self._save_data_sync() if self._dirty else True
+        self._finish_compaction(sealed, saved)
+        if self._journal is not None:
+            self._journal.close()
+        if self._store is not None:
+            self._store.close()
     
     def _get_guild_data(self, guild_id: int):
         """Récupère ou crée les données d'un serveur."""
@@ -127,89 +154,300 @@ class EngagementCog(commands.Cog):
             guild_data = {
                 "users": {},
                 "weekly_reset": None,
-                "channel_id": None
+                "channel_id": None,
+                "week_epoch": 0  # Incrémenté à chaque reset hebdo
             }
             self.data["guilds"][guild_id_str] = guild_data
             # Initialiser le prochain reset
             self._set_next_weekly_reset(guild_id, guild_data)
-            self._dirty = True
+            self._mark_guild_dirty(guild_id)
         return self.data["guilds"][guild_id_str]
+
+    def _get_ranking(self, guild_id: int) -> GuildRanking:
+        """Récupère (ou construit au premier accès) l'index de classement d'un serveur."""
+        guild_id_str = str(guild_id)
+        ranking = self._rankings.get(guild_id_str)
+        if ranking is None:
+            guild_data = self._get_guild_data(guild_id)
+            ranking = GuildRanking(guild_data["users"], guild_data.get("week_epoch", 0))
+            self._rankings[guild_id_str] = ranking
+        return ranking
     
     def _set_next_weekly_reset(self, guild_id: int, guild_data: dict | None = None):
         """Définit le prochain reset hebdomadaire (dimanche 20h) pour un serveur."""
-        now = self._get_paris_now()
-        # Trouver le prochain dimanche
-        days_until_sunday = (6 - now.weekday()) % 7
-        if days_until_sunday == 0 and now.hour >= 20:
-            # Si c'est déjà dimanche après 20h, prendre dimanche prochain
-            days_until_sunday = 7
-        next_reset = now + timedelta(days=days_until_sunday)
-        next_reset = next_reset.replace(hour=20, minute=0, second=0, microsecond=0)
+        # Prochain dimanche 20h heure de Paris (localisé: correct aux changements d'heure)
+        next_reset = next_weekly_deadline(
+            self._get_paris_now(), WEEKLY_RESET_WEEKDAY, WEEKLY_RESET_TIME, PARIS_TZ
+        )
         
         if guild_data is None:
             guild_data = self._get_guild_data(guild_id)
         if guild_data is None:
             return
         guild_data["weekly_reset"] = next_reset
+        self._mark_guild_dirty(guild_id)
+        self._scheduler.schedule(str(guild_id), next_reset)
+
+    def _schedule_all_weekly_resets(self):
+        """Planifie le reset de chaque serveur chargé."""
+        for guild_id_str, guild_data in self.data.get("guilds", {}).items():
+            weekly_reset = guild_data.get("weekly_reset")
+            if weekly_reset:
+                self._scheduler.schedule(guild_id_str, weekly_reset)
+
+    def _mark_guild_dirty(self, guild_id: int | str):
+        """Marque les métadonnées d'un serveur comme modifiées."""
+        if self._store is not None:
+            self._dirty_guilds.add(str(guild_id))
+        if self._journal is not None:
+            guild_data = self.data["guilds"][str(guild_id)]
+            weekly_reset = guild_data.get("weekly_reset")
+            self._journal.append({
+                "op": "guild",
+                "g": str(guild_id),
+                "weekly_reset": weekly_reset.isoformat() if weekly_reset else None,
+                "channel_id": guild_data.get("channel_id"),
+                "week_epoch": guild_data.get("week_epoch", 0),
+            })
+        self._dirty = True
+
+    def _mark_user_dirty(self, guild_id: int | str, user_id: int):
+        """Marque un utilisateur comme modifié."""
+        if self._store is not None:
+            self._dirty_users.add((str(guild_id), user_id))
+        if self._journal is not None:
+            user_data = self.data["guilds"][str(guild_id)]["users"][user_id]
+            record = {"op": "user", "g": str(guild_id), "u": str(user_id)}
+            record.update(user_data.to_dict(PARIS_TZ))
+            self._journal.append(record)
         self._dirty = True
     
     def _load_data(self):
-        """Charge les données depuis le fichier JSON."""
-        if os.path.exists(DATA_FILE):
+        """Charge les données depuis le fichier d'état (ou la base SQLite)."""
+        if STORAGE_BACKEND == "sqlite":
+            try:
+                self._store = SQLiteEngagementStore(SQLITE_FILE)
+                self._store.migrate_from_json(DATA_FILE)
+                self._apply_loaded_data(self._store.load())
+            except Exception as e:
+                logger.error(f"Erreur chargement engagement (SQLite): {e}")
+                self.data = {"guilds": {}}
+        elif os.path.exists(DATA_FILE):
             try:
-                with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                    loaded_data = json.load(f)
-                    # Migration des anciennes données (global -> guilds)
-                    if "users" in loaded_data and "guilds" not in loaded_data:
-                        logger.info("Migration des données d'engagement vers le nouveau format...")
-                        self.data = {"guilds": {}}
-                        # On met les anciennes données dans un guild "legacy" (sera ignoré)
-                    else:
-                        self.data = loaded_data
-                        # Convertir les dates pour chaque guild
-                        for guild_data in self.data.get("guilds", {}).values():
-                            if guild_data.get("weekly_reset"):
-                                guild_data["weekly_reset"] = datetime.fromisoformat(guild_data["weekly_reset"])
+                self._apply_loaded_data(load_file(DATA_FILE))
             except Exception as e:
                 logger.error(f"Erreur chargement engagement: {e}")
                 self.data = {"guilds": {}}
+
+        if STATE_JOURNAL_ENABLED:
+            self._journal = StateJournal(
+                JOURNAL_PREFIX,
+                compact_bytes=STATE_JOURNAL_COMPACT_BYTES,
+                compact_interval_seconds=STATE_JOURNAL_COMPACT_INTERVAL_SECONDS,
+            )
+            self._replay_journal()
+            self._journal.start()
+        self._rankings = {}
+
+    def _apply_loaded_data(self, loaded_data: dict):
+        """Installe des données chargées (JSON ou SQLite) en mémoire."""
+        # Migration des anciennes données (global -> guilds)
+        if "users" in loaded_data and "guilds" not in loaded_data:
+            logger.info("Migration des données d'engagement vers le nouveau format...")
+            self.data = {"guilds": {}}
+            # On met les anciennes données dans un guild "legacy" (sera ignoré)
+        else:
+            self.data = loaded_data
+            # Convertir les dates et les utilisateurs (enregistrements compacts) pour chaque guild
+            for guild_data in self.data.get("guilds", {}).values():
+                if guild_data.get("weekly_reset"):
+                    guild_data["weekly_reset"] = datetime.fromisoformat(guild_data["weekly_reset"])
+                guild_data["users"] = {
+                    int(user_id): UserRecord.from_dict(user_data)
+                    for user_id, user_data in guild_data.get("users", {}).items()
+                }
     
-    def _save_data_sync(self):
+    def _replay_journal(self):
+        """Rejoue le journal par-dessus les données chargées."""
+        count = 0
+        try:
+            for record in self._journal.replay():
+                self._apply_journal_record(record)
+                count += 1
+        except Exception as e:
+            logger.error(f"[Engagement] Erreur relecture journal: {e}")
+        if count:
+            logger.info(f"[Engagement] {count} modification(s) rejouée(s) depuis le journal")
+
+    def _apply_journal_record(self, record: dict):
+        """Applique un enregistrement du journal (valeurs absolues, idempotent)."""
+        op = record.get("op")
+        guild_id = record["g"]
+        guild_data = self.data["guilds"].setdefault(
+            guild_id, {"users": {}, "weekly_reset": None, "channel_id": None}
+        )
+        if op == "guild":
+            weekly_reset = record.get("weekly_reset")
+            guild_data["weekly_reset"] = datetime.fromisoformat(weekly_reset) if weekly_reset else None
+            guild_data["channel_id"] = record.get("channel_id")
+            guild_data["week_epoch"] = record.get("week_epoch", guild_data.get("week_epoch", 0))
+            self._mark_guild_dirty(guild_id)
+        elif op == "user":
+            user_id = int(record["u"])
+            guild_data["users"][user_id] = UserRecord.from_dict(record)
+            self._mark_user_dirty(guild_id, user_id)
+        elif op == "weekly_reset":
+            # Ancien format (avant les week_epoch): reset explicite
+            for user_id, user_data in guild_data["users"].items():
+                user_data.weekly_xp = 0
+                self._mark_user_dirty(guild_id, user_id)
+
+    def _finish_compaction(self, sealed: list[str], saved: bool):
+        """Supprime les segments du journal couverts par le snapshot (ou les garde si échec)."""
+        if self._journal is None or not sealed:
+            return
+        if saved:
+            self._journal.discard(sealed)
+        else:
+            self._journal.restore(sealed)
+
+    def _save_data_sync(self) -> bool:
         """Sauvegarde synchrone des données (utilisée au shutdown)."""
+        if self._store is not None:
+            batch = self._collect_flush_batch()
+            try:
+                self._store.submit(batch).result()
+                logger.info("[Engagement] Données sauvegardées")
+                return True
+            except Exception as e:
+                self._restore_flush_batch(batch)
+                logger.error(f"[Engagement] Erreur sauvegarde SQLite: {e}")
+                return False
+
+        snapshot, generation = self._snapshot_guilds()
+        try:
+            return self._write_snapshot(snapshot, generation)
+        finally:
+            self._cow.release(generation)
+
+    def _snapshot_guilds(self) -> tuple[dict, int]:
+        """Vue figée des serveurs pour l'écriture JSON (copies superficielles, sur l'event loop).
+
+        Les enregistrements ne sont pas copiés: jusqu'à `release`, l'event loop
+        copie un enregistrement avant de le modifier (`_cow.writable`). La
+        génération, croissante, sert aussi de version d'écriture (`_save_order`).
+        """
+        generation = self._cow.freeze()
+        snapshot = {
+            guild_id: {**guild_data, "users": guild_data["users"].copy()}
+            for guild_id, guild_data in self.data["guilds"].items()
+        }
+        self._dirty = False
+        return snapshot, generation
+
+    def _write_snapshot(self, snapshot: dict, version: int) -> bool:
+        """Convertit et écrit un snapshot (appelable hors de l'event loop)."""
         try:
             data_to_save = {"guilds": {}}
-            for guild_id, guild_data in self.data["guilds"].items():
+            for guild_id, guild_data in snapshot.items():
                 data_to_save["guilds"][guild_id] = {
-                    "users": guild_data["users"],
+                    # Conversion vers le format JSON (dates ISO) uniquement ici
+                    "users": {
+                        str(user_id): user_data.to_dict(PARIS_TZ)
+                        for user_id, user_data in guild_data["users"].items()
+                    },
                     "weekly_reset": guild_data["weekly_reset"].isoformat() if guild_data.get("weekly_reset") else None,
-                    "channel_id": guild_data.get("channel_id")
+                    "channel_id": guild_data.get("channel_id"),
+                    "week_epoch": guild_data.get("week_epoch", 0)
                 }
             
-            with open(DATA_FILE, 'w', encoding='utf-8') as f:
-                json.dump(data_to_save, f, ensure_ascii=False, indent=2)
-            
-            self._dirty = False
-            logger.info("[Engagement] Données sauvegardées")
+            if self._save_order.write(version, lambda: dump_file(DATA_FILE, data_to_save, get_codec(STATE_FILE_CODEC))):
+                logger.info("[Engagement] Données sauvegardées")
+            else:
+                logger.debug("[Engagement] Snapshot dépassé par une sauvegarde plus récente, non écrit")
+            return True
         except Exception as e:
+            self._dirty = True
             logger.error(f"[Engagement] Erreur sauvegarde: {e}")
+            return False
     
     async def _save_data_async(self):
-        """Sauvegarde asynchrone via executor."""
-        try:
-            loop = asyncio.get_running_loop()
-            await loop.run_in_executor(None, self._save_data_sync)
-        except Exception as e:
-            logger.error(f"[Engagement] Erreur sauvegarde async: {e}")
+        """Sauvegarde asynchrone via executor (compacte aussi le journal)."""
+        # Tout ce qui est journalisé après la rotation sera rejoué par-dessus ce snapshot
+        sealed = self._journal.rotate() if self._journal else []
+        saved = False
+        if self._store is not None:
+            # Lot construit sur la boucle (proportionnel à l'activité), écrit sur le thread SQLite
+            batch = self._collect_flush_batch()
+            try:
+                await asyncio.wrap_future(self._store.submit(batch))
+                saved = True
+                logger.info(f"[Engagement] {len(batch.users)} utilisateur(s) sauvegardé(s)")
+            except Exception as e:
+                self._restore_flush_batch(batch)
+                logger.error(f"[Engagement] Erreur sauvegarde SQLite: {e}")
+        else:
+            # Snapshot figé sur la boucle, conversion et écriture dans l'executor
+            snapshot, generation = self._snapshot_guilds()
+            try:
+                loop = asyncio.get_running_loop()
+                saved = await loop.run_in_executor(None, self._write_snapshot, snapshot, generation)
+            except Exception as e:
+                self._dirty = True
+                logger.error(f"[Engagement] Erreur sauvegarde async: {e}")
+            finally:
+                self._cow.release(generation)
+        self._finish_compaction(sealed, saved)
+    
+    def _collect_flush_batch(self) -> FlushBatch:
+        """Construit le lot des lignes modifiées depuis le dernier flush."""
+        batch = FlushBatch()
+        for guild_id in self._dirty_guilds:
+            guild_data = self.data["guilds"].get(guild_id)
+            if guild_data is None:
+                continue
+            weekly_reset = guild_data.get("weekly_reset")
+            batch.guilds.append((
+                guild_id,
+                weekly_reset.isoformat() if weekly_reset else None,
+                guild_data.get("channel_id"),
+                guild_data.get("week_epoch", 0),
+            ))
+        for guild_id, user_id in self._dirty_users:
+            user_data = self.data["guilds"].get(guild_id, {}).get("users", {}).get(user_id)
+            if user_data is not None:
+                batch.users.append(user_row(guild_id, str(user_id), user_data.to_dict(PARIS_TZ)))
+
+        self._dirty_guilds = set()
+        self._dirty_users = set()
+        self._dirty = False
+        return batch
+
+    def _restore_flush_batch(self, batch: FlushBatch):
+        """Remet un lot en attente après un échec d'écriture."""
+        self._dirty_guilds.update(row[0] for row in batch.guilds)
+        self._dirty_users.update((row[0], int(row[1])) for row in batch.users)
+        self._dirty = True
     
     @tasks.loop(seconds=SAVE_INTERVAL_SECONDS)
     async def periodic_save(self):
         """Sauvegarde périodique si données modifiées."""
-        if self._dirty:
-            await self._save_data_async()
+        if not self._dirty:
+            return
+        # En JSON, le journal couvre les modifications: snapshot complet seulement à la compaction
+        if self._journal is not None and self._store is None and not self._journal.should_compact():
+            return
+        await self._save_data_async()
     
     @periodic_save.before_loop
     async def before_periodic_save(self):
         await self.bot.wait_until_ready()
+
+    @tasks.loop(seconds=STATE_JOURNAL_FLUSH_INTERVAL_SECONDS)
+    async def journal_flush(self):
+        """Pousse le buffer du journal vers le disque."""
+        if self._journal is not None:
+            self._journal.flush()
     
     def _get_paris_now(self):
         """Retourne la datetime actuelle à Paris."""
@@ -232,52 +470,51 @@ class EngagementCog(commands.Cog):
     
     def _check_cooldown(self, guild_id: int, user_id: int) -> bool:
         """Vérifie si l'utilisateur peut gagner de l'XP (cooldown 15s)."""
-        now = self._get_paris_now()
-        cooldown_key = (guild_id, user_id)
-        if cooldown_key in self.cooldowns:
-            last_time = self.cooldowns[cooldown_key]
-            if (now - last_time).total_seconds() < COOLDOWN_SECONDS:
-                return False
-        self.cooldowns[cooldown_key] = now
-        return True
+        return self.cooldowns.try_acquire((guild_id, user_id))
     
-    def _add_xp(self, guild_id: int, user_id: int, xp_amount: int, user_name: str | None = None, is_weekly: bool = True) -> tuple[EngagementUser, int, int]:
+    def _add_xp(self, guild_id: int, user_id: int, xp_amount: int, user_name: str | None = None, is_weekly: bool = True, now: datetime | None = None) -> tuple[UserRecord, int, int]:
         """Ajoute de l'XP à un utilisateur dans un serveur spécifique."""
         guild_data = self._get_guild_data(guild_id)
-        user_id_str = str(user_id)
-        
-        if user_id_str not in guild_data["users"]:
-            guild_data["users"][user_id_str] = {
-                "xp": 0,
-                "weekly_xp": 0,
-                "messages": 0,
-                "last_active": None,
-                "display_name": user_name,
-                "streak_days": 0,
-                "last_streak_date": None
-            }
+        if now is None:
+            now = self._get_paris_now()
         
-        user_data: EngagementUser = guild_data["users"][user_id_str]
+        week_epoch = guild_data.get("week_epoch", 0)
+        
+        if user_id in guild_data["users"]:
+            # Copié d'abord s'il appartient à un snapshot en cours d'écriture
+            user_data = self._cow.writable(guild_data["users"], user_id)
+        else:
+            user_data = UserRecord(weekly_epoch=week_epoch, display_name=user_name)
+            guild_data["users"][user_id] = user_data
         
         # Calculer le niveau avant l'ajout d'XP
-        old_level = calculate_level(user_data["xp"])
+        old_level = calculate_level(user_data.xp)
         
-        user_data["xp"] += xp_amount
+        user_data.xp += xp_amount
         if is_weekly:
-            user_data["weekly_xp"] += xp_amount
-        user_data["messages"] += 1
-        user_data["last_active"] = self._get_paris_now().isoformat()
+            # XP hebdo d'une semaine précédente: remise à 0 paresseuse à la première écriture
+            if user_data.weekly_epoch != week_epoch:
+                user_data.weekly_xp = 0
+                user_data.weekly_epoch = week_epoch
+            user_data.weekly_xp += xp_amount
+        user_data.messages += 1
+        user_data.last_active = int(now.timestamp())
         if user_name:
-            user_data["display_name"] = user_name
+            user_data.display_name = user_name
         
         # Mettre à jour le streak
-        self._update_streak(user_data)
+        self._update_streak(user_data, now)
+
+        # Mettre à jour les classements
+        self._get_ranking(guild_id).update(
+            user_id, user_data.xp, self._get_weekly_xp(guild_data, user_data)
+        )
         
         # Vérifier si niveau up
-        new_level = calculate_level(user_data["xp"])
+        new_level = calculate_level(user_data.xp)
         
         # Marquer comme modifié (sera sauvegardé périodiquement)
-        self._dirty = True
+        self._mark_user_dirty(guild_id, user_id)
         
         return user_data, old_level, new_level
 
@@ -288,31 +525,16 @@ class EngagementCog(commands.Cog):
             return {}
 
         try:
-            guild_data = analytics._get_guild_data(str(guild_id))
+            return analytics.get_user_snapshot(str(guild_id), user_id)
         except Exception:
             return {}
 
-        stats = guild_data.get("global_stats", {})
-        user_id_str = str(user_id)
-
-        emoji_usage = stats.get("emoji_text_usage", {}).get("users", {}).get(user_id_str, {})
-        word_counts = stats.get("word_counts_by_user", {}).get(user_id_str, {})
-        segments = stats.get("messages_by_segment_by_user", {}).get(user_id_str, {})
-
-        return {
-            "emoji_usage": emoji_usage,
-            "word_counts": word_counts,
-            "segments": segments,
-        }
-
-    def _build_profile_embed(self, user, user_data: EngagementUser, analytics_data: dict, position: int) -> Embed:
+    def _build_profile_embed(self, user, user_data: UserRecord, weekly_xp: int, analytics_data: dict, position: int) -> Embed:
         """Genere un embed profil sobre et riche."""
-        total_xp = user_data.get("xp", 0)
-        weekly_xp = user_data.get("weekly_xp", 0)
-        messages = user_data.get("messages", 0)
-        level = calculate_level(total_xp)
-        progress, _ = get_level_progress(total_xp)
-        streak_days = user_data.get("streak_days", 0)
+        total_xp = user_data.xp
+        messages = user_data.messages
+        progress, level = get_level_progress(total_xp)
+        streak_days = user_data.streak_days
 
         # Analytics
         emoji_usage = analytics_data.get("emoji_usage", {})
@@ -398,54 +620,58 @@ class EngagementCog(commands.Cog):
         embed.set_footer(text="Statistiques mises à jour en temps réel")
         return embed
     
-    def _update_streak(self, user_data: EngagementUser):
+    def _update_streak(self, user_data: UserRecord, now: datetime | None = None):
         """Met à jour le streak journalier de l'utilisateur."""
-        now = self._get_paris_now()
-        today = now.date()
+        if now is None:
+            now = self._get_paris_now()
+        today = now.date().toordinal()  # Numéro de jour (heure de Paris)
         
-        last_streak_str = user_data.get("last_streak_date")
-        if last_streak_str:
-            last_streak = datetime.fromisoformat(last_streak_str).date()
-            
+        last_streak = user_data.last_streak_day
+        if last_streak is not None:
             # Si c'était hier, on incrémente
-            if last_streak == today - timedelta(days=1):
-                user_data["streak_days"] = user_data.get("streak_days", 0) + 1
-                user_data["last_streak_date"] = now.isoformat()
+            if last_streak == today - 1:
+                user_data.streak_days += 1
+                user_data.last_streak_day = today
                 self._dirty = True
             # Si c'était aujourd'hui, on ne fait rien (déjà compté)
             elif last_streak == today:
                 pass
             # Sinon (plus de 1 jour d'écart), on reset
             else:
-                user_data["streak_days"] = 1
-                user_data["last_streak_date"] = now.isoformat()
+                user_data.streak_days = 1
+                user_data.last_streak_day = today
                 self._dirty = True
         else:
             # Premier jour
-            user_data["streak_days"] = 1
-            user_data["last_streak_date"] = now.isoformat()
+            user_data.streak_days = 1
+            user_data.last_streak_day = today
             self._dirty = True
     
+    def _get_weekly_xp(self, guild_data: dict, user_data: UserRecord) -> int:
+        """XP hebdo effective: 0 si la valeur stockée date d'une semaine précédente."""
+        if user_data.weekly_epoch != guild_data.get("week_epoch", 0):
+            return 0
+        return user_data.weekly_xp
+
     def _reset_weekly(self, guild_id: int):
-        """Reset les stats hebdomadaires pour un serveur."""
+        """Reset les stats hebdomadaires pour un serveur (O(1): changement de semaine)."""
         guild_data = self._get_guild_data(guild_id)
-        for user_data in guild_data["users"].values():
-            user_data["weekly_xp"] = 0
+        guild_data["week_epoch"] = guild_data.get("week_epoch", 0) + 1
+        self._get_ranking(guild_id).reset_weekly()
         
+        # Journalise aussi le nouveau week_epoch
         self._set_next_weekly_reset(guild_id, guild_data)
         self._dirty = True
     
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        # Ignorer bot et DM
-        if message.author.bot or not message.guild:
-            return
-
-        if not self._extract_countable_words(message.content):
+    async def on_message_features(self, features: MessageFeatures):
+        # Bot et DM déjà filtrés par le dispatcher; il faut au moins un mot (prédicat de l'engagement,
+        # pas `features.tokens`: le tokenizer des analytics écarte mentions, symboles et kana)
+        if not self._extract_countable_words(features.content):
             return
         
-        guild_id = message.guild.id
-        user_id = message.author.id
+        message = features.message
+        guild_id = features.guild_id
+        user_id = features.author_id
         
         # Vérifier cooldown anti-spam
         if not self._check_cooldown(guild_id, user_id):
@@ -453,29 +679,35 @@ class EngagementCog(commands.Cog):
         
         # Ajouter XP (5-15 aléatoire)
         xp_gain = XP_PER_MESSAGE_MIN
-        user_data, old_level, new_level = self._add_xp(guild_id, user_id, xp_gain, message.author.display_name)
+        user_data, old_level, new_level = self._add_xp(
+            guild_id, user_id, xp_gain, message.author.display_name, now=features.now
+        )
         
         # Si level up, envoyer un message de félicitations
         if new_level > old_level:
             await self._send_level_up_message(message.channel, message.author, new_level)
     
-    @tasks.loop(minutes=1)
     async def weekly_ranking(self):
         """Poste le classement hebdomadaire pour chaque serveur le dimanche à 20h."""
-        now = self._get_paris_now()
-        
-        for guild_id_str, guild_data in self.data.get("guilds", {}).items():
-            weekly_reset = guild_data.get("weekly_reset")
-            if weekly_reset and now >= weekly_reset:
-                await self._post_ranking(int(guild_id_str))
-                self._reset_weekly(int(guild_id_str))
-                # Forcer sauvegarde après reset
-                if self._dirty:
-                    await self._save_data_async()
-    
-    @weekly_ranking.before_loop
-    async def before_weekly_ranking(self):
         await self.bot.wait_until_ready()
+        # Dort jusqu'à la prochaine échéance; les serveurs dus en même temps passent en parallèle
+        await self._scheduler.run()
+
+    async def _run_weekly_reset(self, guild_id_str: str):
+        """Classement + reset pour un serveur arrivé à échéance."""
+        guild_id = int(guild_id_str)
+        try:
+            await self._post_ranking(guild_id)
+        except Exception as e:
+            logger.error(f"[Engagement] Erreur publication classement {guild_id}: {e}")
+        finally:
+            # Toujours resetter (et replanifier), même si la publication échoue
+            self._reset_weekly(guild_id)
+
+    async def _save_after_weekly_reset(self):
+        """Forcer sauvegarde après un lot de resets."""
+        if self._dirty:
+            await self._save_data_async()
     
     async def _send_level_up_message(self, channel, user, new_level: int):
         """Envoie un message de félicitations pour un level up."""
@@ -506,33 +738,63 @@ class EngagementCog(commands.Cog):
         except:
             pass  # Silencieux si erreur
     
-    async def _get_display_name(self, guild, user_id: int, user_data: dict) -> str:
+    async def _get_display_name(self, guild, user_id: int, user_data: UserRecord) -> str:
         """Récupère le nom d'affichage d'un utilisateur avec fallback."""
+        names = await self._get_display_names(guild, [(user_id, user_data)])
+        return names[0]
+
+    def _writable_user(self, guild_id: int, user_id: int, user_data: UserRecord) -> UserRecord:
+        """Enregistrement à modifier: copié d'abord s'il appartient à un snapshot en cours d'écriture."""
+        users = self._get_guild_data(guild_id)["users"]
+        if user_id not in users:
+            return user_data
+        return self._cow.writable(users, user_id)
+
+    def _get_local_display_name(self, guild, user_id: int, user_data: UserRecord) -> str | None:
+        """Nom disponible sans appel réseau (membre en cache, nom stocké, cache de noms)."""
         # Essayer de récupérer depuis le cache Discord
         if guild:
             member = guild.get_member(user_id)
             if member:
                 # Mettre à jour le nom stocké
-                user_data["display_name"] = member.display_name
-                self._dirty = True
+                if user_data.display_name != member.display_name:
+                    self._writable_user(guild.id, user_id, user_data).display_name = member.display_name
+                    self._mark_user_dirty(guild.id, user_id)
                 return member.display_name
         
         # Fallback sur le nom stocké
-        stored_name = user_data.get("display_name")
+        stored_name = user_data.display_name
         if stored_name:
             return stored_name
-        
-        # Dernier recours: essayer de fetch l'utilisateur
-        try:
-            user = await self.bot.fetch_user(user_id)
-            if user:
-                user_data["display_name"] = user.display_name
-                self._dirty = True
-                return user.display_name
-        except:
-            pass
-        
-        return f"Utilisateur {user_id}"
+
+        return self._names.get_cached(user_id)
+
+    async def _get_display_names(self, guild, entries: list[tuple[int, UserRecord]]) -> list[str]:
+        """Résout les noms d'une liste de (user_id, user_data), les fetch manquants en parallèle."""
+        names = [self._get_local_display_name(guild, user_id, user_data) for user_id, user_data in entries]
+        missing = [i for i, name in enumerate(names) if not name]
+        if missing:
+            # Dernier recours: fetch des utilisateurs (concurrent, borné, mis en cache)
+            fetched = await self._names.resolve_many(entries[i][0] for i in missing)
+            for i in missing:
+                user_id, user_data = entries[i]
+                name = fetched.get(user_id)
+                if not name:
+                    continue
+                names[i] = name
+                if guild:
+                    self._writable_user(guild.id, user_id, user_data).display_name = name
+                    self._mark_user_dirty(guild.id, user_id)
+                else:
+                    user_data.display_name = name
+                    self._dirty = True
+
+        return [name or f"Utilisateur {user_id}" for name, (user_id, _) in zip(names, entries)]
+
+    async def _fetch_user_name(self, user_id: int) -> str | None:
+        """Appel REST pour un utilisateur absent de tous les caches."""
+        user = await self.bot.fetch_user(user_id)
+        return user.display_name if user else None
     
     def _calculate_server_stats(self, guild_data: dict) -> dict:
         """Calcule les statistiques globales du serveur."""
@@ -546,8 +808,8 @@ class EngagementCog(commands.Cog):
                 "total_messages": 0
             }
         
-        total_xp = sum(u.get("xp", 0) for u in users.values())
-        total_messages = sum(u.get("messages", 0) for u in users.values())
+        total_xp = sum(u.xp for u in users.values())
+        total_messages = sum(u.messages for u in users.values())
         active_members = len(users)
         average_xp = total_xp // active_members if active_members > 0 else 0
         
@@ -560,24 +822,15 @@ class EngagementCog(commands.Cog):
     
     async def _get_rising_star(self, guild, guild_data: dict) -> tuple[str, int] | None:
         """Trouve le membre avec le plus d'XP hebdomadaire (Rising Star)."""
-        users = guild_data.get("users", {})
-        
-        if not users:
-            return None
-        
-        # Trier par weekly_xp
-        sorted_by_weekly = sorted(
-            users.items(),
-            key=lambda x: x[1].get("weekly_xp", 0),
-            reverse=True
-        )
-        
-        if not sorted_by_weekly or sorted_by_weekly[0][1].get("weekly_xp", 0) == 0:
+        # L'index hebdo ne contient que les membres avec de l'XP cette semaine
+        top = self._get_ranking(guild.id).weekly.first()
+        if not top:
             return None
         
-        top_user_id, top_user_data = sorted_by_weekly[0]
-        display_name = await self._get_display_name(guild, int(top_user_id), top_user_data)
-        weekly_xp = top_user_data.get("weekly_xp", 0)
+        top_user_id = top[0]
+        top_user_data = guild_data["users"][top_user_id]
+        display_name = await self._get_display_name(guild, top_user_id, top_user_data)
+        weekly_xp = self._get_weekly_xp(guild_data, top_user_data)
         
         return (display_name, weekly_xp)
     
@@ -618,7 +871,7 @@ class EngagementCog(commands.Cog):
                 if "général" in channel.name.lower() or "general" in channel.name.lower():
                     channel_id = channel.id
                     guild_data["channel_id"] = channel_id
-                    self._dirty = True
+                    self._mark_guild_dirty(guild_id)
                     break
             if not channel_id:
                 return
@@ -627,12 +880,11 @@ class EngagementCog(commands.Cog):
         if not channel:
             return
         
-        # Trier par XP hebdomadaire
-        sorted_users = sorted(
-            guild_data["users"].items(),
-            key=lambda x: x[1].get("weekly_xp", 0),
-            reverse=True
-        )[:10]  # Top 10
+        # Top 10 par XP hebdomadaire
+        sorted_users = [
+            (user_id, guild_data["users"][user_id])
+            for user_id in self._get_ranking(guild_id).top_weekly(10)
+        ]
         
         if not sorted_users:
             return
@@ -647,13 +899,14 @@ class EngagementCog(commands.Cog):
         
         medals = ["🥇", "🥈", "🥉", "4️⃣", "5️⃣", "6️⃣", "7️⃣", "8️⃣", "9️⃣", "🔟"]
         guild = self.bot.get_guild(guild_id)
+        levels = calculate_levels(data.xp for _, data in sorted_users)
+        display_names = await self._get_display_names(guild, sorted_users)
         
         for i, (user_id, data) in enumerate(sorted_users):
-            display_name = await self._get_display_name(guild, int(user_id), data)
+            display_name = display_names[i]
             
-            weekly_xp = data.get("weekly_xp", 0)
-            total_xp = data.get("xp", 0)
-            level = calculate_level(total_xp)
+            weekly_xp = self._get_weekly_xp(guild_data, data)
+            level = levels[i]
             
             medal = medals[i] if i < 10 else f"{i+1}."
             embed.add_field(
@@ -663,9 +916,7 @@ class EngagementCog(commands.Cog):
             )
         
         # Mention du gagnant
-        winner_id = sorted_users[0][0]
-        winner_data = sorted_users[0][1]
-        winner_name = await self._get_display_name(guild, int(winner_id), winner_data)
+        winner_name = display_names[0]
         embed.set_footer(text=f"🎉 Bravo à {winner_name} pour cette semaine !")
         
         await channel.send(embed=embed)
@@ -679,24 +930,20 @@ class EngagementCog(commands.Cog):
         
         guild_id = ctx.guild.id
         guild_data = self._get_guild_data(guild_id)
-        user_id = str(ctx.author.id)
+        user_id = ctx.author.id
         
         if user_id not in guild_data["users"]:
             await ctx.send("Tu n'as pas encore d'activité enregistrée. Commence à discuter pour gagner de l'XP ! 📈")
             return
         
         user_data = guild_data["users"][user_id]
-        analytics_data = self._get_analytics_snapshot(guild_id, int(user_id))
+        analytics_data = self._get_analytics_snapshot(guild_id, user_id)
         
         # Calculer position
-        all_users = sorted(
-            guild_data["users"].items(),
-            key=lambda x: x[1].get("xp", 0),
-            reverse=True
-        )
-        position = next((i for i, (uid, _) in enumerate(all_users) if uid == user_id), 0) + 1
+        position = self._get_ranking(guild_id).total.rank(user_id) or 1
         
-        embed = self._build_profile_embed(ctx.author, user_data, analytics_data, position)
+        weekly_xp = self._get_weekly_xp(guild_data, user_data)
+        embed = self._build_profile_embed(ctx.author, user_data, weekly_xp, analytics_data, position)
         await ctx.send(embed=embed)
     
     @commands.command(name="classement", aliases=["ranking", "top", "leaderboard", "top10"])
@@ -708,12 +955,12 @@ class EngagementCog(commands.Cog):
         guild_id = ctx.guild.id
         guild_data = self._get_guild_data(guild_id)
         
-        # Trier par XP total
-        sorted_users = sorted(
-            guild_data["users"].items(),
-            key=lambda x: x[1].get("xp", 0),
-            reverse=True
-        )
+        # Top 10 par XP total
+        ranking = self._get_ranking(guild_id)
+        sorted_users = [
+            (user_id, guild_data["users"][user_id])
+            for user_id, _ in ranking.total.top(10)
+        ]
         
         if not sorted_users:
             await ctx.send("Aucun membre n'a encore d'activité enregistrée !")
@@ -739,7 +986,7 @@ class EngagementCog(commands.Cog):
         
         # Thumbnail : Avatar du #1
         try:
-            top_user_id = int(sorted_users[0][0])
+            top_user_id = sorted_users[0][0]
             top_member = ctx.guild.get_member(top_user_id)
             if top_member:
                 embed.set_thumbnail(url=top_member.display_avatar.url)
@@ -760,13 +1007,14 @@ class EngagementCog(commands.Cog):
         # Top 10 avec barres de progression
         medals = ["🥇", "🥈", "🥉", "4️⃣", "5️⃣", "6️⃣", "7️⃣", "8️⃣", "9️⃣", "🔟"]
         
-        top_users = sorted_users[:10]
+        top_users = sorted_users
+        top_progress = get_levels_progress(data.xp for _, data in top_users)
+        display_names = await self._get_display_names(ctx.guild, top_users)
         for i, (user_id, data) in enumerate(top_users):
-            display_name = await self._get_display_name(ctx.guild, int(user_id), data)
+            display_name = display_names[i]
             
-            total_xp = data.get("xp", 0)
-            level = calculate_level(total_xp)
-            progress, _ = get_level_progress(total_xp)
+            total_xp = data.xp
+            progress, level = top_progress[i]
             
             # Barre de progression
             filled = int(progress / 10)
@@ -792,16 +1040,15 @@ class EngagementCog(commands.Cog):
             )
         
         # Position de l'auteur (détaillée)
-        author_id = str(ctx.author.id)
-        author_position = next((i for i, (uid, _) in enumerate(sorted_users) if uid == author_id), None)
-        
-        if author_position is not None:
-            total_users = len(sorted_users)
-            author_rank = author_position + 1
-            author_data = sorted_users[author_position][1]
-            author_xp = author_data.get("xp", 0)
-            author_level = calculate_level(author_xp)
-            author_progress, _ = get_level_progress(author_xp)
+        author_id = ctx.author.id
+        author_rank = ranking.total.rank(author_id)
+        
+        if author_rank is not None:
+            total_users = len(ranking.total)
+            author_position = author_rank - 1
+            author_data = guild_data["users"][author_id]
+            author_xp = author_data.xp
+            author_progress, author_level = get_level_progress(author_xp)
             
             # Barre de progression de l'auteur
             author_filled = int(author_progress / 10)
@@ -809,8 +1056,9 @@ class EngagementCog(commands.Cog):
             
             # Écart avec le joueur au-dessus
             xp_gap_text = ""
-            if author_position > 0:
-                xp_above = sorted_users[author_position - 1][1].get("xp", 0)
+            above = ranking.total.above(author_id)
+            if above:
+                xp_above = above[1]
                 gap = max(0, xp_above - author_xp)
                 xp_gap_text = f"\nÉcart avec #{author_position}: `{gap:,}` XP"
             
@@ -1,5 +1,4 @@
 import asyncio
-import json
 import logging
 import os
 import random
@@ -9,7 +8,19 @@ from typing import Dict, Tuple
 import pytz
 from discord.ext import commands, tasks
 
-from bot.constants import GM_RESET_TIME, GM_SAVE_INTERVAL_SECONDS
+from bot.constants import (
+    GM_RESET_TIME,
+    GM_SAVE_INTERVAL_SECONDS,
+    STATE_FILE_CODEC,
+    STATE_JOURNAL_COMPACT_BYTES,
+    STATE_JOURNAL_COMPACT_INTERVAL_SECONDS,
+    STATE_JOURNAL_ENABLED,
+    STATE_JOURNAL_FLUSH_INTERVAL_SECONDS,
+)
+from bot.journal import StateJournal
+from bot.message_features import MessageFeatures, get_message_dispatcher
+from bot.serialization import dump_file, get_codec, load_file
+from bot.snapshots import SnapshotOrder
 
 # Fuseau horaire France
 PARIS_TZ = pytz.timezone('Europe/Paris')
@@ -19,6 +30,7 @@ RESET_TIME = GM_RESET_TIME
 
 # Fichier de sauvegarde
 DATA_FILE = "gm_data.json"
+JOURNAL_PREFIX = "gm_data.journal"  # Segments gm_data.journal.<seq>.jsonl
 SAVE_INTERVAL_SECONDS = GM_SAVE_INTERVAL_SECONDS  # Sauvegarde toutes les 60s max
 
 # Réponses personnalisées avec placeholder {pseudo}
@@ -42,73 +54,168 @@ class GMCog(commands.Cog):
         # Structure: {guild_id: {user_id: (date, has_gm_been_said)}}
         self.gm_tracker: Dict[int, Dict[int, Tuple[date, bool]]] = {}
         self._dirty = False  # Flag: True si données modifiées depuis dernière sauvegarde
+        # Sauvegardes qui se chevauchent: un snapshot ancien n'écrase pas un plus récent
+        self._save_order = SnapshotOrder()
+        # Journal des modifications (rejoué par-dessus le snapshot au démarrage)
+        self._journal: StateJournal | None = None
         self._load_data()
         self.periodic_save.start()  # Démarrer la sauvegarde périodique
+        self.journal_flush.start()
+        get_message_dispatcher(bot).subscribe(self.on_message_features)
     
     def cog_unload(self):
+        get_message_dispatcher(self.bot).unsubscribe(self.on_message_features)
         self.periodic_save.cancel()
+        self.journal_flush.cancel()
         # Sauvegarder à la fermeture
-        if self._dirty:
-            self._save_data_sync()
+        sealed = self._journal.rotate() if self._journal else []
+        saved = self._save_data_sync() if self._dirty else True
+        self._finish_compaction(sealed, saved)
+        if self._journal is not None:
+            self._journal.close()
     
     def _load_data(self):
-        """Charge les données GM depuis le fichier JSON."""
+        """Charge les données GM depuis le fichier d'état."""
         if os.path.exists(DATA_FILE):
             try:
-                with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Convertir les dates string en objets date
-                    for guild_id_str, users in data.items():
-                        guild_id = int(guild_id_str)
-                        self.gm_tracker[guild_id] = {}
-                        for user_id_str, entry in users.items():
-                            if not isinstance(entry, (list, tuple)) or len(entry) != 2:
-                                continue
-                            date_str, has_said = entry
-                            user_id = int(user_id_str)
-                            date_obj = self._parse_date(date_str)
-                            if date_obj is None:
-                                continue
-                            self.gm_tracker[guild_id][user_id] = (date_obj, bool(has_said))
+                data = load_file(DATA_FILE)
+                # Convertir les dates string en objets date
+                for guild_id_str, users in data.items():
+                    guild_id = int(guild_id_str)
+                    self.gm_tracker[guild_id] = {}
+                    for user_id_str, entry in users.items():
+                        if not isinstance(entry, (list, tuple)) or len(entry) != 2:
+                            continue
+                        date_str, has_said = entry
+                        user_id = int(user_id_str)
+                        date_obj = self._parse_date(date_str)
+                        if date_obj is None:
+                            continue
+                        self.gm_tracker[guild_id][user_id] = (date_obj, bool(has_said))
             except Exception as e:
                 logger.error(f"[GM] Erreur lors du chargement des données: {e}")
                 self.gm_tracker = {}
+
+        if STATE_JOURNAL_ENABLED:
+            self._journal = StateJournal(
+                JOURNAL_PREFIX,
+                compact_bytes=STATE_JOURNAL_COMPACT_BYTES,
+                compact_interval_seconds=STATE_JOURNAL_COMPACT_INTERVAL_SECONDS,
+            )
+            self._replay_journal()
+            self._journal.start()
+
+    def _replay_journal(self):
+        """Rejoue le journal par-dessus les données chargées."""
+        count = 0
+        try:
+            for record in self._journal.replay():
+                if record.get("op") != "gm":
+                    continue
+                date_obj = self._parse_date(record.get("date"))
+                if date_obj is None:
+                    continue
+                users = self.gm_tracker.setdefault(int(record["g"]), {})
+                users[int(record["u"])] = (date_obj, bool(record.get("said")))
+                count += 1
+        except Exception as e:
+            logger.error(f"[GM] Erreur relecture journal: {e}")
+        if count:
+            self._dirty = True
+            logger.info(f"[GM] {count} modification(s) rejouée(s) depuis le journal")
+
+    def _set_entry(self, guild_id: int, user_id: int, date_obj: date, has_said: bool):
+        """Enregistre l'état GM d'un utilisateur (mémoire + journal)."""
+        if guild_id not in self.gm_tracker:
+            self.gm_tracker[guild_id] = {}
+        self.gm_tracker[guild_id][user_id] = (date_obj, has_said)
+        if self._journal is not None:
+            self._journal.append({
+                "op": "gm",
+                "g": str(guild_id),
+                "u": str(user_id),
+                "date": self._serialize_date(date_obj),
+                "said": has_said,
+            })
+        self._dirty = True
+
+    def _finish_compaction(self, sealed: list[str], saved: bool):
+        """Supprime les segments du journal couverts par le snapshot (ou les garde si échec)."""
+        if self._journal is None or not sealed:
+            return
+        if saved:
+            self._journal.discard(sealed)
+        else:
+            self._journal.restore(sealed)
     
-    def _save_data_sync(self):
+    def _save_data_sync(self) -> bool:
         """Sauvegarde synchrone des données (utilisée au shutdown)."""
+        return self._write_snapshot(*self._snapshot_tracker())
+
+    def _snapshot_tracker(self) -> tuple[dict, int]:
+        """Vue figée du suivi (sur l'event loop).
+
+        Les valeurs (date, bool) sont immuables: copier les dicts par serveur
+        (copie superficielle, en C) suffit pour que l'écriture hors de la
+        boucle ne voie plus les modifications suivantes.
+        """
+        snapshot = {guild_id: users.copy() for guild_id, users in self.gm_tracker.items()}
+        self._dirty = False
+        return snapshot, self._save_order.next()
+
+    def _write_snapshot(self, snapshot: dict, version: int) -> bool:
+        """Convertit et écrit un snapshot (appelable hors de l'event loop)."""
         try:
-            # Convertir les dates en string pour JSON
+            # Convertir les dates en string (format du fichier d'état)
             data = {}
-            for guild_id, users in self.gm_tracker.items():
+            for guild_id, users in snapshot.items():
                 data[str(guild_id)] = {}
                 for user_id, (date_obj, has_said) in users.items():
                     data[str(guild_id)][str(user_id)] = (self._serialize_date(date_obj), bool(has_said))
             
-            with open(DATA_FILE, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            
-            self._dirty = False
-            logger.info("[GM] Données sauvegardées")
+            if self._save_order.write(version, lambda: dump_file(DATA_FILE, data, get_codec(STATE_FILE_CODEC))):
+                logger.info("[GM] Données sauvegardées")
+            else:
+                logger.debug("[GM] Snapshot dépassé par une sauvegarde plus récente, non écrit")
+            return True
         except Exception as e:
+            self._dirty = True
             logger.error(f"[GM] Erreur lors de la sauvegarde: {e}")
+            return False
     
     async def _save_data_async(self):
-        """Sauvegarde asynchrone via executor."""
+        """Sauvegarde asynchrone via executor (compacte aussi le journal)."""
+        # Tout ce qui est journalisé après la rotation sera rejoué par-dessus ce snapshot
+        sealed = self._journal.rotate() if self._journal else []
+        saved = False
+        snapshot, version = self._snapshot_tracker()
         try:
             loop = asyncio.get_running_loop()
-            await loop.run_in_executor(None, self._save_data_sync)
+            saved = await loop.run_in_executor(None, self._write_snapshot, snapshot, version)
         except Exception as e:
+            self._dirty = True
             logger.error(f"[GM] Erreur sauvegarde async: {e}")
+        self._finish_compaction(sealed, saved)
     
     @tasks.loop(seconds=SAVE_INTERVAL_SECONDS)
     async def periodic_save(self):
         """Sauvegarde périodique si données modifiées."""
-        if self._dirty:
-            await self._save_data_async()
+        if not self._dirty:
+            return
+        # Le journal couvre les modifications: snapshot complet seulement à la compaction
+        if self._journal is not None and not self._journal.should_compact():
+            return
+        await self._save_data_async()
     
     @periodic_save.before_loop
     async def before_periodic_save(self):
         await self.bot.wait_until_ready()
+
+    @tasks.loop(seconds=STATE_JOURNAL_FLUSH_INTERVAL_SECONDS)
+    async def journal_flush(self):
+        """Pousse le buffer du journal vers le disque."""
+        if self._journal is not None:
+            self._journal.flush()
     
     def _get_current_datetime(self) -> datetime:
         """Retourne la date/heure actuelle en timezone Paris."""
@@ -127,7 +234,7 @@ class GMCog(commands.Cog):
         """Serialize une date en YYYY-MM-DD."""
         return date_obj.strftime('%Y-%m-%d')
     
-    def _should_reset_for_user(self, guild_id: int, user_id: int) -> bool:
+    def _should_reset_for_user(self, guild_id: int, user_id: int, now: datetime | None = None) -> bool:
         """Vérifie si on doit réinitialiser pour cet utilisateur sur ce serveur."""
         if guild_id not in self.gm_tracker:
             return True
@@ -136,7 +243,8 @@ class GMCog(commands.Cog):
             return True
         
         last_date, _ = self.gm_tracker[guild_id][user_id]
-        now = self._get_current_datetime()
+        if now is None:
+            now = self._get_current_datetime()
         current_date = now.date()
         current_time = now.time()
         
@@ -151,14 +259,12 @@ class GMCog(commands.Cog):
         
         return False
     
-    def _reset_if_needed(self, guild_id: int, user_id: int):
+    def _reset_if_needed(self, guild_id: int, user_id: int, now: datetime | None = None):
         """Réinitialise l'état si nécessaire pour cet utilisateur."""
-        if self._should_reset_for_user(guild_id, user_id):
+        if now is None:
             now = self._get_current_datetime()
-            if guild_id not in self.gm_tracker:
-                self.gm_tracker[guild_id] = {}
-            self.gm_tracker[guild_id][user_id] = (now.date(), False)
-            self._dirty = True
+        if self._should_reset_for_user(guild_id, user_id, now):
+            self._set_entry(guild_id, user_id, now.date(), False)
     
     def _has_gm_been_said(self, guild_id: int, user_id: int) -> bool:
         """Vérifie si cet utilisateur a déjà dit GM aujourd'hui sur ce serveur."""
@@ -169,32 +275,23 @@ class GMCog(commands.Cog):
         _, has_said = self.gm_tracker[guild_id][user_id]
         return has_said
     
-    def _mark_gm_said(self, guild_id: int, user_id: int):
+    def _mark_gm_said(self, guild_id: int, user_id: int, now: datetime | None = None):
         """Marque GM comme dit pour cet utilisateur sur ce serveur."""
-        now = self._get_current_datetime()
-        if guild_id not in self.gm_tracker:
-            self.gm_tracker[guild_id] = {}
-        self.gm_tracker[guild_id][user_id] = (now.date(), True)
-        self._dirty = True
+        if now is None:
+            now = self._get_current_datetime()
+        self._set_entry(guild_id, user_id, now.date(), True)
     
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        # Ignorer les messages du bot
-        if message.author.bot:
-            return
-        
-        # Ignorer les messages privés (pas de guild)
-        if not message.guild:
-            return
-        
-        guild_id = message.guild.id
-        user_id = message.author.id
+    async def on_message_features(self, features: MessageFeatures):
+        # Messages du bot et messages privés déjà filtrés par le dispatcher
+        message = features.message
+        guild_id = features.guild_id
+        user_id = features.author_id
         
         # Réinitialiser si nécessaire (après 5h30)
-        self._reset_if_needed(guild_id, user_id)
+        self._reset_if_needed(guild_id, user_id, features.now)
         
         # Vérifier si le message commence par "gm" (insensible à la casse)
-        if not message.content.lower().startswith("gm"):
+        if not features.lowered.startswith("gm"):
             return
         
         # Vérifier si cet utilisateur a déjà dit GM aujourd'hui sur ce serveur
@@ -202,7 +299,7 @@ class GMCog(commands.Cog):
             return
         
         # Marquer GM comme dit pour cet utilisateur
-        self._mark_gm_said(guild_id, user_id)
+        self._mark_gm_said(guild_id, user_id, features.now)
         
         # Récupérer le pseudo (nickname serveur sinon username)
         display_name = message.author.display_name
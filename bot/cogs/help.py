@@ -43,6 +43,7 @@ class HelpCog(commands.Cog):
             `o!help` - Affiche cette aide
             `o!conseil` - Conseil pour les rêves lucides
             `o!ressource` - Ressources sur les rêves lucides
+            `o!search <mots>` - Rechercher dans les messages archivés
             """,
             inline=False
         )
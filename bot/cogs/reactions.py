@@ -1,6 +1,8 @@
 import logging
 from discord.ext import commands
 
+from bot.message_features import MessageFeatures, get_message_dispatcher
+
 logger = logging.getLogger(__name__)
 
 
@@ -12,19 +14,16 @@ class ReactionsCog(commands.Cog):
             ":hap:": "hap",
             ":noel:": "noel",
         }
+        get_message_dispatcher(bot).subscribe(self.on_message_features)
+    
+    def cog_unload(self):
+        get_message_dispatcher(self.bot).unsubscribe(self.on_message_features)
     
-    @commands.Cog.listener()
-    async def on_message(self, message):
+    async def on_message_features(self, features: MessageFeatures):
         """Détecte :hap: et :noel: dans les messages et réagit avec les emojis correspondants."""
-        # Ignorer les messages du bot
-        if message.author.bot:
-            return
-        
-        # Ignorer les DM (pas de guild donc pas d'emojis personnalisés)
-        if not message.guild:
-            return
-        
-        content_lower = message.content.lower()
+        # Messages du bot et DM déjà filtrés par le dispatcher
+        message = features.message
+        content_lower = features.lowered
         reactions_added = []
         
         # Chercher :hap:
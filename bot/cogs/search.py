@@ -0,0 +1,117 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytz
+from discord import Embed
+from discord.ext import commands
+
+from bot.archive_query import ArchiveQuery
+from bot.command_limits import notify_user_in_channel
+from bot.constants import (
+    COMMAND_CHANNEL_IDS_GENERAL_ONLY,
+    SEARCH_RESULTS_LIMIT as CONST_SEARCH_RESULTS_LIMIT,
+    SEARCH_SNIPPET_LENGTH as CONST_SEARCH_SNIPPET_LENGTH,
+)
+from bot.text_index import terms
+
+PARIS_TZ = pytz.timezone('Europe/Paris')
+ARCHIVE_DIR = "data/archive"  # Écrite et indexée par le cog analytics
+
+SEARCH_RESULTS_LIMIT = CONST_SEARCH_RESULTS_LIMIT
+SEARCH_SNIPPET_LENGTH = CONST_SEARCH_SNIPPET_LENGTH
+
+logger = logging.getLogger(__name__)
+
+
+async def _ensure_allowed_channel(ctx, allowed_channel_ids: set[int]) -> bool:
+    if not ctx.guild:
+        await ctx.send("Cette commande ne fonctionne pas en DM.")
+        return False
+
+    if ctx.channel.id not in allowed_channel_ids:
+        try:
+            await ctx.message.delete()
+        except Exception:
+            pass
+        await notify_user_in_channel(ctx)
+        return False
+
+    return True
+
+
+def _readable_channel_ids(guild, member) -> set[str]:
+    """Canaux (et fils actifs) existants que `member` peut lire, historique compris."""
+    readable = set()
+    for channel in [*guild.channels, *guild.threads]:
+        permissions = channel.permissions_for(member)
+        if permissions.read_messages and permissions.read_message_history:
+            readable.add(str(channel.id))
+    return readable
+
+
+def _snippet(content: str) -> str:
+    content = " ".join(content.split())
+    if len(content) > SEARCH_SNIPPET_LENGTH:
+        content = content[:SEARCH_SNIPPET_LENGTH - 1] + "…"
+    return content or "*(sans texte)*"
+
+
+class SearchCog(commands.Cog):
+    """Recherche par mots-clés dans l'archive des messages (index plein texte)."""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        # Lecture seule des fichiers de l'archive; un thread dédié garde les caches d'index cohérents
+        self._query = ArchiveQuery(ARCHIVE_DIR)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="archive-search")
+
+    def cog_unload(self):
+        self._executor.shutdown(wait=False)
+
+    @commands.command(name="search", aliases=["recherche", "cherche"])
+    async def search_prefix(self, ctx, *, query: str = ""):
+        """Rechercher des messages archivés par mots-clés"""
+        if not await _ensure_allowed_channel(ctx, COMMAND_CHANNEL_IDS_GENERAL_ONLY):
+            return
+
+        if not terms(query):
+            await ctx.send("Donne au moins un mot-clé (3 lettres min., hors mots courants) : `o!search rêve lucide`")
+            return
+
+        # Seuls les messages des canaux encore existants et lisibles par l'auteur de la commande
+        channels = _readable_channel_ids(ctx.guild, ctx.author)
+        loop = asyncio.get_running_loop()
+        try:
+            hits = await loop.run_in_executor(
+                self._executor, self._query.search_text, ctx.guild.id, query, SEARCH_RESULTS_LIMIT, channels
+            )
+        except Exception as e:
+            logger.error(f"[Search] Erreur recherche '{query}': {e}")
+            await ctx.send("La recherche a échoué, réessaie plus tard.")
+            return
+
+        if not hits:
+            await ctx.send(f"Aucun message trouvé pour **{query[:100]}**.")
+            return
+
+        embed = Embed(
+            title=f"🔎 Recherche : {query[:100]}",
+            description=f"{len(hits)} message(s) les plus pertinents",
+            color=0x3498db
+        )
+        for hit in hits:
+            entry = hit.entry
+            moment = datetime.fromisoformat(entry["ts"]).astimezone(PARIS_TZ)
+            link = f"https://discord.com/channels/{entry['guild']}/{entry['channel']}/{entry['msg_id']}"
+            embed.add_field(
+                name=f"{entry.get('author_name') or 'Inconnu'} • {moment:%d/%m/%Y %H:%M}",
+                value=f"{_snippet(entry.get('content') or '')}\n<#{entry['channel']}> • [Aller au message]({link})",
+                inline=False
+            )
+        await ctx.send(embed=embed)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(SearchCog(bot))
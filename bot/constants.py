@@ -3,21 +3,53 @@ from datetime import time
 # Engagement
 ENGAGEMENT_COOLDOWN_SECONDS = 15
 ENGAGEMENT_SAVE_INTERVAL_SECONDS = 60
+ENGAGEMENT_STORAGE_BACKEND = "json"  # "json" ou "sqlite"
+ENGAGEMENT_NAME_CACHE_TTL_SECONDS = 3600
+ENGAGEMENT_NAME_CACHE_SIZE = 10_000
+ENGAGEMENT_NAME_FETCH_CONCURRENCY = 5
+ENGAGEMENT_WEEKLY_RESET_CONCURRENCY = 10
 XP_PER_MESSAGE_MIN = 8
 XP_PER_MESSAGE_MAX = 8
 XP_GM_BONUS = 50
 
+# Journal (WAL) engagement / GM
+STATE_JOURNAL_ENABLED = True
+STATE_JOURNAL_FLUSH_INTERVAL_SECONDS = 1
+STATE_JOURNAL_COMPACT_INTERVAL_SECONDS = 600
+STATE_JOURNAL_COMPACT_BYTES = 4 * 1024 * 1024
+
+# Fichiers d'état (analytics, engagement, GM): codec d'écriture, détecté à la lecture
+STATE_FILE_CODEC = "json"  # "json" (compact), "orjson" (si installé) ou "marshal" (binaire, dans les mêmes fichiers .json)
+
 # GM
 GM_RESET_TIME = time(5, 30)
 GM_SAVE_INTERVAL_SECONDS = 60
 
 # Analytics
 ANALYTICS_SAVE_INTERVAL_MINUTES = 5
-ANALYTICS_ARCHIVE_BUFFER_SIZE = 100
+ANALYTICS_ARCHIVE_BUFFER_SIZE = 100  # Taille max d'un lot écrit
+ANALYTICS_ARCHIVE_FLUSH_DELAY_SECONDS = 5  # Délai max entre l'arrivée d'un message et son écriture
+ANALYTICS_ARCHIVE_QUEUE_SIZE = 10_000  # File d'écriture bornée (au-delà, contre-pression)
+ANALYTICS_ARCHIVE_COMPRESSION = "gzip"  # Segments scellés: "gzip" ou "lzma" (plus compact, plus lent)
+ANALYTICS_ARCHIVE_RETENTION_DAYS = None  # None: archive conservée en entier; N: segments de plus de N jours supprimés (définitif)
+ANALYTICS_ARCHIVE_COLUMNS_ENABLED = True  # Copie en colonnes de l'archive (data/columns) pour les analyses hors ligne
 ANALYTICS_MESSAGE_CACHE_SIZE = 20
 ANALYTICS_MESSAGE_CACHE_TTL_SECONDS = 600
+ANALYTICS_CONVERSATION_CACHE_MAX_ENTRIES = 5000  # Messages en cache, tous canaux (au-delà: canaux les moins actifs évincés)
 ANALYTICS_WORD_COUNT_TOP_N = 50
+ANALYTICS_WORD_COUNT_SKETCH_ENABLED = False  # Top mots du serveur en mémoire bornée (Space-Saving)
+ANALYTICS_WORD_COUNT_SKETCH_CAPACITY = 2000
 ANALYTICS_DEBUG_WORDS = False
+ANALYTICS_GRAPH_MAX_EDGES_PER_USER = 100  # Conversations / mentions: voisins gardés par membre (les plus faibles évincés)
+ANALYTICS_ROLLUP_HOURS = 336  # Séries d'activité (daily_snapshots): 14 jours à l'heure
+ANALYTICS_ROLLUP_DAYS = 120  # ~4 mois au jour
+ANALYTICS_ROLLUP_WEEKS = 104  # 2 ans à la semaine
+ANALYTICS_REBUILD_TASKS_PER_WORKER = 4  # Reconstruction depuis l'archive: tâches par processus (équilibrage)
+ANALYTICS_REBUILD_MIN_TASK_MESSAGES = 50_000  # Taille min d'une tâche (en dessous, le découpage coûte plus qu'il ne rapporte)
+
+# Recherche plein texte (o!search)
+SEARCH_RESULTS_LIMIT = 5  # Messages affichés par recherche
+SEARCH_SNIPPET_LENGTH = 200  # Longueur max de l'extrait d'un message
 
 # Commandes: canaux autorises
 COMMAND_CHANNEL_IDS_GENERAL_ONLY = {376797166334640128}
@@ -0,0 +1,125 @@
+"""Cache des derniers messages par canal, pour la détection de conversation.
+
+Un seul cache pour tous les canaux, avec un budget global de messages
+(`ANALYTICS_CONVERSATION_CACHE_MAX_ENTRIES`): une deque par canal (au plus
+`ANALYTICS_MESSAGE_CACHE_SIZE` messages, ceux de plus de
+`ANALYTICS_MESSAGE_CACHE_TTL_SECONDS` retirés à chaque message du canal),
+rangées du canal le moins récemment actif au plus récent. Au-delà du
+budget, les canaux les moins récemment actifs sont évincés en entier.
+
+Sans cela, chaque fil ou post de forum vu une fois gardait sa deque pour
+toujours. `sweep` retire en plus les canaux dont le dernier message a
+expiré: dans l'ordre LRU ils sont en tête, le balayage s'arrête au premier
+canal encore actif.
+"""
+
+import sys
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from bot.analytics_stats import MessageCache, cached_partner
+
+# Taille estimée d'une entrée: tuple (auteur, horodatage) + datetime (l'identifiant d'auteur est partagé)
+_ENTRY_BYTES = sys.getsizeof(("", None)) + sys.getsizeof(datetime(2000, 1, 1))
+
+
+class ConversationCache:
+    """Derniers messages (auteur, horodatage UTC naïf) par canal, LRU par canal et budget global."""
+
+    __slots__ = (
+        "max_entries", "channel_size", "ttl", "_channels", "_entries",
+        "lookups", "hits", "evicted_channels", "expired_entries",
+    )
+
+    def __init__(self, max_entries: int, channel_size: int, ttl_seconds: float):
+        if max_entries < 1 or channel_size < 1:
+            raise ValueError("max_entries et channel_size doivent être >= 1")
+        self.max_entries = max_entries
+        self.channel_size = channel_size
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self._channels: "OrderedDict[str, MessageCache]" = OrderedDict()
+        self._entries = 0
+        # Compteurs depuis le démarrage
+        self.lookups = 0
+        self.hits = 0
+        self.evicted_channels = 0
+        self.expired_entries = 0
+
+    def __len__(self) -> int:
+        """Nombre de messages en cache, tous canaux confondus."""
+        return self._entries
+
+    def __contains__(self, channel_id: str) -> bool:
+        return channel_id in self._channels
+
+    def get(self, channel_id: str) -> Optional[MessageCache]:
+        return self._channels.get(channel_id)
+
+    def add(self, channel_id: str, author_id: str, timestamp: datetime):
+        """Ajoute un message à son canal (anciens messages retirés), puis évince au-delà du budget."""
+        channels = self._channels
+        cache = channels.get(channel_id)
+        if cache is None:
+            cache = channels[channel_id] = deque(maxlen=self.channel_size)
+        else:
+            channels.move_to_end(channel_id)
+
+        # Nettoyer les anciens messages (> 10 min) du canal
+        cutoff = timestamp - self.ttl
+        while cache and cache[0][1] < cutoff:
+            cache.popleft()
+            self._entries -= 1
+            self.expired_entries += 1
+
+        if len(cache) < self.channel_size:
+            self._entries += 1
+        cache.append((author_id, timestamp))
+
+        while self._entries > self.max_entries and len(channels) > 1:
+            _, evicted = channels.popitem(last=False)
+            self._entries -= len(evicted)
+            self.evicted_channels += 1
+
+    def partner(self, channel_id: str, author_id: str, timestamp: datetime) -> Optional[str]:
+        """Auteur du dernier message d'un autre membre du canal, s'il est assez récent (`cached_partner`)."""
+        self.lookups += 1
+        partner_id = cached_partner(self._channels.get(channel_id), author_id, timestamp)
+        if partner_id is not None:
+            self.hits += 1
+        return partner_id
+
+    def sweep(self, now: datetime) -> int:
+        """Retire les canaux dont le dernier message a expiré à `now`; retourne le nombre de messages retirés."""
+        channels = self._channels
+        cutoff = now - self.ttl
+        removed = 0
+        while channels:
+            channel_id, cache = next(iter(channels.items()))
+            if cache and cache[-1][1] >= cutoff:
+                break  # Canaux suivants plus récemment actifs
+            del channels[channel_id]
+            removed += len(cache)
+        self._entries -= removed
+        self.expired_entries += removed
+        return removed
+
+    def memory_bytes(self) -> int:
+        """Mémoire estimée: dict des canaux, deques et entrées."""
+        channels = self._channels
+        deques = sum(sys.getsizeof(cache) for cache in channels.values())
+        return sys.getsizeof(channels) + deques + self._entries * _ENTRY_BYTES
+
+    def stats(self) -> Dict[str, float]:
+        """Occupation, mémoire estimée et compteurs (taux de réussite des recherches de partenaire)."""
+        return {
+            "channels": len(self._channels),
+            "entries": self._entries,
+            "max_entries": self.max_entries,
+            "memory_bytes": self.memory_bytes(),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "evicted_channels": self.evicted_channels,
+            "expired_entries": self.expired_entries,
+        }
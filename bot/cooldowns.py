@@ -0,0 +1,64 @@
+"""Cooldowns auto-expirants basés sur l'horloge monotone.
+
+Deux générations de dictionnaires couvrant chacune `window` secondes: quand
+la génération courante est trop vieille, la précédente est jetée d'un bloc.
+La mémoire reste bornée par les clés vues pendant les deux dernières
+fenêtres, sans aucun parcours pour expirer les entrées.
+"""
+
+import time
+from typing import Callable, Hashable
+
+
+class CooldownStore:
+    """Anti-spam: une clé ne peut être acceptée qu'une fois par fenêtre."""
+
+    def __init__(self, window_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.window = window_seconds
+        self._clock = clock
+        self._current: dict[Hashable, float] = {}
+        self._previous: dict[Hashable, float] = {}
+        self._generation_start = clock()
+
+    def __len__(self) -> int:
+        return len(self._current) + len(self._previous)
+
+    def _rotate(self, now: float):
+        """Fait tourner les générations si la fenêtre courante est écoulée."""
+        elapsed = now - self._generation_start
+        if elapsed < self.window:
+            return
+        if elapsed < 2 * self.window:
+            self._previous = self._current
+            self._generation_start += self.window
+        else:
+            # Inactif depuis plus de deux fenêtres: tout est expiré
+            self._previous = {}
+            self._generation_start = now
+        self._current = {}
+
+    def try_acquire(self, key: Hashable) -> bool:
+        """Retourne True (et enregistre la clé) si la clé n'est pas en cooldown."""
+        now = self._clock()
+        self._rotate(now)
+        last_time = self._current.get(key)
+        if last_time is None:
+            last_time = self._previous.get(key)
+        if last_time is not None and now - last_time < self.window:
+            return False
+        self._current[key] = now
+        return True
+
+    def remaining(self, key: Hashable) -> float:
+        """Secondes restantes avant que la clé soit de nouveau acceptée."""
+        now = self._clock()
+        self._rotate(now)
+        last_time = self._current.get(key, self._previous.get(key))
+        if last_time is None:
+            return 0.0
+        return max(0.0, self.window - (now - last_time))
+
+    def clear(self):
+        self._current = {}
+        self._previous = {}
+        self._generation_start = self._clock()
@@ -0,0 +1,86 @@
+"""Enregistrement compact d'un utilisateur pour le cog d'engagement.
+
+En mémoire: `__slots__`, entiers uniquement pour les dates (secondes epoch
+pour la dernière activité, numéro de jour ordinal pour le streak). La
+conversion vers le format JSON (chaînes ISO) n'a lieu qu'à la sérialisation.
+
+Seul changement de format: `last_streak_date` est écrit en date seule
+("AAAA-MM-JJ", jour de Paris) au lieu de l'horodatage complet du dernier
+message du streak. `from_dict` lit les deux formats: d'un ancien horodatage
+(avec son décalage de Paris), il ne garde que la date, la seule partie
+utilisée par le calcul du streak.
+"""
+
+from datetime import date, datetime, tzinfo
+
+
+class UserRecord:
+    __slots__ = (
+        "xp",
+        "weekly_xp",
+        "weekly_epoch",
+        "messages",
+        "last_active",
+        "display_name",
+        "streak_days",
+        "last_streak_day",
+    )
+
+    def __init__(
+        self,
+        xp: int = 0,
+        weekly_xp: int = 0,
+        weekly_epoch: int = 0,
+        messages: int = 0,
+        last_active: int | None = None,
+        display_name: str | None = None,
+        streak_days: int = 0,
+        last_streak_day: int | None = None,
+    ):
+        self.xp = xp
+        self.weekly_xp = weekly_xp
+        self.weekly_epoch = weekly_epoch  # Semaine (week_epoch du serveur) à laquelle weekly_xp appartient
+        self.messages = messages
+        self.last_active = last_active  # Secondes epoch
+        self.display_name = display_name
+        self.streak_days = streak_days
+        self.last_streak_day = last_streak_day  # date.toordinal() (heure de Paris)
+
+    def copy(self) -> "UserRecord":
+        clone = UserRecord.__new__(UserRecord)
+        for name in self.__slots__:
+            setattr(clone, name, getattr(self, name))
+        return clone
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "UserRecord":
+        """Construit un enregistrement depuis le format JSON/SQLite (dates ISO; streak en date ou, ancien format, horodatage)."""
+        last_active = data.get("last_active")
+        last_streak = data.get("last_streak_date")
+        return cls(
+            xp=data.get("xp") or 0,
+            weekly_xp=data.get("weekly_xp") or 0,
+            weekly_epoch=data.get("weekly_epoch") or 0,
+            messages=data.get("messages") or 0,
+            last_active=int(datetime.fromisoformat(last_active).timestamp()) if last_active else None,
+            display_name=data.get("display_name"),
+            streak_days=data.get("streak_days") or 0,
+            last_streak_day=datetime.fromisoformat(last_streak).date().toordinal() if last_streak else None,
+        )
+
+    def to_dict(self, tz: tzinfo) -> dict:
+        """Convertit vers le format JSON/SQLite (dates ISO dans le fuseau `tz`)."""
+        return {
+            "xp": self.xp,
+            "weekly_xp": self.weekly_xp,
+            "weekly_epoch": self.weekly_epoch,
+            "messages": self.messages,
+            "last_active": (
+                datetime.fromtimestamp(self.last_active, tz).isoformat() if self.last_active is not None else None
+            ),
+            "display_name": self.display_name,
+            "streak_days": self.streak_days,
+            "last_streak_date": (
+                date.fromordinal(self.last_streak_day).isoformat() if self.last_streak_day is not None else None
+            ),
+        }
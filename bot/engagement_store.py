@@ -0,0 +1,197 @@
+"""Stockage SQLite (mode WAL) des données d'engagement.
+
+Seules les lignes modifiées depuis le dernier flush sont écrites, par lots
+transactionnels, sur un thread dédié qui possède la connexion SQLite.
+"""
+
+import logging
+import os
+import sqlite3
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from bot.serialization import load_file
+
+logger = logging.getLogger(__name__)
+
+USER_COLUMNS = (
+    "xp",
+    "weekly_xp",
+    "weekly_epoch",
+    "messages",
+    "last_active",
+    "display_name",
+    "streak_days",
+    "last_streak_date",
+)
+
+# Valeurs par défaut des champs absents des anciennes données
+USER_DEFAULTS = {"weekly_epoch": 0}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS guilds (
+    guild_id TEXT PRIMARY KEY,
+    weekly_reset TEXT,
+    channel_id INTEGER,
+    week_epoch INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS users (
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    xp INTEGER NOT NULL DEFAULT 0,
+    weekly_xp INTEGER NOT NULL DEFAULT 0,
+    weekly_epoch INTEGER NOT NULL DEFAULT 0,
+    messages INTEGER NOT NULL DEFAULT 0,
+    last_active TEXT,
+    display_name TEXT,
+    streak_days INTEGER NOT NULL DEFAULT 0,
+    last_streak_date TEXT,
+    PRIMARY KEY (guild_id, user_id)
+);
+"""
+
+# Colonnes ajoutées après la création initiale du schéma: (table, colonne, définition)
+ADDED_COLUMNS = (
+    ("guilds", "week_epoch", "INTEGER NOT NULL DEFAULT 0"),
+    ("users", "weekly_epoch", "INTEGER NOT NULL DEFAULT 0"),
+)
+
+UPSERT_GUILD = """
+INSERT INTO guilds (guild_id, weekly_reset, channel_id, week_epoch) VALUES (?, ?, ?, ?)
+ON CONFLICT (guild_id) DO UPDATE SET
+    weekly_reset = excluded.weekly_reset,
+    channel_id = excluded.channel_id,
+    week_epoch = excluded.week_epoch
+"""
+
+UPSERT_USER = f"""
+INSERT INTO users (guild_id, user_id, {", ".join(USER_COLUMNS)})
+VALUES (?, ?, {", ".join("?" for _ in USER_COLUMNS)})
+ON CONFLICT (guild_id, user_id) DO UPDATE SET
+    {", ".join(f"{col} = excluded.{col}" for col in USER_COLUMNS)}
+"""
+
+
+@dataclass
+class FlushBatch:
+    """Modifications à écrire en une transaction."""
+    guilds: list[tuple] = field(default_factory=list)  # (guild_id, weekly_reset_iso, channel_id, week_epoch)
+    users: list[tuple] = field(default_factory=list)  # (guild_id, user_id, *USER_COLUMNS)
+
+    def __bool__(self) -> bool:
+        return bool(self.guilds or self.users)
+
+
+def user_row(guild_id: str, user_id: str, user_data: dict) -> tuple:
+    """Convertit un utilisateur en ligne SQL."""
+    return (guild_id, user_id, *(user_data.get(col, USER_DEFAULTS.get(col)) for col in USER_COLUMNS))
+
+
+class SQLiteEngagementStore:
+    """Backend SQLite: toutes les opérations passent par un thread unique."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="engagement-sqlite")
+        self._conn: sqlite3.Connection | None = None
+        self._executor.submit(self._open).result()
+
+    def _open(self):
+        self._conn = sqlite3.connect(self.path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        for table, column, definition in ADDED_COLUMNS:
+            existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def close(self):
+        """Ferme la connexion après les écritures en attente."""
+        def _close():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        self._executor.submit(_close).result()
+        self._executor.shutdown(wait=True)
+
+    # --- Lecture -----------------------------------------------------------
+
+    def load(self) -> dict:
+        """Charge toutes les données au format de engagement_data.json."""
+        return self._executor.submit(self._load_sync).result()
+
+    def _load_sync(self) -> dict:
+        data = {"guilds": {}}
+        for guild_id, weekly_reset, channel_id, week_epoch in self._conn.execute(
+            "SELECT guild_id, weekly_reset, channel_id, week_epoch FROM guilds"
+        ):
+            data["guilds"][guild_id] = {
+                "users": {},
+                "weekly_reset": weekly_reset,
+                "channel_id": channel_id,
+                "week_epoch": week_epoch,
+            }
+
+        # rowid conserve l'ordre d'arrivée (départage des égalités au classement)
+        for row in self._conn.execute(
+            f"SELECT guild_id, user_id, {', '.join(USER_COLUMNS)} FROM users ORDER BY rowid"
+        ):
+            guild = data["guilds"].setdefault(
+                row[0], {"users": {}, "weekly_reset": None, "channel_id": None, "week_epoch": 0}
+            )
+            guild["users"][row[1]] = dict(zip(USER_COLUMNS, row[2:]))
+        return data
+
+    def is_empty(self) -> bool:
+        return self._executor.submit(
+            lambda: self._conn.execute("SELECT 1 FROM guilds LIMIT 1").fetchone() is None
+        ).result()
+
+    # --- Écriture ----------------------------------------------------------
+
+    def submit(self, batch: FlushBatch) -> Future:
+        """Planifie l'écriture d'un lot sur le thread SQLite."""
+        return self._executor.submit(self._write_sync, batch)
+
+    def _write_sync(self, batch: FlushBatch):
+        conn = self._conn
+        conn.execute("BEGIN")
+        try:
+            if batch.guilds:
+                conn.executemany(UPSERT_GUILD, batch.guilds)
+            if batch.users:
+                conn.executemany(UPSERT_USER, batch.users)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # --- Migration ---------------------------------------------------------
+
+    def migrate_from_json(self, json_path: str) -> bool:
+        """Importe engagement_data.json une seule fois (base vide), puis le renomme."""
+        if not os.path.exists(json_path) or not self.is_empty():
+            return False
+
+        loaded = load_file(json_path)
+
+        batch = FlushBatch()
+        for guild_id, guild_data in loaded.get("guilds", {}).items():
+            batch.guilds.append((
+                guild_id,
+                guild_data.get("weekly_reset"),
+                guild_data.get("channel_id"),
+                guild_data.get("week_epoch", 0),
+            ))
+            for user_id, user_data in guild_data.get("users", {}).items():
+                batch.users.append(user_row(guild_id, user_id, user_data))
+        self.submit(batch).result()
+
+        os.replace(json_path, json_path + ".migrated")
+        logger.info(
+            "[Engagement] Migration JSON -> SQLite: %s serveurs, %s utilisateurs",
+            len(batch.guilds),
+            len(batch.users),
+        )
+        return True
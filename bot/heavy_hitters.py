@@ -0,0 +1,113 @@
+"""Top-k en flux à mémoire bornée (algorithme Space-Saving).
+
+Au plus `capacity` mots sont suivis. Un mot suivi qui revient est
+incrémenté; un mot nouveau, si la table est pleine, remplace le mot de
+plus petit compte `m` et hérite de `m + 1` (avec une erreur `m`).
+
+Garanties, pour un flux de N mots:
+- un mot suivi a un vrai compte dans `[count - error, count]`;
+- un mot non suivi a un vrai compte `<= min_count() <= N / capacity`;
+- tout mot de vrai compte `> min_count()` est donc forcément suivi.
+
+Les comptes et erreurs vivent dans des dicts ordinaires (passés au
+constructeur), ce qui garde le format JSON `{mot: compte}` existant.
+"""
+
+import heapq
+from typing import Iterable
+
+
+class SpaceSaving:
+    """Sketch Space-Saving sur `counts` ({mot: compte}) et `errors` ({mot: erreur > 0})."""
+
+    def __init__(self, capacity: int, counts: dict[str, int] | None = None, errors: dict[str, int] | None = None):
+        if capacity < 1:
+            raise ValueError("capacity doit être >= 1")
+        self.capacity = capacity
+        self.counts = counts if counts is not None else {}
+        self.errors = errors if errors is not None else {}
+
+        # Données exactes plus grandes que la capacité (activation du sketch): on garde le top
+        if len(self.counts) > capacity:
+            keep = heapq.nlargest(capacity, self.counts.items(), key=lambda item: (item[1], item[0]))
+            self.counts.clear()
+            self.counts.update(keep)
+        for word in [word for word in self.errors if word not in self.counts]:
+            del self.errors[word]
+
+        # Tas-min (compte, mot), une entrée par mot suivi. Une entrée peut être en
+        # retard sur le vrai compte (les incréments ne touchent pas le tas): elle
+        # est corrigée quand elle remonte au sommet.
+        self._heap = [(count, word) for word, count in self.counts.items()]
+        heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.counts
+
+    def _min_entry(self) -> tuple[int, str]:
+        heap = self._heap
+        counts = self.counts
+        while True:
+            count, word = heap[0]
+            current = counts[word]
+            if current == count:
+                return count, word
+            heapq.heapreplace(heap, (current, word))
+
+    def add(self, word: str, count: int = 1):
+        """Compte `count` occurrences de `word`."""
+        counts = self.counts
+        current = counts.get(word)
+        if current is not None:
+            counts[word] = current + count
+            return
+        if len(counts) < self.capacity:
+            counts[word] = count
+            heapq.heappush(self._heap, (count, word))
+            return
+
+        # Table pleine: le nouveau mot remplace le plus petit compte
+        min_count, victim = self._min_entry()
+        del counts[victim]
+        self.errors.pop(victim, None)
+        counts[word] = min_count + count
+        if min_count:
+            self.errors[word] = min_count
+        heapq.heapreplace(self._heap, (min_count + count, word))
+
+    def update(self, words: Iterable[str]):
+        for word in words:
+            self.add(word)
+
+    def min_count(self) -> int:
+        """Borne haute du vrai compte de n'importe quel mot non suivi."""
+        if len(self.counts) < self.capacity or not self._heap:
+            return 0
+        return self._min_entry()[0]
+
+    def error(self, word: str) -> int:
+        """Surestimation maximale du compte d'un mot suivi."""
+        return self.errors.get(word, 0)
+
+    def top(self, n: int) -> list[tuple[str, int, int]]:
+        """Les n premiers (mot, compte estimé, erreur max), par compte décroissant puis mot."""
+        items = heapq.nsmallest(n, self.counts.items(), key=lambda item: (-item[1], item[0]))
+        return [(word, count, self.errors.get(word, 0)) for word, count in items]
+
+    def guaranteed_top(self, n: int) -> list[tuple[str, int, int]]:
+        """Préfixe de `top(n)` dont l'ordre est certain malgré les erreurs.
+
+        Un mot y figure si son compte minimal garanti (`count - error`)
+        dépasse le compte estimé de tous les mots classés après lui.
+        """
+        ranked = self.top(n + 1)
+        guaranteed = []
+        for i, (word, count, error) in enumerate(ranked[:n]):
+            following = ranked[i + 1][1] if i + 1 < len(ranked) else self.min_count()
+            if count - error < following:
+                break
+            guaranteed.append((word, count, error))
+        return guaranteed
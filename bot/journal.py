@@ -0,0 +1,144 @@
+"""Journal d'écriture anticipée (WAL) pour les états engagement et GM.
+
+Chaque modification est ajoutée au journal sous forme d'un petit
+enregistrement JSON (valeurs absolues: rejouer deux fois un enregistrement
+donne le même état). Au démarrage, le journal est rejoué par-dessus le
+dernier snapshot; la compaction fait tourner le segment actif, écrit un
+nouveau snapshot puis supprime les segments couverts par ce snapshot.
+"""
+
+import glob
+import json
+import logging
+import os
+import re
+import time
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+# Buffer du writer: les écritures partent vers l'OS au flush périodique
+JOURNAL_BUFFER_BYTES = 64 * 1024
+
+_SEGMENT_RE = re.compile(r"\.(\d{6})\.jsonl$")
+
+
+class StateJournal:
+    """Journal segmenté `<prefix>.<seq>.jsonl`."""
+
+    def __init__(self, prefix: str, compact_bytes: int, compact_interval_seconds: float):
+        self.prefix = prefix
+        self.compact_bytes = compact_bytes
+        self.compact_interval_seconds = compact_interval_seconds
+        self._sealed: list[str] = self._existing_segments()
+        self._next_seq = self._seq(self._sealed[-1]) + 1 if self._sealed else 1
+        self._file = None
+        self._active_path: str | None = None
+        self._active_bytes = 0  # Octets écrits dans le segment actif
+        self._bytes_since_compaction = 0
+        self._last_compaction = time.monotonic()
+
+    def _existing_segments(self) -> list[str]:
+        paths = [p for p in glob.glob(f"{glob.escape(self.prefix)}.*.jsonl") if _SEGMENT_RE.search(p)]
+        return sorted(paths, key=self._seq)
+
+    @staticmethod
+    def _seq(path: str) -> int:
+        return int(_SEGMENT_RE.search(path).group(1))
+
+    # --- Démarrage ---------------------------------------------------------
+
+    def replay(self) -> Iterator[dict]:
+        """Relit les segments existants dans l'ordre (à appeler avant start)."""
+        for path in self._sealed:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line_no, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # Dernière ligne tronquée par un crash
+                        logger.warning(f"[Journal] Ligne illisible ignorée: {path}:{line_no}")
+
+    def start(self):
+        """Ouvre un nouveau segment actif."""
+        self._active_path = f"{self.prefix}.{self._next_seq:06d}.jsonl"
+        self._next_seq += 1
+        self._active_bytes = 0
+        self._file = open(self._active_path, 'a', encoding='utf-8', buffering=JOURNAL_BUFFER_BYTES)
+
+    # --- Écriture ----------------------------------------------------------
+
+    def append(self, record: dict):
+        """Ajoute un enregistrement au buffer du segment actif."""
+        if self._file is None:
+            return
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        self._file.write(line)
+        self._active_bytes += len(line)
+        self._bytes_since_compaction += len(line)
+
+    def flush(self):
+        """Pousse le buffer vers l'OS."""
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        """Ferme le segment actif (supprimé s'il est vide: rien à rejouer)."""
+        self._close_active()
+
+    def _close_active(self) -> str | None:
+        """Ferme le segment actif; retourne son chemin s'il contient des enregistrements."""
+        if self._file is None:
+            return None
+        self._file.close()
+        self._file = None
+        if self._active_bytes:
+            return self._active_path
+        try:
+            os.remove(self._active_path)
+        except FileNotFoundError:
+            pass
+        return None
+
+    # --- Compaction --------------------------------------------------------
+
+    def should_compact(self) -> bool:
+        """Vrai si le journal est assez gros ou assez vieux pour être replié."""
+        if self._bytes_since_compaction == 0 and not self._sealed:
+            return False
+        return (
+            self._bytes_since_compaction >= self.compact_bytes
+            or time.monotonic() - self._last_compaction >= self.compact_interval_seconds
+        )
+
+    def rotate(self) -> list[str]:
+        """Scelle le segment actif, en ouvre un nouveau, et retourne les segments scellés.
+
+        À appeler juste avant de prendre le snapshot: tout ce qui est écrit
+        ensuite va dans le nouveau segment et sera rejoué par-dessus. Un
+        segment actif vide est supprimé au lieu d'être scellé.
+        """
+        active = self._close_active()
+        if active is not None:
+            self._sealed.append(active)
+        sealed = self._sealed
+        self._sealed = []
+        self._bytes_since_compaction = 0
+        self._last_compaction = time.monotonic()
+        self.start()
+        return sealed
+
+    def discard(self, paths: list[str]):
+        """Supprime des segments désormais couverts par un snapshot."""
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def restore(self, paths: list[str]):
+        """Remet des segments scellés en attente (snapshot échoué)."""
+        self._sealed[:0] = paths
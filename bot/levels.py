@@ -0,0 +1,127 @@
+"""Courbe de niveaux précalculée.
+
+Les seuils cumulés d'XP sont calculés une seule fois (puis étendus à la
+demande) et les requêtes niveau/progression se font par recherche binaire.
+"""
+
+from bisect import bisect_right
+from typing import Callable, Iterable
+
+# Nombre de niveaux précalculés au démarrage (étendu automatiquement au besoin)
+INITIAL_LEVELS = 256
+
+
+def power_curve(base: float = 100, exponent: float = 1.5) -> Callable[[int], float]:
+    """Coût d'un niveau: base * niveau^exposant (courbe historique du bot)."""
+    def cost(level: int) -> float:
+        return base * (level ** exponent)
+    return cost
+
+
+def linear_curve(step: float = 100) -> Callable[[int], float]:
+    """Coût d'un niveau: step * niveau."""
+    def cost(level: int) -> float:
+        return step * level
+    return cost
+
+
+class LevelCurve:
+    """Seuils cumulés d'XP pour une courbe de coût donnée."""
+
+    def __init__(self, cost: Callable[[int], float], initial_levels: int = INITIAL_LEVELS):
+        self._cost = cost
+        # _thresholds[i] = XP totale nécessaire pour atteindre le niveau i + 1
+        self._thresholds: list[float] = [0]
+        self._extend(initial_levels)
+
+    def _extend(self, count: int):
+        """Ajoute `count` seuils à la table."""
+        thresholds = self._thresholds
+        total = thresholds[-1]
+        level = len(thresholds)
+        for lvl in range(level, level + count):
+            cost = self._cost(lvl)
+            if cost <= 0:
+                raise ValueError(f"Le coût du niveau {lvl} doit être strictement positif")
+            total += cost
+            thresholds.append(total)
+
+    def _ensure(self, xp: float):
+        """Étend la table jusqu'à couvrir `xp`."""
+        while self._thresholds[-1] <= xp:
+            self._extend(len(self._thresholds))
+
+    def level(self, xp: float) -> int:
+        """Niveau correspondant à une XP totale."""
+        self._ensure(xp)
+        return bisect_right(self._thresholds, xp)
+
+    def progress(self, xp: float) -> tuple[float, int]:
+        """Retourne (progression 0-100% dans le niveau, niveau)."""
+        level = self.level(xp)
+        xp_remaining = xp - self._thresholds[level - 1]
+        xp_for_next = self._cost(level)
+        return (xp_remaining / xp_for_next) * 100, level
+
+    def xp_for_level(self, level: int) -> float:
+        """XP totale nécessaire pour atteindre un niveau."""
+        if level < 1:
+            raise ValueError("Le niveau minimum est 1")
+        while len(self._thresholds) < level:
+            self._extend(len(self._thresholds))
+        return self._thresholds[level - 1]
+
+    def levels(self, xps: Iterable[float]) -> list[int]:
+        """Convertit une liste d'XP totales en niveaux en un seul appel."""
+        xps = list(xps)
+        if not xps:
+            return []
+        self._ensure(max(xps))
+        thresholds = self._thresholds
+        return [bisect_right(thresholds, xp) for xp in xps]
+
+    def progresses(self, xps: Iterable[float]) -> list[tuple[float, int]]:
+        """Version batch de `progress`."""
+        xps = list(xps)
+        levels = self.levels(xps)
+        thresholds = self._thresholds
+        cost = self._cost
+        return [
+            ((xp - thresholds[level - 1]) / cost(level) * 100, level)
+            for xp, level in zip(xps, levels)
+        ]
+
+
+DEFAULT_CURVE = LevelCurve(power_curve(100, 1.5))
+_curve = DEFAULT_CURVE
+
+
+def get_level_curve() -> LevelCurve:
+    """Retourne la courbe active."""
+    return _curve
+
+
+def set_level_curve(curve: LevelCurve):
+    """Remplace la courbe active (ex: LevelCurve(linear_curve(150)))."""
+    global _curve
+    _curve = curve
+
+
+def calculate_level(xp):
+    """Calcule le niveau basé sur l'XP."""
+    return _curve.level(xp)
+
+
+def get_level_progress(xp):
+    """Retourne la progression dans le niveau actuel (0-100%)."""
+    return _curve.progress(xp)
+
+
+def calculate_levels(xps: Iterable[float]) -> list[int]:
+    """Calcule les niveaux d'une liste d'XP en un seul appel."""
+    return _curve.levels(xps)
+
+
+def get_levels_progress(xps: Iterable[float]) -> list[tuple[float, int]]:
+    """Version batch de get_level_progress."""
+    return _curve.progresses(xps)
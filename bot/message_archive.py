@@ -0,0 +1,564 @@
+"""Archive des messages en segments par serveur et par jour (UTC).
+
+    data/archive/
+      <guild_id>/
+        _manifest.json            # Segments du serveur: plage horaire, messages, table des blocs
+        <AAAA-MM-JJ>.jsonl        # Segment actif (JSON Lines, append)
+        <AAAA-MM-JJ>.rows         # Son index (une entrée binaire par ligne)
+        <AAAA-MM-JJ>.tok          # Ses mots indexés (une ligne par message)
+        <AAAA-MM-JJ>.jsonl.gz     # Segment scellé (.jsonl.xz avec lzma)
+        <AAAA-MM-JJ>.idx          # Son index (listes inversées auteur / canal)
+        <AAAA-MM-JJ>.terms        # Index plein texte de la journée (mois en cours)
+        <AAAA-MM>.terms           # Index plein texte d'un mois terminé (runs fusionnées)
+
+Un segment reçoit en append les messages de sa journée. Une fois la journée
+passée, il est scellé: recompressé en blocs indépendants (un membre gzip ou
+un flux xz par bloc d'au plus `CHUNK_MESSAGES` messages) dont le manifeste
+garde la table (offset, longueur compressée, messages, premier/dernier ts).
+Lire un bloc ne demande donc qu'un seek et une décompression bornée, et une
+requête sur une période ne touche que les segments et blocs qui la
+recoupent. Un message tardif (journée déjà scellée) est ajouté en fin de
+fichier comme bloc supplémentaire. Les segments plus vieux que la rétention
+sont supprimés: l'espace disque reste borné.
+
+Les écritures viennent d'un thread d'écriture: elles sont sérialisées par
+un verrou, et les segments actifs récents restent ouverts en append
+(`MAX_OPEN_SEGMENTS` au plus) jusqu'à leur scellement ou `close()`.
+Au démarrage, les segments actifs sont relus pour reconstruire leurs
+statistiques (une ligne tronquée par un crash est coupée) et un scellement
+interrompu est refait. L'index de chaque segment (`bot/archive_index.py`)
+et son index plein texte (`bot/text_index.py`) sont écrits en même temps que
+ses lignes, sur le thread d'écriture. Les segments scellés avant l'index
+plein texte sont indexés quelques-uns à la fois (`TERMS_BACKFILL_SEGMENTS`).
+"""
+
+import gzip
+import json
+import logging
+import lzma
+import os
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bot.archive_index import INDEX_SUFFIX, ROW, ROWS_SUFFIX, SegmentIndex, entry_keys
+from bot.serialization import JSON_CODEC, MARSHAL_CODEC, dump_file, load_file
+from bot.text_index import TERMS_SUFFIX, TOKENS_SUFFIX, make_ref, merge_runs, run_name, terms, terms_line, write_run
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "_manifest.json"
+MANIFEST_VERSION = 1
+ACTIVE_SUFFIX = ".jsonl"
+TMP_SUFFIX = ".tmp"
+
+# Compression des segments scellés: extension, compression d'un bloc, décompression
+COMPRESSIONS = {
+    "gzip": (".jsonl.gz", lambda raw: gzip.compress(raw, mtime=0), gzip.decompress),
+    "lzma": (".jsonl.xz", lzma.compress, lzma.decompress),
+}
+
+# Taille max d'un bloc scellé: borne le coût d'un accès aléatoire
+CHUNK_MESSAGES = 256
+CHUNK_RAW_BYTES = 1024 * 1024
+
+# Segments actifs gardés ouverts en append (les moins récemment écrits sont fermés)
+MAX_OPEN_SEGMENTS = 32
+
+# Nombre de lignes importées par lot depuis l'ancienne archive unique
+LEGACY_IMPORT_BATCH = 10_000
+
+# Segments scellés sans index plein texte indexés par appel à `seal_due`
+TERMS_BACKFILL_SEGMENTS = 8
+
+
+def _encode(entry: Dict[str, Any]) -> bytes:
+    return (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+# (entrée, ligne JSONL encodée)
+Record = Tuple[Dict[str, Any], bytes]
+
+
+def _chunks(records: List[Record]) -> Iterator[List[Record]]:
+    """Découpe des enregistrements en blocs d'au plus CHUNK_MESSAGES / CHUNK_RAW_BYTES."""
+    chunk: List[Record] = []
+    size = 0
+    for record in records:
+        if chunk and (len(chunk) >= CHUNK_MESSAGES or size + len(record[1]) > CHUNK_RAW_BYTES):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(record)
+        size += len(record[1])
+    if chunk:
+        yield chunk
+
+
+def _new_segment(day: str) -> Dict[str, Any]:
+    return {
+        "day": day,
+        "file": day + ACTIVE_SUFFIX,
+        "sealed": False,
+        "compression": None,
+        "first_ts": None,
+        "last_ts": None,
+        "messages": 0,
+        "raw_bytes": 0,  # Taille JSONL non compressée
+        "bytes": 0,  # Taille sur disque (fin du dernier bloc pour un segment scellé)
+        "chunks": [],  # [offset, longueur, messages, premier ts, dernier ts]
+        "terms": False,  # Index plein texte écrit (run .terms), pour un segment scellé
+    }
+
+
+def _add_stats(segment: Dict[str, Any], records: List[Record]):
+    for entry, line in records:
+        ts = entry["ts"]
+        if segment["first_ts"] is None or ts < segment["first_ts"]:
+            segment["first_ts"] = ts
+        if segment["last_ts"] is None or ts > segment["last_ts"]:
+            segment["last_ts"] = ts
+        segment["messages"] += 1
+        segment["raw_bytes"] += len(line)
+
+
+def _pack_rows(records: List[Record], offset: int) -> bytes:
+    """Entrées `.rows` de lignes écrites à partir de `offset` dans le .jsonl actif."""
+    packed = bytearray()
+    for entry, line in records:
+        channel, author, ts = entry_keys(entry)
+        packed += ROW.pack(channel, author, offset, ts, len(line))
+        offset += len(line)
+    return bytes(packed)
+
+
+def _record_terms(records: List[Record]) -> Iterator[List[str]]:
+    return (terms(entry.get("content") or "") for entry, _ in records)
+
+
+def _write_chunks(
+    f, offset: int, records: List[Record], compression: str, chunks: List[list], index: Optional[SegmentIndex]
+) -> int:
+    """Écrit les blocs compressés à `offset`, complète la table des blocs et l'index; retourne la fin."""
+    compress = COMPRESSIONS[compression][1]
+    for chunk in _chunks(records):
+        chunk_no = len(chunks)
+        in_chunk = 0
+        for entry, line in chunk:
+            if index is not None:
+                channel, author, ts = entry_keys(entry)
+                index.add(channel, author, chunk_no, in_chunk, len(line), ts)
+            in_chunk += len(line)
+        blob = compress(b"".join(line for _, line in chunk))
+        f.write(blob)
+        timestamps = [entry["ts"] for entry, _ in chunk]
+        chunks.append([offset, len(blob), len(chunk), min(timestamps), max(timestamps)])
+        offset += len(blob)
+    return offset
+
+
+def _in_range(first_ts: Optional[str], last_ts: Optional[str], start: Optional[str], end: Optional[str]) -> bool:
+    """Vrai si [first_ts, last_ts] recoupe [start, end[."""
+    if first_ts is None:
+        return False
+    return (start is None or last_ts >= start) and (end is None or first_ts < end)
+
+
+class MessageArchive:
+    """Segments d'archive par serveur et par jour, avec manifeste par serveur."""
+
+    def __init__(self, directory: str, compression: str = "gzip", retention_days: Optional[int] = None):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"compression inconnue: {compression}")
+        self.directory = directory
+        self.compression = compression
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._segments: Dict[str, Dict[str, Dict[str, Any]]] = {}  # guild_id -> jour -> segment
+        self._dirty: set[str] = set()  # Serveurs dont le manifeste est à réécrire
+        self._handles: OrderedDict = OrderedDict()  # (guild_id, jour) -> (.jsonl, .rows, .tok) ouverts (LRU)
+        self._compact: set[str] = set()  # Serveurs dont les runs plein texte sont à fusionner
+        self._terms_month: Optional[str] = None  # Mois de la dernière fusion de tous les serveurs
+        os.makedirs(directory, exist_ok=True)
+        for guild_id in sorted(os.listdir(directory)):
+            if os.path.isdir(os.path.join(directory, guild_id)):
+                self._recover(guild_id)
+        self._save_manifests()
+
+    # --- Chemins et manifestes ----------------------------------------------
+
+    def _guild_dir(self, guild_id: str) -> str:
+        return os.path.join(self.directory, guild_id)
+
+    def _path(self, guild_id: str, segment: Dict[str, Any]) -> str:
+        return os.path.join(self.directory, guild_id, segment["file"])
+
+    def _index_path(self, guild_id: str, day: str, suffix: str) -> str:
+        return os.path.join(self.directory, guild_id, day + suffix)
+
+    def _handles_for(self, guild_id: str, segment: Dict[str, Any]):
+        """(.jsonl, .rows, .tok) du segment actif, ouverts en append et gardés ouverts."""
+        key = (guild_id, segment["day"])
+        handles = self._handles.get(key)
+        if handles is None:
+            if len(self._handles) >= MAX_OPEN_SEGMENTS:
+                for handle in self._handles.popitem(last=False)[1]:
+                    handle.close()
+            handles = self._handles[key] = (
+                open(self._path(guild_id, segment), 'ab'),
+                open(self._index_path(guild_id, segment["day"], ROWS_SUFFIX), 'ab'),
+                open(self._index_path(guild_id, segment["day"], TOKENS_SUFFIX), 'ab'),
+            )
+        else:
+            self._handles.move_to_end(key)
+        return handles
+
+    def _close_handles(self, guild_id: str, day: str):
+        for handle in self._handles.pop((guild_id, day), ()):
+            handle.close()
+
+    def close(self):
+        """Ferme les segments actifs ouverts."""
+        with self._lock:
+            for handles in self._handles.values():
+                for handle in handles:
+                    handle.close()
+            self._handles.clear()
+
+    def _save_manifests(self):
+        for guild_id in sorted(self._dirty):
+            manifest = {"version": MANIFEST_VERSION, "segments": self._segments.get(guild_id, {})}
+            dump_file(os.path.join(self._guild_dir(guild_id), MANIFEST_NAME), manifest, JSON_CODEC)
+        self._dirty.clear()
+
+    def _recover(self, guild_id: str):
+        """Charge le manifeste d'un serveur et le recale sur les fichiers présents."""
+        guild_dir = self._guild_dir(guild_id)
+        manifest_path = os.path.join(guild_dir, MANIFEST_NAME)
+        segments = load_file(manifest_path)["segments"] if os.path.exists(manifest_path) else {}
+        names = set(os.listdir(guild_dir))
+        for name in names:
+            if name.endswith(TMP_SUFFIX):
+                os.remove(os.path.join(guild_dir, name))  # Écriture interrompue
+            elif name.endswith(ACTIVE_SUFFIX):
+                # Segment actif (ou scellement interrompu avant la suppression du .jsonl)
+                day = name[:-len(ACTIVE_SUFFIX)]
+                segment = _new_segment(day)
+                records = self._read_active(os.path.join(guild_dir, name))
+                _add_stats(segment, records)
+                segment["bytes"] = segment["raw_bytes"]
+                segments[day] = segment
+                # Index reconstruit: il peut être en retard ou en avance sur le .jsonl après un crash
+                with open(self._index_path(guild_id, day, ROWS_SUFFIX), 'wb') as f:
+                    f.write(_pack_rows(records, 0))
+                with open(self._index_path(guild_id, day, TOKENS_SUFFIX), 'wb') as f:
+                    f.write(b"".join(terms_line(entry) for entry, _ in records))
+        for day in [day for day, segment in segments.items() if segment["file"] not in names]:
+            del segments[day]
+        for name in names:
+            day, suffix = os.path.splitext(name)
+            stale = (
+                (suffix in (ROWS_SUFFIX, TOKENS_SUFFIX) and day + ACTIVE_SUFFIX not in names)
+                or (suffix == INDEX_SUFFIX and not segments.get(day, {}).get("sealed"))
+            )
+            if stale:
+                os.remove(os.path.join(guild_dir, name))  # Index d'un segment scellé ou supprimé
+        self._segments[guild_id] = segments
+        self._drop_stale_runs(guild_id)
+        self._dirty.add(guild_id)
+
+    @staticmethod
+    def _read_active(path: str) -> List[Record]:
+        """Enregistrements d'un segment actif; une dernière ligne tronquée (crash) est coupée."""
+        with open(path, 'rb') as f:
+            raw = f.read()
+        records = []
+        good = 0
+        for line in raw.splitlines(keepends=True):
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("ligne incomplète")
+                entry = json.loads(line)
+                entry["ts"]
+                records.append((entry, line))
+            except (ValueError, KeyError, TypeError):
+                logger.warning(f"[Archive] Ligne illisible coupée: {path} (octet {good})")
+                with open(path, 'r+b') as f:
+                    f.truncate(good)
+                break
+            good += len(line)
+        return records
+
+    # --- Écriture -----------------------------------------------------------
+
+    def append(self, entries: Iterable[Dict[str, Any]]):
+        """Ajoute des entrées d'archive (clés "ts" ISO et "guild") à leurs segments."""
+        with self._lock:
+            self._append_locked(entries)
+            self._save_manifests()
+
+    def _append_locked(self, entries: Iterable[Dict[str, Any]]):
+        groups: Dict[Tuple[str, str], List[Record]] = defaultdict(list)
+        for entry in entries:
+            groups[(entry["guild"], entry["ts"][:10])].append((entry, _encode(entry)))
+        for (guild_id, day), records in groups.items():
+            segments = self._segments.setdefault(guild_id, {})
+            segment = segments.get(day)
+            if segment is None:
+                os.makedirs(self._guild_dir(guild_id), exist_ok=True)
+                segment = segments[day] = _new_segment(day)
+            if segment["sealed"]:
+                self._append_chunks(guild_id, segment, records)  # Messages tardifs
+            else:
+                data, rows, tokens = self._handles_for(guild_id, segment)
+                data.write(b"".join(line for _, line in records))
+                data.flush()  # Visible des lecteurs (`iter_messages`, requêtes) dès le retour
+                rows.write(_pack_rows(records, segment["raw_bytes"]))
+                rows.flush()
+                tokens.write(b"".join(terms_line(entry) for entry, _ in records))
+                tokens.flush()
+                _add_stats(segment, records)
+                segment["bytes"] = segment["raw_bytes"]
+            self._dirty.add(guild_id)
+
+    def _append_chunks(self, guild_id: str, segment: Dict[str, Any], records: List[Record]):
+        """Ajoute des blocs compressés en fin de segment scellé (après le dernier bloc connu)."""
+        index_path = self._index_path(guild_id, segment["day"], INDEX_SUFFIX)
+        index = SegmentIndex.from_data(load_file(index_path)) if os.path.exists(index_path) else None
+        with open(self._path(guild_id, segment), 'r+b') as f:
+            f.seek(segment["bytes"])
+            f.truncate()  # Bloc partiel d'un ajout interrompu, absent du manifeste
+            offset = _write_chunks(f, segment["bytes"], records, segment["compression"], segment["chunks"], index)
+            f.flush()
+            os.fsync(f.fileno())
+        if index is not None:
+            dump_file(index_path, index.to_data(), MARSHAL_CODEC)
+        if segment.get("terms"):
+            # Run à part, fusionnée avec celles de son mois une fois celui-ci terminé
+            day, first_row = segment["day"], segment["messages"]
+            self._write_terms(guild_id, day, first_row, _record_terms(records))
+            self._compact.add(guild_id)
+        _add_stats(segment, records)
+        segment["bytes"] = offset
+
+    def seal_due(self, today: str) -> int:
+        """Scelle les segments actifs antérieurs à `today` (AAAA-MM-JJ), applique la rétention."""
+        sealed = 0
+        with self._lock:
+            for guild_id, segments in self._segments.items():
+                for segment in list(segments.values()):
+                    if not segment["sealed"] and segment["day"] < today:
+                        self._seal(guild_id, segment)
+                        sealed += 1
+            if self.retention_days is not None:
+                self._expire((date.fromisoformat(today) - timedelta(days=self.retention_days)).isoformat())
+            self._backfill_terms()
+            month = today[:7]
+            if self._terms_month != month:
+                self._compact.update(self._segments)
+                self._terms_month = month
+            for guild_id in sorted(self._compact):
+                self._compact_runs(guild_id, month)
+            self._compact.clear()
+            self._save_manifests()
+        return sealed
+
+    def _seal(self, guild_id: str, segment: Dict[str, Any]):
+        day = segment["day"]
+        self._close_handles(guild_id, day)
+        active_path = self._path(guild_id, segment)
+        records = self._read_active(active_path)
+        name = day + COMPRESSIONS[self.compression][0]
+        path = os.path.join(self._guild_dir(guild_id), name)
+        chunks: List[list] = []
+        index = SegmentIndex()
+        with open(path + TMP_SUFFIX, 'wb') as f:
+            offset = _write_chunks(f, 0, records, self.compression, chunks, index)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + TMP_SUFFIX, path)
+        dump_file(self._index_path(guild_id, day, INDEX_SUFFIX), index.to_data(), MARSHAL_CODEC)
+        tokens_path = self._index_path(guild_id, day, TOKENS_SUFFIX)
+        self._write_terms(guild_id, day, 0, self._sealed_terms(tokens_path, records))
+        segment.update(file=name, sealed=True, compression=self.compression, bytes=offset, chunks=chunks, terms=True)
+        # Manifeste écrit avant de supprimer le .jsonl: un crash entre les deux refait le scellement
+        self._dirty.add(guild_id)
+        self._compact.add(guild_id)
+        self._save_manifests()
+        os.remove(active_path)
+        os.remove(self._index_path(guild_id, day, ROWS_SUFFIX))
+        if os.path.exists(tokens_path):
+            os.remove(tokens_path)
+
+    @staticmethod
+    def _sealed_terms(tokens_path: str, records: List[Record]) -> Iterable[List[str]]:
+        """Mots des lignes d'un segment à sceller: ceux du `.tok` s'il correspond aux lignes, sinon recalculés."""
+        try:
+            with open(tokens_path, 'rb') as f:
+                lines = f.read().decode("utf-8").split("\n")[:-1]
+        except FileNotFoundError:
+            lines = []
+        if len(lines) != len(records):
+            return _record_terms(records)
+        return (line.split() for line in lines)
+
+    def _expire(self, cutoff: str):
+        """Supprime les segments scellés antérieurs à `cutoff`."""
+        for guild_id, segments in self._segments.items():
+            for day in [day for day, segment in segments.items() if segment["sealed"] and day < cutoff]:
+                os.remove(self._path(guild_id, segments.pop(day)))
+                index_path = self._index_path(guild_id, day, INDEX_SUFFIX)
+                if os.path.exists(index_path):
+                    os.remove(index_path)
+                self._dirty.add(guild_id)
+            if guild_id in self._dirty:
+                self._drop_stale_runs(guild_id)
+
+    # --- Index plein texte --------------------------------------------------
+
+    def _write_terms(self, guild_id: str, day: str, first_row: int, word_lists: Iterable[List[str]]):
+        """Run d'index plein texte de lignes d'un segment (mots de chaque ligne), à partir de la ligne `first_row`."""
+        first_ref = make_ref(day, first_row)
+        path = os.path.join(self._guild_dir(guild_id), run_name(day, first_row))
+        write_run(path, ((first_ref + row, words) for row, words in enumerate(word_lists)))
+
+    def _drop_stale_runs(self, guild_id: str):
+        """Supprime les runs dont aucune journée n'est encore archivée (rétention)."""
+        segments = self._segments.get(guild_id, {})
+        months = {day[:7] for day in segments}
+        guild_dir = self._guild_dir(guild_id)
+        for name in os.listdir(guild_dir):
+            if not name.endswith(TERMS_SUFFIX):
+                continue
+            prefix = name[:-len(TERMS_SUFFIX)].split("+")[0]
+            if prefix not in (months if len(prefix) == 7 else segments):
+                os.remove(os.path.join(guild_dir, name))
+
+    def _backfill_terms(self):
+        """Indexe quelques segments scellés avant l'index plein texte."""
+        pending = [
+            (guild_id, segment)
+            for guild_id, segments in sorted(self._segments.items())
+            for _, segment in sorted(segments.items())
+            if segment["sealed"] and not segment.get("terms")
+        ][:TERMS_BACKFILL_SEGMENTS]
+        for guild_id, segment in pending:
+            records = [(json.loads(line), line) for line in self._segment_lines(guild_id, segment, None, None)]
+            day = segment["day"]
+            self._write_terms(guild_id, day, 0, _record_terms(records))
+            segment["terms"] = True
+            self._dirty.add(guild_id)
+            self._compact.add(guild_id)
+        if pending:
+            logger.info(f"[Archive] Index plein texte: {len(pending)} segments scellés indexés")
+
+    def _compact_runs(self, guild_id: str, current_month: str):
+        """Fusionne les runs de chaque mois terminé dans `<AAAA-MM>.terms`."""
+        guild_dir = self._guild_dir(guild_id)
+        by_month: Dict[str, List[str]] = defaultdict(list)
+        for name in os.listdir(guild_dir):
+            if name.endswith(TERMS_SUFFIX):
+                by_month[name[:7]].append(name)
+        for month, names in sorted(by_month.items()):
+            target = month + TERMS_SUFFIX
+            if month >= current_month or names == [target]:
+                continue
+            merge_runs([os.path.join(guild_dir, name) for name in names], os.path.join(guild_dir, target))
+            # Un crash avant ces suppressions laisse des doublons: ignorés à la requête, refusionnés ensuite
+            for name in names:
+                if name != target:
+                    os.remove(os.path.join(guild_dir, name))
+
+    def import_legacy(self, path: str) -> int:
+        """Importe l'ancienne archive JSONL unique puis la renomme en `.migrated`."""
+        imported = 0
+        with self._lock:
+            if not os.path.exists(path):
+                return 0  # Déjà importée (par un flush concurrent)
+            batch = []
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        entry["ts"], entry["guild"]
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    batch.append(entry)
+                    if len(batch) >= LEGACY_IMPORT_BATCH:
+                        self._append_locked(batch)
+                        imported += len(batch)
+                        batch = []
+            self._append_locked(batch)
+            imported += len(batch)
+            self._save_manifests()
+            os.replace(path, path + ".migrated")
+        logger.info(f"[Archive] {imported} messages importés depuis {path}")
+        return imported
+
+    # --- Lecture ------------------------------------------------------------
+
+    def segments(self, guild_id: Optional[str] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """Copie des (guild_id, segment) du manifeste, par serveur puis par jour."""
+        with self._lock:
+            guild_ids = sorted(self._segments) if guild_id is None else [guild_id]
+            return [
+                (gid, dict(segment, chunks=list(segment["chunks"])))
+                for gid in guild_ids
+                for _, segment in sorted(self._segments.get(gid, {}).items())
+            ]
+
+    def _current(self, guild_id: str, day: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            segment = self._segments.get(guild_id, {}).get(day)
+            return None if segment is None else dict(segment, chunks=list(segment["chunks"]))
+
+    def _segment_lines(
+        self, guild_id: str, segment: Dict[str, Any], start: Optional[str], end: Optional[str]
+    ) -> Iterator[bytes]:
+        """Lignes JSON d'un segment (pour un segment scellé, des seuls blocs qui recoupent la période)."""
+        if not segment["sealed"]:
+            try:
+                with open(self._path(guild_id, segment), 'rb') as f:
+                    # Jusqu'à la dernière ligne complète connue du manifeste
+                    yield from f.read(segment["raw_bytes"]).splitlines()
+                return
+            except FileNotFoundError:
+                segment = self._current(guild_id, segment["day"])  # Scellé entre-temps
+                if segment is None or not segment["sealed"]:
+                    return
+        decompress = COMPRESSIONS[segment["compression"]][2]
+        try:
+            f = open(self._path(guild_id, segment), 'rb')
+        except FileNotFoundError:
+            return  # Expiré entre-temps
+        with f:
+            for offset, length, _, first_ts, last_ts in segment["chunks"]:
+                if _in_range(first_ts, last_ts, start, end):
+                    f.seek(offset)
+                    yield from decompress(f.read(length)).splitlines()
+
+    def iter_messages(
+        self, guild_id: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Messages archivés avec `start <= ts < end` (ts ISO), par serveur puis par jour.
+
+        Seuls les segments et blocs qui recoupent la période sont lus.
+        """
+        for gid, segment in self.segments(guild_id):
+            if not _in_range(segment["first_ts"], segment["last_ts"], start, end):
+                continue
+            for line in self._segment_lines(gid, segment, start, end):
+                entry = json.loads(line)
+                if (start is None or entry["ts"] >= start) and (end is None or entry["ts"] < end):
+                    yield entry
+
+    def usage(self) -> Dict[str, int]:
+        """Totaux du manifeste: segments, messages, octets JSONL bruts et sur disque."""
+        with self._lock:
+            segments = [segment for by_day in self._segments.values() for segment in by_day.values()]
+            return {
+                "segments": len(segments),
+                "messages": sum(segment["messages"] for segment in segments),
+                "raw_bytes": sum(segment["raw_bytes"] for segment in segments),
+                "bytes": sum(segment["bytes"] for segment in segments),
+            }
@@ -0,0 +1,103 @@
+"""Extraction unique des caractéristiques d'un message, partagée par les cogs.
+
+Un seul listener `on_message` calcule pour chaque message un objet
+`MessageFeatures` immuable (texte normalisé, mots, emojis, mentions, flag
+commande, horodatage Paris) puis le passe aux cogs abonnés. Chaque cog ne
+refait donc plus sa propre passe de regex ni ses vérifications bot/DM.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable
+
+import pytz
+
+from bot.tokenizer import tokenize
+
+PARIS_TZ = pytz.timezone('Europe/Paris')
+
+# Préfixes des messages considérés comme des commandes (exclus du comptage de mots)
+COMMAND_PREFIXES = ("o!", "O!", "!", "?", ".", "/", "$", "~", "-", "+")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class MessageFeatures:
+    """Caractéristiques d'un message de serveur, calculées une seule fois."""
+
+    message: object  # discord.Message d'origine
+    guild_id: int
+    channel_id: int
+    author_id: int
+    content: str
+    lowered: str  # Contenu brut en minuscules (détection "gm", ":hap:"...)
+    tokens: tuple[str, ...]  # Mots du texte normalisé
+    words: tuple[str, ...]  # Mots retenus pour le comptage (hors mots courants, nombres...)
+    emojis: tuple[str, ...]  # Emojis custom (":nom:") puis unicode
+    mentions: tuple[int, ...]  # Utilisateurs mentionnés (hors bots)
+    is_command: bool
+    now: datetime  # Heure de Paris à la réception
+
+    @classmethod
+    def from_message(cls, message, now: datetime | None = None) -> "MessageFeatures":
+        content = message.content or ""
+        tokens = tokenize(content)
+        return cls(
+            message=message,
+            guild_id=message.guild.id,
+            channel_id=message.channel.id,
+            author_id=message.author.id,
+            content=content,
+            lowered=content.lower(),
+            tokens=tokens.words,
+            words=tokens.kept_words,
+            emojis=tokens.emojis,
+            mentions=tuple(m.id for m in message.mentions if not m.bot),
+            is_command=content.startswith(COMMAND_PREFIXES),
+            now=now if now is not None else datetime.now(PARIS_TZ),
+        )
+
+
+MessageHandler = Callable[[MessageFeatures], Awaitable[None]]
+
+
+class MessageDispatcher:
+    """Listener `on_message` unique: extrait les caractéristiques puis notifie les abonnés."""
+
+    def __init__(self):
+        self._handlers: list[MessageHandler] = []
+
+    def subscribe(self, handler: MessageHandler):
+        if handler not in self._handlers:
+            self._handlers.append(handler)
+
+    def unsubscribe(self, handler: MessageHandler):
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+
+    async def on_message(self, message):
+        # Ignorer bot et DM (commun à tous les abonnés)
+        if message.author.bot or not message.guild:
+            return
+        handlers = list(self._handlers)
+        if not handlers:
+            return
+
+        features = MessageFeatures.from_message(message)
+        results = await asyncio.gather(*(handler(features) for handler in handlers), return_exceptions=True)
+        for handler, result in zip(handlers, results):
+            if isinstance(result, Exception):
+                logger.error(f"[Messages] Erreur {getattr(handler, '__qualname__', handler)}: {result}")
+
+
+def get_message_dispatcher(bot) -> MessageDispatcher:
+    """Dispatcher partagé du bot (créé et branché sur `on_message` au premier appel)."""
+    dispatcher = getattr(bot, "message_dispatcher", None)
+    if dispatcher is None:
+        dispatcher = MessageDispatcher()
+        bot.message_dispatcher = dispatcher
+        bot.add_listener(dispatcher.on_message, "on_message")
+    return dispatcher
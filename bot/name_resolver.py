@@ -0,0 +1,92 @@
+"""Résolution concurrente et mise en cache des noms d'utilisateurs.
+
+Les noms absents du cache sont récupérés en parallèle (nombre de requêtes
+simultanées borné), avec un cache LRU à durée de vie limitée. Les échecs
+sont aussi mis en cache pour ne pas refaire un appel REST à chaque
+classement.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Iterable
+
+_MISSING = object()
+
+
+class NameResolver:
+    """Cache TTL/LRU + récupération groupée des noms manquants."""
+
+    def __init__(
+        self,
+        fetch: Callable[[int], Awaitable[str | None]],
+        ttl_seconds: float,
+        max_size: int,
+        max_concurrency: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._fetch = fetch
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._clock = clock
+        self._cache: OrderedDict[int, tuple[str | None, float]] = OrderedDict()
+        self._in_flight: dict[int, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get_cached(self, user_id: int, default=None):
+        """Nom en cache (None si échec mis en cache), `default` si absent ou expiré."""
+        entry = self._cache.get(user_id)
+        if entry is None:
+            return default
+        name, expires_at = entry
+        if expires_at <= self._clock():
+            del self._cache[user_id]
+            return default
+        self._cache.move_to_end(user_id)
+        return name
+
+    def put(self, user_id: int, name: str | None):
+        """Ajoute ou rafraîchit un nom dans le cache."""
+        self._cache[user_id] = (name, self._clock() + self.ttl_seconds)
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    async def _fetch_one(self, user_id: int) -> str | None:
+        async with self._semaphore:
+            try:
+                name = await self._fetch(user_id)
+            except Exception:
+                name = None
+        self.put(user_id, name)
+        return name
+
+    async def resolve_many(self, user_ids: Iterable[int]) -> dict[int, str | None]:
+        """Résout plusieurs noms en parallèle (cache d'abord, requêtes dédupliquées)."""
+        result: dict[int, str | None] = {}
+        pending: dict[int, asyncio.Future] = {}
+        for user_id in user_ids:
+            if user_id in result or user_id in pending:
+                continue
+            cached = self.get_cached(user_id, _MISSING)
+            if cached is not _MISSING:
+                self.hits += 1
+                result[user_id] = cached
+                continue
+            self.misses += 1
+            future = self._in_flight.get(user_id)
+            if future is None:
+                future = asyncio.ensure_future(self._fetch_one(user_id))
+                self._in_flight[user_id] = future
+                future.add_done_callback(lambda _, uid=user_id: self._in_flight.pop(uid, None))
+            pending[user_id] = future
+
+        if pending:
+            names = await asyncio.gather(*pending.values())
+            result.update(zip(pending.keys(), names))
+        return result
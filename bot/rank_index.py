@@ -0,0 +1,224 @@
+"""Index de classement ordonné, maintenu incrémentalement.
+
+Liste triée découpée en seaux (bucketed sorted list) + arbre de Fenwick sur
+la taille des seaux: insertion, suppression, rang et accès par position en
+O(log n), top-N en O(log n + N).
+"""
+
+from bisect import bisect_left, insort
+from typing import Hashable, Iterator
+
+# Taille cible d'un seau (un seau est coupé en deux au-delà de 2x)
+DEFAULT_BUCKET_LOAD = 256
+
+
+class RankIndex:
+    """Classement par score décroissant, égalités départagées par `order` croissant."""
+
+    def __init__(self, load: int = DEFAULT_BUCKET_LOAD):
+        self._load = load
+        self._buckets: list[list[tuple]] = []
+        self._maxes: list[tuple] = []
+        self._tree: list[int] = [0]  # Fenwick 1-indexé sur len(bucket)
+        self._keys: dict[Hashable, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, member: Hashable) -> bool:
+        return member in self._keys
+
+    def score(self, member: Hashable) -> int | None:
+        """Score actuel d'un membre (None si absent)."""
+        key = self._keys.get(member)
+        return -key[0] if key else None
+
+    # --- Fenwick -----------------------------------------------------------
+
+    def _rebuild_tree(self):
+        size = len(self._buckets)
+        tree = [0] * (size + 1)
+        for i, bucket in enumerate(self._buckets, 1):
+            tree[i] += len(bucket)
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, index: int, delta: int):
+        tree = self._tree
+        i = index + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _tree_prefix(self, index: int) -> int:
+        """Nombre d'éléments dans les seaux [0, index)."""
+        tree = self._tree
+        total = 0
+        i = index
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, pos: int) -> tuple[int, int]:
+        """Convertit une position globale (0-based) en (seau, position dans le seau)."""
+        tree = self._tree
+        index = 0
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            nxt = index + step
+            if nxt < len(tree) and tree[nxt] <= pos:
+                index = nxt
+                pos -= tree[nxt]
+            step >>= 1
+        return index, pos
+
+    # --- Mutations ---------------------------------------------------------
+
+    def set(self, member: Hashable, score: int, order: int = 0):
+        """Insère ou met à jour le score d'un membre."""
+        key = (-score, order, member)
+        old_key = self._keys.get(member)
+        if old_key == key:
+            return
+        if old_key is not None:
+            self._remove_key(old_key)
+        self._insert_key(key)
+        self._keys[member] = key
+
+    def discard(self, member: Hashable):
+        """Retire un membre s'il est présent."""
+        key = self._keys.pop(member, None)
+        if key is not None:
+            self._remove_key(key)
+
+    def clear(self):
+        self._buckets = []
+        self._maxes = []
+        self._tree = [0]
+        self._keys = {}
+
+    def _insert_key(self, key: tuple):
+        if not self._buckets:
+            self._buckets.append([key])
+            self._maxes.append(key)
+            self._rebuild_tree()
+            return
+
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            i -= 1
+        bucket = self._buckets[i]
+        insort(bucket, key)
+        self._maxes[i] = bucket[-1]
+
+        if len(bucket) > 2 * self._load:
+            half = len(bucket) // 2
+            self._buckets.insert(i + 1, bucket[half:])
+            del bucket[half:]
+            self._maxes[i] = bucket[-1]
+            self._maxes.insert(i + 1, self._buckets[i + 1][-1])
+            self._rebuild_tree()
+        else:
+            self._tree_add(i, 1)
+
+    def _remove_key(self, key: tuple):
+        i = bisect_left(self._maxes, key)
+        bucket = self._buckets[i]
+        del bucket[bisect_left(bucket, key)]
+        if bucket:
+            self._maxes[i] = bucket[-1]
+            self._tree_add(i, -1)
+        else:
+            del self._buckets[i]
+            del self._maxes[i]
+            self._rebuild_tree()
+
+    # --- Requêtes ----------------------------------------------------------
+
+    def rank(self, member: Hashable) -> int | None:
+        """Position 1-based d'un membre (None si absent)."""
+        key = self._keys.get(member)
+        if key is None:
+            return None
+        i = bisect_left(self._maxes, key)
+        return self._tree_prefix(i) + bisect_left(self._buckets[i], key) + 1
+
+    def at(self, rank: int) -> tuple[Hashable, int] | None:
+        """(membre, score) à une position 1-based."""
+        if rank < 1 or rank > len(self._keys):
+            return None
+        bucket_index, pos = self._locate(rank - 1)
+        key = self._buckets[bucket_index][pos]
+        return key[2], -key[0]
+
+    def above(self, member: Hashable) -> tuple[Hashable, int] | None:
+        """(membre, score) juste au-dessus d'un membre dans le classement."""
+        rank = self.rank(member)
+        if not rank or rank == 1:
+            return None
+        return self.at(rank - 1)
+
+    def first(self) -> tuple[Hashable, int] | None:
+        """Le premier du classement."""
+        if not self._buckets:
+            return None
+        key = self._buckets[0][0]
+        return key[2], -key[0]
+
+    def top(self, n: int) -> list[tuple[Hashable, int]]:
+        """Les n premiers (membre, score)."""
+        result = []
+        for member, score in self:
+            if len(result) >= n:
+                break
+            result.append((member, score))
+        return result
+
+    def __iter__(self) -> Iterator[tuple[Hashable, int]]:
+        for bucket in self._buckets:
+            for key in bucket:
+                yield key[2], -key[0]
+
+
+class GuildRanking:
+    """Classements XP totale et XP hebdo d'un serveur.
+
+    Les égalités suivent l'ordre d'arrivée des utilisateurs (comme un tri
+    stable sur `guild_data["users"]`). L'index hebdo ne contient que les
+    utilisateurs avec de l'XP cette semaine: le reset est donc en O(1).
+    """
+
+    def __init__(self, users: dict | None = None, week_epoch: int = 0):
+        self.order: dict[int, int] = {}
+        self.total = RankIndex()
+        self.weekly = RankIndex()
+        for user_id, user_data in (users or {}).items():
+            # XP hebdo d'une semaine précédente (reset paresseux) = 0
+            weekly_xp = user_data.weekly_xp if user_data.weekly_epoch == week_epoch else 0
+            self.update(user_id, user_data.xp, weekly_xp)
+
+    def update(self, user_id: int, xp: int, weekly_xp: int):
+        """Met à jour les deux classements pour un utilisateur."""
+        order = self.order.setdefault(user_id, len(self.order))
+        self.total.set(user_id, xp, order)
+        if weekly_xp > 0:
+            self.weekly.set(user_id, weekly_xp, order)
+        else:
+            self.weekly.discard(user_id)
+
+    def reset_weekly(self):
+        self.weekly = RankIndex()
+
+    def top_weekly(self, n: int) -> list[int]:
+        """Top n hebdo, complété par des utilisateurs à 0 XP dans l'ordre d'arrivée."""
+        top = [user_id for user_id, _ in self.weekly.top(n)]
+        if len(top) < n:
+            for user_id in self.order:
+                if len(top) >= n:
+                    break
+                if user_id not in self.weekly:
+                    top.append(user_id)
+        return top
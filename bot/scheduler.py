@@ -0,0 +1,127 @@
+"""Planificateur à échéances (tas binaire) pour les tâches par serveur.
+
+Au lieu de réveiller une boucle chaque minute pour tout parcourir, les
+échéances sont gardées dans un tas et le planificateur dort jusqu'à la
+prochaine. Les clés arrivées à échéance en même temps sont traitées en
+parallèle avec un nombre de tâches simultanées borné.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time as _time
+from datetime import date, datetime, time, timedelta, tzinfo
+from typing import Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+# Sommeil maximum entre deux vérifications (rattrape les sauts d'horloge murale)
+MAX_SLEEP_SECONDS = 3600
+
+
+def next_weekly_deadline(now: datetime, weekday: int, at: time, tz) -> datetime:
+    """Prochaine occurrence locale de `weekday` à `at`, correcte aux changements d'heure.
+
+    `tz` est un fuseau pytz: l'heure locale est construite puis localisée,
+    donc 20h reste 20h heure de Paris même si la semaine traverse un
+    passage heure d'été / heure d'hiver.
+    """
+    local_now = now.astimezone(tz)
+    days_ahead = (weekday - local_now.weekday()) % 7
+    target_day: date = local_now.date() + timedelta(days=days_ahead)
+    deadline = _localize(tz, datetime.combine(target_day, at))
+    if deadline <= local_now:
+        deadline = _localize(tz, datetime.combine(target_day + timedelta(days=7), at))
+    return deadline
+
+
+def _localize(tz: tzinfo, naive: datetime) -> datetime:
+    if hasattr(tz, "localize"):
+        return tz.normalize(tz.localize(naive))
+    return naive.replace(tzinfo=tz)
+
+
+class DeadlineScheduler:
+    """Tas d'échéances {clé: datetime}, une seule échéance active par clé."""
+
+    def __init__(
+        self,
+        handler: Callable[[Hashable], Awaitable[None]],
+        max_concurrency: int,
+        after_batch: Callable[[], Awaitable[None]] | None = None,
+    ):
+        self._handler = handler
+        self._max_concurrency = max_concurrency
+        self._after_batch = after_batch
+        self._heap: list[tuple[float, int, Hashable]] = []
+        self._deadlines: dict[Hashable, float] = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def schedule(self, key: Hashable, deadline: datetime):
+        """Planifie (ou replanifie) une clé. L'ancienne entrée du tas est ignorée à la sortie."""
+        timestamp = deadline.timestamp()
+        if self._deadlines.get(key) == timestamp:
+            return
+        self._deadlines[key] = timestamp
+        heapq.heappush(self._heap, (timestamp, next(self._counter), key))
+        self._wakeup.set()
+
+    def cancel(self, key: Hashable):
+        self._deadlines.pop(key, None)
+
+    def next_deadline(self) -> float | None:
+        """Timestamp de la prochaine échéance valide."""
+        heap = self._heap
+        while heap:
+            timestamp, _, key = heap[0]
+            if self._deadlines.get(key) == timestamp:
+                return timestamp
+            heapq.heappop(heap)  # Entrée périmée (replanifiée ou annulée)
+        return None
+
+    def _pop_due(self, now: float) -> list[Hashable]:
+        due = []
+        while True:
+            timestamp = self.next_deadline()
+            if timestamp is None or timestamp > now:
+                return due
+            _, _, key = heapq.heappop(self._heap)
+            del self._deadlines[key]
+            due.append(key)
+
+    async def run(self):
+        """Boucle principale: dort jusqu'à la prochaine échéance puis traite les clés dues."""
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+
+        async def _run_one(key):
+            async with semaphore:
+                try:
+                    await self._handler(key)
+                except Exception as e:
+                    logger.error(f"[Scheduler] Erreur tâche {key}: {e}")
+
+        while True:
+            self._wakeup.clear()
+            timestamp = self.next_deadline()
+            delay = MAX_SLEEP_SECONDS if timestamp is None else timestamp - _time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=min(delay, MAX_SLEEP_SECONDS))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due = self._pop_due(_time.time())
+            if not due:
+                continue
+            await asyncio.gather(*(_run_one(key) for key in due))
+            if self._after_batch is not None:
+                try:
+                    await self._after_batch()
+                except Exception as e:
+                    logger.error(f"[Scheduler] Erreur après traitement: {e}")
@@ -0,0 +1,105 @@
+"""Codecs des fichiers d'état (analytics, engagement, GM).
+
+Les données sauvegardées sont des arbres compatibles JSON (dicts à clés
+chaînes, listes, entiers, chaînes, booléens, None). Codecs disponibles:
+- "json": JSON compact de la bibliothèque standard (sans indentation);
+- "orjson": même format JSON, via `orjson` s'il est installé (sinon "json");
+- "marshal": binaire de la bibliothèque standard, nettement plus rapide à
+  relire pour les gros dicts de compteurs, précédé d'un en-tête `MAGIC` et
+  de la version du format marshal. Un format plus récent que celui de
+  l'interpréteur (fichier écrit par un Python plus récent) est refusé avec
+  une erreur explicite; les versions antérieures restent lisibles.
+
+Le codec d'écriture se choisit dans `bot/constants.py`
+(`STATE_FILE_CODEC`, JSON par défaut: les fichiers d'état gardent leur
+extension `.json`, marshal y écrirait du binaire); à la lecture, il est
+détecté d'après le contenu: un fichier peut donc changer de codec d'une
+sauvegarde à l'autre, et les anciens fichiers JSON indentés restent lisibles.
+"""
+
+import json
+import marshal
+import os
+import threading
+from typing import Any, Callable, NamedTuple
+
+try:
+    import orjson
+except ImportError:  # Dépendance optionnelle
+    orjson = None
+
+# En-tête des fichiers marshal (+ version du format marshal sur un octet)
+MAGIC = b"ONYX-MARSHAL\n"
+
+
+class Codec(NamedTuple):
+    name: str
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[bytes], Any]
+
+
+def _json_dumps(data: Any) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _marshal_dumps(data: Any) -> bytes:
+    return MAGIC + bytes([marshal.version]) + marshal.dumps(data)
+
+
+def _marshal_loads(raw: bytes) -> Any:
+    if not raw.startswith(MAGIC):
+        raise ValueError("en-tête marshal absent")
+    if len(raw) <= len(MAGIC):
+        raise ValueError("fichier marshal tronqué (version absente)")
+    version = raw[len(MAGIC)]
+    if version > marshal.version:
+        # marshal relit les formats antérieurs, pas les suivants
+        raise ValueError(
+            f"format marshal {version} plus récent que celui de ce Python ({marshal.version}): "
+            f"relire le fichier avec le Python qui l'a écrit, ou le réécrire avec STATE_FILE_CODEC = \"json\""
+        )
+    return marshal.loads(memoryview(raw)[len(MAGIC) + 1:])
+
+
+JSON_CODEC = Codec("json", _json_dumps, json.loads)
+MARSHAL_CODEC = Codec("marshal", _marshal_dumps, _marshal_loads)
+ORJSON_CODEC = Codec("orjson", orjson.dumps, orjson.loads) if orjson is not None else None
+
+CODECS = {codec.name: codec for codec in (JSON_CODEC, MARSHAL_CODEC, ORJSON_CODEC) if codec is not None}
+
+
+def get_codec(name: str) -> Codec:
+    """Codec d'écriture `name` ("orjson" non installé: repli sur "json")."""
+    if name == "orjson" and ORJSON_CODEC is None:
+        return JSON_CODEC
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"codec inconnu: {name}") from None
+
+
+def detect_codec(raw: bytes) -> Codec:
+    """Codec d'un contenu lu sur disque (marshal si en-tête, sinon JSON)."""
+    if raw.startswith(MAGIC):
+        return MARSHAL_CODEC
+    return ORJSON_CODEC or JSON_CODEC
+
+
+def loads(raw: bytes) -> Any:
+    return detect_codec(raw).loads(raw)
+
+
+def load_file(path: str) -> Any:
+    """Lit un fichier d'état, quel que soit son codec."""
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def dump_file(path: str, data: Any, codec: Codec):
+    """Écrit `data` dans `path` via un fichier temporaire renommé (atomique)."""
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(codec.dumps(data))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
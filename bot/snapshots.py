@@ -0,0 +1,104 @@
+"""Snapshots copy-on-write pour sérialiser hors de l'event loop.
+
+Une sauvegarde gèle une génération: le thread d'écriture reçoit des
+références vers les conteneurs tels qu'ils sont à cet instant, sans copie
+profonde. Tant que cette écriture est en cours, l'event loop ne modifie plus
+ces objets: avant la première modification d'un conteneur, il le remplace
+dans son parent par une copie (`writable`), une seule fois par génération.
+Le thread d'écriture voit donc une vue figée et cohérente: plus de
+"dictionary changed size during iteration" ni d'état à moitié mis à jour.
+
+Les conteneurs doivent avoir une méthode `copy()` superficielle (dict, list,
+ou classe dédiée comme `UserRecord`).
+
+Deux sauvegardes peuvent se chevaucher (sauvegarde périodique et sauvegarde
+après un lot de resets, par exemple): la copie avant modification reste
+active tant qu'une écriture est en cours, et `SnapshotOrder` empêche un
+snapshot plus ancien d'écraser le fichier écrit par un plus récent.
+"""
+
+import threading
+from typing import Any, Callable, Hashable
+
+
+class CopyOnWrite:
+    """Gel par génération d'un arbre de conteneurs partagé avec un thread d'écriture."""
+
+    __slots__ = ("generation", "_fresh", "_outstanding")
+
+    def __init__(self):
+        self.generation = 0
+        # id des conteneurs copiés depuis le dernier gel (None: aucune écriture en cours).
+        # Les objets gelés restent référencés par le snapshot: leur id ne peut pas être réutilisé.
+        self._fresh: set[int] | None = None
+        self._outstanding = 0  # Générations gelées pas encore relâchées
+
+    @property
+    def frozen(self) -> bool:
+        return self._fresh is not None
+
+    def freeze(self) -> int:
+        """Gèle l'état courant (à appeler sur l'event loop avant de passer les références)."""
+        self.generation += 1
+        self._outstanding += 1
+        self._fresh = set()
+        return self.generation
+
+    def release(self, generation: int):
+        """Fin de l'écriture de `generation`.
+
+        Les écritures peuvent finir dans le désordre: la copie avant
+        modification reste active jusqu'au relâchement de la dernière
+        génération en cours (un conteneur hors de `_fresh` peut encore
+        appartenir à un snapshot plus ancien).
+        """
+        if self._outstanding == 0:
+            return
+        self._outstanding -= 1
+        if self._outstanding == 0:
+            self._fresh = None
+
+    def writable(self, parent: Any, key: Hashable) -> Any:
+        """`parent[key]`, remplacé par une copie s'il appartient au snapshot en cours.
+
+        `parent` doit lui-même être modifiable (obtenu via `writable` ou
+        absent du snapshot).
+        """
+        child = parent[key]
+        fresh = self._fresh
+        if fresh is None or id(child) in fresh:
+            return child
+        child = child.copy()
+        parent[key] = child
+        fresh.add(id(child))
+        return child
+
+
+class SnapshotOrder:
+    """Ordre des écritures d'un même fichier de snapshot.
+
+    `next()` (sur l'event loop) numérote chaque snapshot; `write` (thread
+    d'écriture) ignore un snapshot plus ancien que le dernier écrit. Un
+    snapshot ignoré est couvert par le plus récent: l'appelant peut le
+    traiter comme sauvegardé (et supprimer les segments de journal associés).
+    """
+
+    __slots__ = ("version", "_written", "_lock")
+
+    def __init__(self):
+        self.version = 0
+        self._written = -1
+        self._lock = threading.Lock()
+
+    def next(self) -> int:
+        self.version += 1
+        return self.version
+
+    def write(self, version: int, write: Callable[[], None]) -> bool:
+        """Appelle `write()` sauf si un snapshot plus récent est déjà écrit; False si ignoré."""
+        with self._lock:
+            if version < self._written:
+                return False
+            write()
+            self._written = version
+            return True
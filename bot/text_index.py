@@ -0,0 +1,258 @@
+"""Index plein texte de l'archive: mot -> messages, en listes compressées.
+
+Les mots d'un message sont ceux que retient le comptage des mots
+(`tokenize(...).kept_words`: minuscules, sans `COMMON_WORDS`, nombres ni
+mots trop courts), sans doublon. Un message est désigné par une référence
+entière `jour ordinal << ROW_BITS | ligne`, la ligne étant son rang dans le
+segment (le même que dans `.rows` / `.idx`): trier des références revient
+à trier par date.
+
+Fichiers, à côté des segments (`MessageArchive`):
+- segment actif: `<jour>.tok`, une ligne de mots par message, ajoutée en
+  même temps que le message; relu de façon incrémentale (`ActiveTerms`);
+- segment scellé: une run immuable `<jour>.terms` (`<jour>+<ligne>.terms`
+  pour des messages tardifs); les runs d'un mois terminé sont fusionnées
+  dans `<AAAA-MM>.terms`.
+
+Une run contient un en-tête marshal (pour chaque mot: offset, longueur,
+nombre de messages, dernière référence) suivi des listes, triées et codées
+en deltas varint. Une requête ne lit que l'en-tête et les listes de ses
+mots. La fusion de runs consécutives concatène les listes sans les décoder:
+seul le premier delta de chaque liste est recodé.
+"""
+
+import marshal
+import os
+import struct
+from datetime import date
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from bot.tokenizer import tokenize
+
+TERMS_SUFFIX = ".terms"
+TOKENS_SUFFIX = ".tok"
+RUN_MAGIC = b"ONYX-TERMS\n"
+RUN_VERSION = 1
+_HEADER_SIZE = struct.Struct("<I")
+
+# Bits réservés au rang de la ligne dans une référence (16 M messages par jour et par serveur)
+ROW_BITS = 24
+_ROW_MASK = (1 << ROW_BITS) - 1
+
+# Liste encodée: (octets, nombre de messages, première référence, dernière référence)
+Postings = Tuple[bytes, int, int, int]
+
+
+def terms(text: str) -> List[str]:
+    """Mots indexés d'un texte (mots retenus du comptage, sans doublon, triés)."""
+    return sorted(set(tokenize(text).kept_words)) if text else []
+
+
+def terms_line(entry: Dict) -> bytes:
+    """Ligne `.tok` d'une entrée d'archive."""
+    return (" ".join(terms(entry.get("content") or "")) + "\n").encode("utf-8")
+
+
+def make_ref(day: str, row: int) -> int:
+    return date.fromisoformat(day).toordinal() << ROW_BITS | row
+
+
+def split_ref(ref: int) -> Tuple[str, int]:
+    """(jour AAAA-MM-JJ, ligne) d'une référence."""
+    return date.fromordinal(ref >> ROW_BITS).isoformat(), ref & _ROW_MASK
+
+
+def run_name(day: str, first_row: int = 0) -> str:
+    """Nom de la run d'un segment scellé (à partir de la ligne `first_row` pour des messages tardifs)."""
+    return f"{day}{TERMS_SUFFIX}" if first_row == 0 else f"{day}+{first_row}{TERMS_SUFFIX}"
+
+
+# --- Listes compressées -------------------------------------------------------
+
+def _varint(value: int, out: bytearray):
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _first_varint(raw: bytes) -> Tuple[int, int]:
+    """(valeur, taille en octets) du premier varint de `raw`."""
+    value = shift = 0
+    for size, byte in enumerate(raw, 1):
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, size
+        shift += 7
+    raise ValueError("varint tronqué")
+
+
+def encode_postings(refs: Sequence[int]) -> bytes:
+    """Références croissantes -> deltas codés en varint."""
+    out = bytearray()
+    previous = 0
+    for ref in refs:
+        _varint(ref - previous, out)
+        previous = ref
+    return bytes(out)
+
+
+def decode_postings(raw: bytes) -> List[int]:
+    refs = []
+    value = shift = last = 0
+    for byte in raw:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            last += value
+            refs.append(last)
+            value = shift = 0
+    return refs
+
+
+# --- Runs ---------------------------------------------------------------------
+
+def _write(path: str, postings: Dict[str, Postings]):
+    """Écrit une run (fichier temporaire + fsync + renommage)."""
+    blob = bytearray()
+    header_terms = {}
+    for term in sorted(postings):
+        raw, count, _, last = postings[term]
+        header_terms[term] = (len(blob), len(raw), count, last)
+        blob += raw
+    header = marshal.dumps({
+        "version": RUN_VERSION,
+        "first": min((first for _, _, first, _ in postings.values()), default=0),
+        "last": max((last for _, _, _, last in postings.values()), default=0),
+        "terms": header_terms,
+    })
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(RUN_MAGIC + _HEADER_SIZE.pack(len(header)) + header)
+        f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_run(path: str, rows: Iterable[Tuple[int, Iterable[str]]]):
+    """Écrit la run de messages (référence, mots), références croissantes."""
+    lists: Dict[str, List[int]] = {}
+    for ref, words in rows:
+        for word in words:
+            refs = lists.get(word)
+            if refs is None:
+                refs = lists[word] = []
+            refs.append(ref)
+    _write(path, {word: (encode_postings(refs), len(refs), refs[0], refs[-1]) for word, refs in lists.items()})
+
+
+class TermRun:
+    """En-tête d'une run; les listes sont lues à la demande."""
+
+    __slots__ = ("path", "first", "last", "terms", "_base")
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            if f.read(len(RUN_MAGIC)) != RUN_MAGIC:
+                raise ValueError(f"run d'index invalide: {path}")
+            (size,) = _HEADER_SIZE.unpack(f.read(_HEADER_SIZE.size))
+            header = marshal.loads(f.read(size))
+        self.path = path
+        self.first = header["first"]
+        self.last = header["last"]
+        # mot -> (offset, longueur, messages, dernière référence)
+        self.terms: Dict[str, Tuple[int, int, int, int]] = header["terms"]
+        self._base = len(RUN_MAGIC) + _HEADER_SIZE.size + size
+
+    def postings(self, term: str) -> List[int]:
+        info = self.terms.get(term)
+        if info is None:
+            return []
+        with open(self.path, 'rb') as f:
+            f.seek(self._base + info[0])
+            return decode_postings(f.read(info[1]))
+
+    def blob(self) -> bytes:
+        with open(self.path, 'rb') as f:
+            f.seek(self._base)
+            return f.read()
+
+
+def merge_runs(paths: Sequence[str], out_path: str):
+    """Fusionne des runs en une seule (`out_path` peut être l'une d'elles).
+
+    Runs disjointes (cas courant: les journées d'un mois): concaténation des
+    listes, seul le premier delta de chacune est recodé. Sinon (run mensuelle
+    et messages tardifs, fusion interrompue): décodage, union, recodage.
+    """
+    runs = sorted((run for run in map(TermRun, paths) if run.terms), key=lambda run: run.first)
+    blobs = [run.blob() for run in runs]
+    disjoint = all(before.last < after.first for before, after in zip(runs, runs[1:]))
+    merged: Dict[str, Postings] = {}
+    for term in set().union(*(run.terms for run in runs)):
+        if disjoint:
+            out = bytearray()
+            previous = count = 0
+            first = None
+            for run, blob in zip(runs, blobs):
+                info = run.terms.get(term)
+                if info is None:
+                    continue
+                offset, length, messages, last = info
+                raw = blob[offset:offset + length]
+                ref, size = _first_varint(raw)
+                if first is None:
+                    first = ref
+                _varint(ref - previous, out)
+                out += raw[size:]
+                previous = last
+                count += messages
+            merged[term] = (bytes(out), count, first, previous)
+        else:
+            refs = set()
+            for run, blob in zip(runs, blobs):
+                info = run.terms.get(term)
+                if info is not None:
+                    refs.update(decode_postings(blob[info[0]:info[0] + info[1]]))
+            ordered = sorted(refs)
+            merged[term] = (encode_postings(ordered), len(ordered), ordered[0], ordered[-1])
+    _write(out_path, merged)
+
+
+class ActiveTerms:
+    """Listes d'un `.tok` de segment actif, relu de façon incrémentale."""
+
+    __slots__ = ("day", "postings", "rows", "_read")
+
+    def __init__(self, day: str):
+        self.day = day
+        self.postings: Dict[str, List[int]] = {}
+        self.rows = 0
+        self._read = 0  # Octets déjà lus (lignes complètes)
+
+    def refresh(self, path: str):
+        """Lit les lignes ajoutées depuis le dernier appel (FileNotFoundError si le segment est scellé)."""
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < self._read:
+                # Fichier reconstruit (redémarrage du bot): relecture complète
+                self.postings.clear()
+                self.rows = self._read = 0
+            if size == self._read:
+                return
+            f.seek(self._read)
+            raw = f.read(size - self._read)
+        end = raw.rfind(b"\n") + 1  # Dernière ligne peut-être en cours d'écriture
+        ref = make_ref(self.day, self.rows)
+        postings = self.postings
+        for line in raw[:end].split(b"\n")[:-1]:
+            for word in line.decode("utf-8").split():
+                refs = postings.get(word)
+                if refs is None:
+                    refs = postings[word] = []
+                refs.append(ref)
+            ref += 1
+        self.rows = ref & _ROW_MASK
+        self._read += end
@@ -0,0 +1,259 @@
+"""Séries d'activité par serveur et par canal, en tampons circulaires.
+
+Trois résolutions, chacune un tableau d'entiers 32 bits de taille fixe
+(`RingSeries`) indexé par numéro de bucket modulo la taille:
+- heure: heure epoch (UTC), `ANALYTICS_ROLLUP_HOURS` dernières heures;
+- jour: date locale (heure de Paris) en ordinal, `ANALYTICS_ROLLUP_DAYS` derniers jours;
+- semaine: semaine locale commençant le lundi, `ANALYTICS_ROLLUP_WEEKS` dernières semaines.
+
+Chaque message incrémente son bucket dans les trois résolutions. Quand le
+tampon avance, les cases qui sortent sont remises à zéro: l'activité ancienne
+ne subsiste qu'aux résolutions plus grossières (sous-échantillonnage
+automatique), et la mémoire d'une série reste constante. Une requête sur une
+période (7 derniers jours, mois en cours contre mois précédent) ne lit que
+quelques buckets, jamais l'archive.
+
+Format JSON (`daily_snapshots` d'un serveur):
+    {"version": 1, "guild": série, "channels": {canal: série}}
+    série = {"hour": [tête, [comptes]], "day": [...], "week": [...]}
+où `tête` est le dernier bucket écrit et `comptes` les cases dans l'ordre du
+tableau (case `bucket % taille`). Une taille modifiée dans les constantes
+est prise en compte au chargement (buckets replacés, les plus vieux perdus).
+"""
+
+from array import array
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from bot.constants import ANALYTICS_ROLLUP_DAYS, ANALYTICS_ROLLUP_HOURS, ANALYTICS_ROLLUP_WEEKS
+
+ROLLUPS_VERSION = 1
+RESOLUTIONS = ("hour", "day", "week")
+SIZES = {"hour": ANALYTICS_ROLLUP_HOURS, "day": ANALYTICS_ROLLUP_DAYS, "week": ANALYTICS_ROLLUP_WEEKS}
+
+# (heure, jour, semaine) d'un instant
+Buckets = Tuple[int, int, int]
+
+
+def buckets(moment: datetime) -> Buckets:
+    """Buckets d'un instant avec fuseau (heure epoch; jour et semaine dans le fuseau de `moment`)."""
+    day = moment.date().toordinal()
+    return int(moment.timestamp()) // 3600, day, week_of(day)
+
+
+def week_of(day: int) -> int:
+    """Semaine d'un jour ordinal (l'ordinal 1, 01/01/0001, est un lundi)."""
+    return (day - 1) // 7
+
+
+class RingSeries:
+    """Comptes des `len(counts)` derniers buckets, jusqu'à `head` inclus."""
+
+    __slots__ = ("counts", "head")
+
+    def __init__(self, size: int):
+        self.counts = array("I", bytes(4 * size))
+        self.head = -1  # Aucun bucket écrit
+
+    def copy(self) -> "RingSeries":
+        clone = RingSeries.__new__(RingSeries)
+        clone.counts = self.counts[:]
+        clone.head = self.head
+        return clone
+
+    @property
+    def oldest(self) -> int:
+        """Plus vieux bucket encore couvert."""
+        return self.head - len(self.counts) + 1
+
+    def add(self, bucket: int, count: int = 1):
+        counts = self.counts
+        size = len(counts)
+        if bucket > self.head:
+            if self.head < 0 or bucket - self.head >= size:
+                counts[:] = array("I", bytes(4 * size))
+            else:
+                # Cases des buckets sautés (sans message) et du nouveau bucket: remises à zéro
+                for skipped in range(self.head + 1, bucket + 1):
+                    counts[skipped % size] = 0
+            self.head = bucket
+        elif bucket < self.head - size + 1:
+            return  # Plus vieux que le tampon (message très tardif)
+        counts[bucket % size] += count
+
+    def values(self, first: int, last: int) -> List[Optional[int]]:
+        """Comptes des buckets `first..last` (None: sorti du tampon; 0 après la tête)."""
+        counts = self.counts
+        size = len(counts)
+        oldest = self.oldest
+        return [
+            None if bucket < oldest else (counts[bucket % size] if bucket <= self.head else 0)
+            for bucket in range(first, last + 1)
+        ]
+
+    def total(self, first: int, last: int) -> Optional[int]:
+        """Somme des buckets `first..last` (None si une partie est sortie du tampon)."""
+        if first < self.oldest and first <= last:
+            return None
+        counts = self.counts
+        size = len(counts)
+        return sum(counts[bucket % size] for bucket in range(first, min(last, self.head) + 1))
+
+    def to_data(self) -> list:
+        return [self.head, self.counts.tolist()]
+
+    @classmethod
+    def from_data(cls, size: int, data: Optional[list]) -> "RingSeries":
+        series = cls(size)
+        if not data or data[0] < 0:
+            return series
+        head, counts = data
+        stored = len(counts)
+        if stored == size:
+            series.counts = array("I", counts)
+            series.head = head
+        else:
+            # Taille modifiée: buckets replacés du plus vieux au plus récent
+            for bucket in range(head - stored + 1, head + 1):
+                series.add(bucket, counts[bucket % stored])
+        return series
+
+
+class TimeRollup:
+    """Activité d'un serveur ou d'un canal aux trois résolutions."""
+
+    __slots__ = RESOLUTIONS
+
+    def __init__(self):
+        self.hour = RingSeries(SIZES["hour"])
+        self.day = RingSeries(SIZES["day"])
+        self.week = RingSeries(SIZES["week"])
+
+    def add(self, at: Buckets, count: int = 1):
+        self.hour.add(at[0], count)
+        self.day.add(at[1], count)
+        self.week.add(at[2], count)
+
+    def copy(self) -> "TimeRollup":
+        clone = TimeRollup.__new__(TimeRollup)
+        clone.hour = self.hour.copy()
+        clone.day = self.day.copy()
+        clone.week = self.week.copy()
+        return clone
+
+    def series(self, resolution: str) -> RingSeries:
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"résolution inconnue: {resolution}")
+        return getattr(self, resolution)
+
+    def count_days(self, start: date, end: date) -> Optional[int]:
+        """Messages des jours `start <= jour < end` (semaines pour un historique plus ancien).
+
+        None si la période n'est plus couverte (sortie des jours, et pas
+        alignée sur des semaines entières encore gardées).
+        """
+        first, last = start.toordinal(), end.toordinal() - 1
+        total = self.day.total(first, last)
+        if total is None and (first - 1) % 7 == 0 and (last - 1) % 7 == 6:
+            total = self.week.total(week_of(first), week_of(last))
+        return total
+
+    def to_data(self) -> Dict[str, list]:
+        return {resolution: getattr(self, resolution).to_data() for resolution in RESOLUTIONS}
+
+    @classmethod
+    def from_data(cls, data: Optional[Dict[str, list]]) -> "TimeRollup":
+        rollup = cls.__new__(cls)
+        data = data or {}
+        for resolution in RESOLUTIONS:
+            setattr(rollup, resolution, RingSeries.from_data(SIZES[resolution], data.get(resolution)))
+        return rollup
+
+
+class GuildRollups:
+    """Séries d'un serveur et de chacun de ses canaux.
+
+    Les tableaux sont modifiés sur place: `snapshot()` les copie (copies
+    mémoire de quelques Ko par série) pour les exporter hors de l'event loop.
+    """
+
+    __slots__ = ("guild", "channels")
+
+    def __init__(self):
+        self.guild = TimeRollup()
+        self.channels: Dict[str, TimeRollup] = {}
+
+    def add(self, channel_id: str, moment: datetime):
+        """Compte un message (`moment` avec fuseau, heure de Paris pour les jours)."""
+        self.add_buckets(channel_id, buckets(moment))
+
+    def add_buckets(self, channel_id: str, at: Buckets, count: int = 1):
+        self.guild.add(at, count)
+        rollup = self.channels.get(channel_id)
+        if rollup is None:
+            rollup = self.channels[channel_id] = TimeRollup()
+        rollup.add(at, count)
+
+    def drop_stale(self, week: int) -> int:
+        """Retire les canaux sans message dans le tampon des semaines qui finit à `week`.
+
+        Toutes leurs cases en sont sorties (le tampon des semaines est le plus
+        long): la série ne contient plus que des zéros. Sans cela, chaque fil
+        ou canal vu une fois gardait sa série, copiée et écrite à chaque
+        sauvegarde. Retourne le nombre de canaux retirés.
+        """
+        oldest = week - SIZES["week"] + 1
+        stale = [channel_id for channel_id, rollup in self.channels.items() if rollup.week.head < oldest]
+        for channel_id in stale:
+            del self.channels[channel_id]
+        return len(stale)
+
+    def snapshot(self) -> "GuildRollups":
+        frozen = GuildRollups.__new__(GuildRollups)
+        frozen.guild = self.guild.copy()
+        frozen.channels = {channel_id: rollup.copy() for channel_id, rollup in self.channels.items()}
+        return frozen
+
+    def rollup(self, channel_id: Optional[str] = None) -> Optional[TimeRollup]:
+        return self.guild if channel_id is None else self.channels.get(channel_id)
+
+    def recent(self, resolution: str, n: int, moment: datetime, channel_id: Optional[str] = None) -> List[Optional[int]]:
+        """Comptes des `n` derniers buckets jusqu'à celui de `moment` inclus, du plus ancien au plus récent."""
+        rollup = self.rollup(channel_id)
+        if rollup is None:
+            return [0] * n
+        last = buckets(moment)[RESOLUTIONS.index(resolution)]
+        return rollup.series(resolution).values(last - n + 1, last)
+
+    def count_days(self, start: date, end: date, channel_id: Optional[str] = None) -> Optional[int]:
+        """Messages des jours `start <= jour < end` (voir `TimeRollup.count_days`)."""
+        rollup = self.rollup(channel_id)
+        return 0 if rollup is None else rollup.count_days(start, end)
+
+    def to_data(self) -> Dict:
+        return {
+            "version": ROLLUPS_VERSION,
+            "guild": self.guild.to_data(),
+            "channels": {channel_id: rollup.to_data() for channel_id, rollup in self.channels.items()},
+        }
+
+    @classmethod
+    def from_data(cls, data) -> "GuildRollups":
+        """Depuis `daily_snapshots` (l'ancienne liste vide du schéma v2 donne des séries vides)."""
+        rollups = cls()
+        if not isinstance(data, dict):
+            return rollups
+        rollups.guild = TimeRollup.from_data(data.get("guild"))
+        rollups.channels = {
+            channel_id: TimeRollup.from_data(rollup) for channel_id, rollup in data.get("channels", {}).items()
+        }
+        return rollups
+
+
+def month_bounds(day: date, months_back: int = 0) -> Tuple[date, date]:
+    """(premier jour, premier jour du mois suivant) du mois de `day`, `months_back` mois plus tôt."""
+    first = day.replace(day=1)
+    for _ in range(months_back):
+        first = (first - timedelta(days=1)).replace(day=1)
+    following = (first + timedelta(days=32)).replace(day=1)
+    return first, following
@@ -0,0 +1,191 @@
+"""Tokenizer des messages: mots, mots retenus et emojis.
+
+Les mots sont extraits du texte en minuscules par un seul `findall` (aucune
+copie intermédiaire du texte), au lieu de cinq `re.sub`, d'une trentaine de
+`str.replace` et d'un `split`:
+- sans ":" ni "<", aucun lien, mention ou emoji custom n'est possible: une
+  simple classe de caractères (hors espaces, ponctuation et emojis) suffit;
+- sinon, une alternation consomme liens, mentions, emojis custom et
+  shortcodes comme séparateurs et ne capture que les mots.
+Les filtres du comptage (mots courants, longueur, nombres, caractère répété)
+sont appliqués dans la foulée. Les emojis sont relevés sur le texte d'origine
+(casse des noms custom conservée), seulement si le message peut en contenir.
+
+Le résultat est identique à l'ancienne chaîne de traitement
+(`legacy_tokenize`), conservée comme référence pour
+`benchmarks/bench_tokenizer.py`.
+"""
+
+import re
+from typing import NamedTuple
+
+# Mots courants à exclure du word count
+COMMON_WORDS = {
+    # Articles / déterminants
+    "le", "la", "les", "un", "une", "des", "de", "du", "au", "aux",
+    # Pronoms personnels / réfléchis
+    "je", "tu", "il", "elle", "on", "nous", "vous", "ils", "elles",
+    "me", "te", "se", "lui", "soi", "en", "y", "moi", "toi", "eux",
+    # Pronoms démonstratifs / relatifs / interrogatifs
+    "ce", "cet", "cette", "ces", "que", "qui", "quoi", "dont", "où",
+    # Possessifs
+    "mon", "ton", "son", "ma", "ta", "sa", "mes", "tes", "ses",
+    "notre", "votre", "leur", "nos", "vos", "leurs",
+    # Conjonctions
+    "et", "ou", "mais", "donc", "car", "ni", "puis", "sinon",
+    # Prépositions
+    "à", "dans", "par", "pour", "avec", "sans", "sur", "sous",
+    "entre", "devant", "derrière", "vers", "chez", "après", "avant",
+    "pendant", "depuis", "contre", "jusque",
+    # Adverbes courants
+    "plus", "moins", "très", "trop", "peu", "bien", "mal",
+    "aussi", "encore", "même", "tout", "tous", "toute", "toutes",
+    "rien", "jamais", "toujours", "alors", "comme", "quand", "comment",
+    "vraiment", "juste", "déjà", "assez", "tant", "tellement",
+    "là", "ici", "maintenant", "peut", "être",
+    # Verbes auxiliaires / très courants (conjugaisons)
+    "est", "ai", "as", "a", "avons", "avez", "ont", "été", "être", "avoir",
+    "faire", "fait", "fais", "dit", "dis", "suis", "était", "sont", "sera",
+    "vais", "vas", "aller", "peux", "peut", "veut", "veux", "faut", "doit",
+    "voit", "sait", "met", "mis",
+    # Négation / affirmation
+    "oui", "non", "si", "pas", "ne", "ça", "ca",
+    # Fragments d'élision
+    "l", "d", "s", "n", "c", "j", "m", "t", "qu",
+    # Argot / mots informels Discord
+    "mdr", "lol", "ptdr", "xd", "haha", "ahah", "hihi", "hehe",
+    "osef", "tkt", "stp", "svp", "btw", "omg", "jsp", "jpp",
+    "tmtc", "oklm", "fdp", "wtf", "imo", "afk", "gg", "wp",
+}
+
+# Longueur minimale d'un mot retenu pour le comptage
+MIN_WORD_LENGTH = 3
+
+# Ponctuation remplacée par des espaces avant le découpage en mots
+PUNCTUATION = ".,;:!?\"'()[]{}@#&-_=+/*$%~`^|<>\\"
+
+_EMOJI_RANGES = (
+    "\U0001F300-\U0001F5FF"  # Misc Symbols and Pictographs
+    "\U0001F600-\U0001F64F"  # Emoticons
+    "\U0001F680-\U0001F6FF"  # Transport and Map
+    "\U0001F700-\U0001F77F"  # Alchemical Symbols
+    "\U0001F780-\U0001F7FF"  # Geometric Shapes Extended
+    "\U0001F800-\U0001F8FF"  # Supplemental Arrows-C
+    "\U0001F900-\U0001F9FF"  # Supplemental Symbols and Pictographs
+    "\U0001FA00-\U0001FA6F"  # Chess Symbols
+    "\U0001FA70-\U0001FAFF"  # Symbols and Pictographs Extended-A
+    "\U00002700-\U000027BF"  # Dingbats
+    "\U00002600-\U000026FF"  # Misc Symbols
+    "\U0001F1E0-\U0001F1FF"  # Drapeaux (Regional Indicators)
+    "\U0000FE00-\U0000FE0F"  # Variation Selectors
+    "\U0000200D"             # Zero Width Joiner
+    "\U00002300-\U000023FF"  # Misc Technical
+    "\U00002B50-\U00002B55"  # Stars
+    "\U000000A9"             # Copyright
+    "\U000000AE"             # Registered
+    "\U0000203C-\U00003299"  # Misc symbols CJK
+)
+
+CUSTOM_EMOJI_RE = re.compile(r"<a?:([A-Za-z0-9_]+):\d+>")
+SHORTCODE_EMOJI_RE = re.compile(r":([A-Za-z0-9_]+):")
+URL_RE = re.compile(r"https?://\S+")
+MENTION_RE = re.compile(r"<[@#][!&]?\d+>")
+REPEATED_CHAR_RE = re.compile(r"(.)\1{2,}")
+UNICODE_EMOJI_RE = re.compile(f"[{_EMOJI_RANGES}]", re.UNICODE)
+
+# Mot: suite de caractères hors espaces, ponctuation et emojis
+_PUNCTUATION_CLASS = re.escape(PUNCTUATION)
+_WORD_RE = re.compile(rf"[^\s{_PUNCTUATION_CLASS}{_EMOJI_RANGES}]+")
+
+# Texte contenant ":" ou "<". Seul le groupe des mots capture; les autres
+# alternatives reproduisent la priorité des anciens `re.sub` (liens,
+# mentions, emojis custom, shortcodes):
+# - un mot s'arrête avant un lien collé ("voirhttps://..." -> "voir");
+# - un shortcode dont le ":" fermant ouvre un lien (":http://x:") est laissé
+#   au lien, qui l'aurait retiré en premier.
+_TOKEN_RE = re.compile(
+    rf"((?:[^\s{_PUNCTUATION_CLASS}{_EMOJI_RANGES}h]|h(?!ttps?://\S))+)"
+    r"|https?://\S+"
+    r"|<[@#][!&]?\d+>"
+    r"|<a?:[a-z0-9_]+:\d+>"
+    r"|:[a-z0-9_]+:(?:(?<!http:)(?<!https:)|(?!//\S))"
+)
+
+
+class Tokens(NamedTuple):
+    words: tuple[str, ...]  # Tous les mots (minuscules, sans ponctuation)
+    kept_words: tuple[str, ...]  # Mots retenus pour le comptage
+    emojis: tuple[str, ...]  # Emojis custom (":nom:") puis unicode
+
+
+def tokenize(text: str) -> Tokens:
+    """Mots, mots retenus et emojis d'un message."""
+    if not text:
+        return Tokens((), (), ())
+
+    # Liens, mentions, emojis custom et shortcodes contiennent tous ":" ou "<"
+    if ":" in text or "<" in text:
+        words = [word for word in _TOKEN_RE.findall(text.lower()) if word]
+    else:
+        words = _WORD_RE.findall(text.lower())
+    kept = [
+        word for word in words
+        if len(word) >= MIN_WORD_LENGTH
+        and word not in COMMON_WORDS
+        and not word.isdigit()
+        and word.count(word[0]) != len(word)  # Pas un seul caractère répété ("aaaa")
+    ]
+
+    # Emojis custom "<:nom:id>" puis unicode (jamais ASCII)
+    emojis = [f":{name}:" for name in CUSTOM_EMOJI_RE.findall(text)] if "<" in text else []
+    if not text.isascii():
+        emojis.extend(UNICODE_EMOJI_RE.findall(text))
+
+    return Tokens(tuple(words), tuple(kept), tuple(emojis))
+
+
+# --- Ancienne chaîne de traitement (référence) --------------------------------
+
+def normalize_text(text: str) -> str:
+    """Minuscules, sans liens, mentions, emojis ni ponctuation."""
+    text = text.lower()
+
+    # Retirer liens, mentions et emojis
+    text = URL_RE.sub(" ", text)
+    text = MENTION_RE.sub(" ", text)
+    text = CUSTOM_EMOJI_RE.sub(" ", text)
+    text = SHORTCODE_EMOJI_RE.sub(" ", text)
+    text = UNICODE_EMOJI_RE.sub(" ", text)
+
+    # Remplacer la ponctuation par des espaces
+    for char in PUNCTUATION:
+        text = text.replace(char, " ")
+    return text
+
+
+def extract_text_emojis(text: str) -> list[str]:
+    """Extrait les emojis du texte (unicode + custom)."""
+    emojis: list[str] = []
+    if not text:
+        return emojis
+
+    for name in CUSTOM_EMOJI_RE.findall(text):
+        emojis.append(f":{name}:")
+
+    emojis.extend(UNICODE_EMOJI_RE.findall(text))
+    return emojis
+
+
+def legacy_tokenize(text: str) -> Tokens:
+    """Même résultat que `tokenize`, via les `re.sub` et `str.replace` successifs."""
+    if not text:
+        return Tokens((), (), ())
+    words = normalize_text(text).split()
+    kept = [
+        word for word in words
+        if word not in COMMON_WORDS
+        and len(word) >= MIN_WORD_LENGTH
+        and not word.isdigit()
+        and not REPEATED_CHAR_RE.fullmatch(word)
+    ]
+    return Tokens(tuple(words), tuple(kept), tuple(extract_text_emojis(text)))
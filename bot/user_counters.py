@@ -0,0 +1,290 @@
+"""Compteurs analytics par utilisateur, à clés entières.
+
+Chaque serveur a un vocabulaire (`Vocabulary`) qui associe à chaque mot ou
+emoji un petit identifiant entier. Les compteurs par utilisateur
+(`UserCounters`) ne stockent que ces identifiants: une seule copie de chaque
+chaîne par serveur au lieu d'une par utilisateur. Chaque compteur est une
+paire de tableaux triés d'entiers 32 bits (`CompactCounter`, ~8 octets par
+entrée contre ~40 pour un dict), mis à jour par recherche binaire. Les
+utilisateurs sont indexés par identifiant Discord entier.
+
+Les conversations et mentions du serveur sont des graphes à clés entières
+et degré borné (`bot/interaction_graph.py`).
+
+La conversion vers le format JSON historique (`word_counts_by_user`,
+`emoji_text_usage.users`, `messages_by_segment_by_user`, `conversations`,
+`mentions_graph`, clés chaînes) n'a lieu qu'à l'export.
+"""
+
+import heapq
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator
+
+from bot.constants import ANALYTICS_GRAPH_MAX_EDGES_PER_USER
+from bot.interaction_graph import PairGraph
+from bot.snapshots import CopyOnWrite
+
+# Tranches horaires, dans l'ordre des compteurs `UserCounters.segments`
+SEGMENTS = ("night", "morning", "afternoon", "evening")
+SEGMENT_INDEX = {name: index for index, name in enumerate(SEGMENTS)}
+
+
+class Vocabulary:
+    """Table mot/emoji <-> identifiant entier d'un serveur."""
+
+    __slots__ = ("_ids", "_tokens")
+
+    def __init__(self):
+        self._ids: dict[str, int] = {}
+        self._tokens: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def intern(self, token: str) -> int:
+        """Identifiant de `token` (créé au premier usage)."""
+        token_id = self._ids.get(token)
+        if token_id is None:
+            token_id = len(self._tokens)
+            self._ids[token] = token_id
+            self._tokens.append(token)
+        return token_id
+
+    def token(self, token_id: int) -> str:
+        return self._tokens[token_id]
+
+
+class CompactCounter:
+    """Compteur {id: occurrences} en deux tableaux d'entiers 32 bits triés par id."""
+
+    __slots__ = ("ids", "counts")
+
+    def __init__(self):
+        self.ids = array("I")
+        self.counts = array("I")
+
+    @classmethod
+    def from_items(cls, items: Iterable[tuple[int, int]]) -> "CompactCounter":
+        counter = cls()
+        for token_id, count in sorted(items):
+            counter.ids.append(token_id)
+            counter.counts.append(count)
+        return counter
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def copy(self) -> "CompactCounter":
+        clone = CompactCounter.__new__(CompactCounter)
+        clone.ids = self.ids[:]
+        clone.counts = self.counts[:]
+        return clone
+
+    def add(self, token_id: int, count: int = 1):
+        ids = self.ids
+        index = bisect_left(ids, token_id)
+        if index < len(ids) and ids[index] == token_id:
+            self.counts[index] += count
+        else:
+            ids.insert(index, token_id)
+            self.counts.insert(index, count)
+
+    def items(self) -> Iterator[tuple[int, int]]:
+        return zip(self.ids, self.counts)
+
+
+class UserCounters:
+    __slots__ = ("words", "emojis", "segments")
+
+    def __init__(self):
+        self.words = CompactCounter()  # id vocabulaire -> occurrences
+        self.emojis = CompactCounter()  # id vocabulaire -> occurrences
+        self.segments = array("I", bytes(4 * len(SEGMENTS)))  # Messages par tranche horaire (ordre SEGMENTS)
+
+    def copy(self) -> "UserCounters":
+        clone = UserCounters.__new__(UserCounters)
+        clone.words = self.words.copy()
+        clone.emojis = self.emojis.copy()
+        clone.segments = self.segments[:]
+        return clone
+
+
+def _top_items(counter: CompactCounter, vocab: Vocabulary, n: int) -> list[tuple[int, int]]:
+    """Les n premiers (id, compte) par compte décroissant puis mot croissant."""
+    return heapq.nsmallest(n, counter.items(), key=lambda item: (-item[1], vocab.token(item[0])))
+
+
+class GuildCounters:
+    """Vocabulaire, compteurs par utilisateur et graphes d'interactions d'un serveur.
+
+    `snapshot()` donne une vue figée exportable hors de l'event loop: les
+    compteurs d'un utilisateur sont copiés avant leur première modification
+    tant que l'écriture n'est pas terminée (`cow.release`). Le vocabulaire
+    n'est qu'étendu (ou remplacé à la compaction), jamais modifié. Les
+    tables d'arêtes, bornées, sont copiées.
+    """
+
+    __slots__ = ("vocab", "users", "cow", "conversations", "mentions")
+
+    def __init__(self):
+        self.vocab = Vocabulary()
+        self.users: dict[int, UserCounters] = {}
+        self.cow = CopyOnWrite()
+        self.conversations = PairGraph(ANALYTICS_GRAPH_MAX_EDGES_PER_USER, directed=False)  # Réponses entre deux membres
+        self.mentions = PairGraph(ANALYTICS_GRAPH_MAX_EDGES_PER_USER, directed=True)  # Auteur -> mentionné
+
+    def user(self, user_id: int) -> UserCounters:
+        """Compteurs modifiables d'un utilisateur (créés au besoin)."""
+        if user_id in self.users:
+            return self.cow.writable(self.users, user_id)
+        counters = self.users[user_id] = UserCounters()
+        return counters
+
+    def snapshot(self) -> tuple["GuildCounters", int]:
+        """Vue figée (copie superficielle) et génération à passer à `cow.release`."""
+        frozen = GuildCounters()
+        frozen.vocab = self.vocab
+        frozen.users = self.users.copy()
+        frozen.conversations = self.conversations.frozen()
+        frozen.mentions = self.mentions.frozen()
+        return frozen, self.cow.freeze()
+
+    def add_words(self, user_id: int, words: Iterable[str]):
+        intern = self.vocab.intern
+        add = self.user(user_id).words.add
+        for word in words:
+            add(intern(word))
+
+    def add_emojis(self, user_id: int, emojis: Iterable[str]):
+        intern = self.vocab.intern
+        add = self.user(user_id).emojis.add
+        for emoji in emojis:
+            add(intern(emoji))
+
+    def add_segment(self, user_id: int, segment: str):
+        self.user(user_id).segments[SEGMENT_INDEX[segment]] += 1
+
+    def add_conversation(self, user_id: int, other_id: int):
+        self.conversations.add(user_id, other_id)
+
+    def add_mention(self, user_id: int, mentioned_id: int):
+        self.mentions.add(user_id, mentioned_id)
+
+    def prune_words(self, top_n: int):
+        """Garde le top N des mots de chaque utilisateur, puis compacte le vocabulaire."""
+        for user_id, counters in self.users.items():
+            if len(counters.words) > top_n:
+                top = _top_items(counters.words, self.vocab, top_n)
+                self.user(user_id).words = CompactCounter.from_items(top)
+        self._compact()
+
+    def _compact(self):
+        """Renumérote le vocabulaire en ne gardant que les identifiants encore utilisés."""
+        old_vocab = self.vocab
+        new_vocab = Vocabulary()
+
+        def remap(counter: CompactCounter) -> CompactCounter:
+            return CompactCounter.from_items(
+                (new_vocab.intern(old_vocab.token(token_id)), count) for token_id, count in counter.items()
+            )
+
+        for user_id in list(self.users):
+            counters = self.user(user_id)
+            counters.words = remap(counters.words)
+            counters.emojis = remap(counters.emojis)
+        self.vocab = new_vocab
+
+    def _decode(self, counter: CompactCounter) -> dict[str, int]:
+        token = self.vocab.token
+        return {token(token_id): count for token_id, count in counter.items()}
+
+    def user_snapshot(self, user_id: int) -> dict:
+        """Emojis, mots, tranches et interactions d'un utilisateur au format JSON (dicts vides si inconnu).
+
+        Interactions: partenaires de conversation, mentionnés et mentionneurs,
+        du plus fort au plus faible (au plus `ANALYTICS_GRAPH_MAX_EDGES_PER_USER`).
+        """
+        interactions = {
+            "conversations": {str(other): count for other, count in self.conversations.neighbors(user_id)},
+            "mentions_given": {str(other): count for other, count in self.mentions.neighbors(user_id)},
+            "mentions_received": {
+                str(other): count for other, count in self.mentions.neighbors(user_id, incoming=True)
+            },
+        }
+        counters = self.users.get(user_id)
+        if counters is None:
+            return {"emoji_usage": {}, "word_counts": {}, "segments": {}, **interactions}
+        return {
+            "emoji_usage": self._decode(counters.emojis),
+            "word_counts": self._decode(counters.words),
+            "segments": dict(zip(SEGMENTS, counters.segments)),
+            **interactions,
+        }
+
+    @classmethod
+    def from_stats(cls, stats: dict) -> "GuildCounters":
+        """Construit les compteurs depuis `global_stats` (format JSON) et y retire les champs convertis."""
+        guild = cls()
+        for user_id, segments in stats.pop("messages_by_segment_by_user", {}).items():
+            counters = guild.user(int(user_id))
+            for name, count in segments.items():
+                if name in SEGMENT_INDEX:
+                    counters.segments[SEGMENT_INDEX[name]] = count
+        intern = guild.vocab.intern
+        for user_id, words in stats.pop("word_counts_by_user", {}).items():
+            guild.user(int(user_id)).words = CompactCounter.from_items(
+                (intern(word), count) for word, count in words.items()
+            )
+        for user_id, emojis in stats.pop("emoji_text_usage", {}).get("users", {}).items():
+            guild.user(int(user_id)).emojis = CompactCounter.from_items(
+                (intern(emoji), count) for emoji, count in emojis.items()
+            )
+        guild.conversations = PairGraph.from_items(
+            ANALYTICS_GRAPH_MAX_EDGES_PER_USER, False, _conversation_items(stats.pop("conversations", {}))
+        )
+        given = stats.pop("mentions_graph", {}).get("given", {})  # `received` en est le miroir
+        guild.mentions = PairGraph.from_items(
+            ANALYTICS_GRAPH_MAX_EDGES_PER_USER,
+            True,
+            ((int(source), int(target), count) for source, targets in given.items() for target, count in targets.items()),
+        )
+        return guild
+
+    def to_stats(self) -> dict:
+        """Champs `global_stats` au format JSON historique (clés chaînes)."""
+        segments_by_user = {}
+        words_by_user = {}
+        emojis_by_user = {}
+        for user_id, counters in self.users.items():
+            key = str(user_id)
+            if any(counters.segments):
+                segments_by_user[key] = dict(zip(SEGMENTS, counters.segments))
+            if counters.words:
+                words_by_user[key] = self._decode(counters.words)
+            if counters.emojis:
+                emojis_by_user[key] = self._decode(counters.emojis)
+        conversations = {}
+        for a, b, count in self.conversations.items():
+            # Clé historique: identifiants triés comme chaînes
+            conversations["_".join(sorted((str(a), str(b))))] = count
+        given = {}
+        received = {}
+        for source, target, count in self.mentions.items():
+            given.setdefault(str(source), {})[str(target)] = count
+            received.setdefault(str(target), {})[str(source)] = count
+        return {
+            "messages_by_segment_by_user": segments_by_user,
+            "word_counts_by_user": words_by_user,
+            "emoji_text_usage": {"users": emojis_by_user},
+            "conversations": conversations,
+            "mentions_graph": {"given": given, "received": received},
+        }
+
+
+def _conversation_items(conversations: dict) -> Iterator[tuple[int, int, int]]:
+    """(a, b, compte) depuis les clés "userA_userB" (clés illisibles ignorées)."""
+    for pair, count in conversations.items():
+        a, _, b = pair.partition("_")
+        if a.isdigit() and b.isdigit():
+            yield int(a), int(b), count